@@ -0,0 +1,39 @@
+# achats/management/commands/recompute_cmp.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from achats.services.cmp import recalculer_cmp
+from dashboard.cache import bump_days
+from dashboard.services.facts import refresh_days
+
+
+class Command(BaseCommand):
+    help = (
+        "Rejoue l'historique achats/ventes par ordre chronologique: recalcule le CMP des articles "
+        "et le coût figé (cout_unitaire) des lignes de commande, puis les facts dashboard touchés."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--article", dest="articles", type=int, action="append", default=[],
+                            help="ID article (répétable). Défaut: tous les articles.")
+        parser.add_argument("--sans-ventes", dest="sans_ventes", action="store_true",
+                            help="Ne recalcule que le CMP, sans réécrire les lignes de commande.")
+        parser.add_argument("--chunk", dest="chunk", type=int, default=200, help="Articles par lot.")
+
+    def handle(self, *args, **opts):
+        stats = recalculer_cmp(
+            opts["articles"] or None,
+            maj_ventes=not opts["sans_ventes"],
+            chunk=max(1, int(opts["chunk"])),
+        )
+
+        jours = stats["jours"]
+        if jours:
+            refresh_days(jours)
+            bump_days(jours)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['articles']} CMP article(s) modifié(s), {stats['lignes_vente']} ligne(s) de vente réécrite(s), "
+            f"{len(jours)} jour(s) de facts recalculé(s)."
+        ))
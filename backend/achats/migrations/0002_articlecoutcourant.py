@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achats', '0001_initial'),
+        ('article', '0003_article_quantite_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleCoutCourant',
+            fields=[
+                ('article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cout_courant', serialize=False, to='article.article')),
+                ('prix_achat_unitaire', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('date_effet', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('achat_ligne', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='achats.achatligne')),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achats', '0002_articlecoutcourant'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='achatligne',
+            index=models.Index(fields=['article', 'achat'], name='achatligne_article_achat_idx'),
+        ),
+    ]
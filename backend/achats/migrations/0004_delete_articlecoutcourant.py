@@ -0,0 +1,16 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achats', '0003_achatligne_achatligne_article_achat_idx'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='ArticleCoutCourant',
+        ),
+    ]
@@ -54,6 +54,10 @@ class AchatLigne(models.Model):
 
     class Meta:
         ordering = ["-id"]
+        indexes = [
+            # dernier coût / historique d'achats d'un article
+            models.Index(fields=["article", "achat"], name="achatligne_article_achat_idx"),
+        ]
 
     @property
     def total_ligne(self) -> float:
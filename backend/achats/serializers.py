@@ -1,9 +1,12 @@
 # achats/serializers.py
 from __future__ import annotations
 from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from article.models import Article
+from article.models import Article, StockMouvement
+from article.stock import lock_articles, lock_stocks, apply_stock_deltas
 from .models import Achat, AchatLigne
+from .services.cmp import cmp_apres_entree, recalculer_cmp
 
 
 class ArticleMiniSerializer(serializers.ModelSerializer):
@@ -63,9 +66,8 @@ class AchatSerializer(serializers.ModelSerializer):
             **validated_data
         )
 
-        for ld in lignes_data:
-            ligne = AchatLigne.objects.create(achat=achat, **ld)
-            self._apply_stock_and_prices_on_create(ligne)
+        lignes = [AchatLigne.objects.create(achat=achat, **ld) for ld in lignes_data]
+        self._apply_stock_and_prices_on_create(achat, lignes)
 
         return achat
 
@@ -79,44 +81,64 @@ class AchatSerializer(serializers.ModelSerializer):
         instance.save()
 
         if lignes_data is None:
+            # date_achat a pu changer => ordre chronologique des achats aussi (CMP rejoué)
+            if "date_achat" in validated_data:
+                recalculer_cmp(instance.lignes.values_list("article_id", flat=True))
             return instance
 
         # Stratégie simple et sûre :
         # 1) rollback stock de toutes les anciennes lignes
         # 2) supprimer anciennes lignes
         # 3) recréer nouvelles lignes + appliquer stock/prix
-        old_lines = list(instance.lignes.select_related("article").all())
-        for old in old_lines:
-            self._rollback_stock_on_delete(old)
+        old_lines = list(instance.lignes.all())
+        self._rollback_stock_on_delete(instance, old_lines)
 
         instance.lignes.all().delete()
 
-        for ld in lignes_data:
-            new_line = AchatLigne.objects.create(achat=instance, **ld)
-            self._apply_stock_and_prices_on_create(new_line)
+        new_lines = [AchatLigne.objects.create(achat=instance, **ld) for ld in lignes_data]
+        self._apply_stock_and_prices_on_create(instance, new_lines)
+
+        article_ids = [old.article_id for old in old_lines] + [ld["article"].id for ld in lignes_data]
+        # ✅ historique d'achats modifié => CMP rejoué
+        recalculer_cmp(article_ids)
 
         return instance
 
     # -------------------------
     # Helpers stock/prix
     # -------------------------
-    def _apply_stock_and_prices_on_create(self, ligne: AchatLigne):
-        art = ligne.article
-        # ✅ stock +quantité
-        art.quantite_stock = int(art.quantite_stock) + int(ligne.quantite)
-
-        # ✅ prix article (optionnel)
-        if ligne.maj_prix_article:
-            if ligne.prix_achat_unitaire is not None:
-                art.prix_achat = ligne.prix_achat_unitaire
-            if ligne.prix_vente_unitaire is not None:
-                art.prix_vente = ligne.prix_vente_unitaire
-
-        art.save(update_fields=["quantite_stock", "prix_achat", "prix_vente", "updated_at"])
-
-    def _rollback_stock_on_delete(self, ligne: AchatLigne):
-        art = ligne.article
-        art.quantite_stock = int(art.quantite_stock) - int(ligne.quantite)
-        if art.quantite_stock < 0:
-            art.quantite_stock = 0
-        art.save(update_fields=["quantite_stock", "updated_at"])
+    # ✅ stock via article/stock.py: articles verrouillés, 1 UPDATE, mouvements journalisés
+    def _apply_stock_and_prices_on_create(self, achat: Achat, lignes: list[AchatLigne]):
+        articles = lock_articles(l.article_id for l in lignes)
+        deltas: dict[int, int] = {}
+        for ligne in lignes:
+            art = articles[ligne.article_id]
+            # ✅ CMP (sur le stock avant entrée, entrées précédentes du même achat comprises)
+            art.cout_moyen = cmp_apres_entree(
+                art.quantite_stock + deltas.get(art.id, 0), art.cout_moyen, ligne.quantite, ligne.prix_achat_unitaire
+            )
+            # ✅ stock +quantité
+            deltas[art.id] = deltas.get(art.id, 0) + int(ligne.quantite)
+
+            # ✅ prix article (optionnel)
+            if ligne.maj_prix_article:
+                if ligne.prix_achat_unitaire is not None:
+                    art.prix_achat = ligne.prix_achat_unitaire
+                if ligne.prix_vente_unitaire is not None:
+                    art.prix_vente = ligne.prix_vente_unitaire
+
+        now = timezone.now()
+        for art in articles.values():
+            art.updated_at = now
+        Article.objects.bulk_update(articles.values(), ["cout_moyen", "prix_achat", "prix_vente", "updated_at"])
+        apply_stock_deltas(deltas, source_type=StockMouvement.Source.ACHAT, source_id=achat.id)
+
+    def _rollback_stock_on_delete(self, achat: Achat, lignes: list[AchatLigne]):
+        stocks = lock_stocks(l.article_id for l in lignes)
+        deltas: dict[int, int] = {}
+        for ligne in lignes:
+            avant = stocks[ligne.article_id] + deltas.get(ligne.article_id, 0)
+            # stock jamais négatif après annulation d'une entrée
+            apres = max(avant - int(ligne.quantite), 0)
+            deltas[ligne.article_id] = deltas.get(ligne.article_id, 0) + (apres - avant)
+        apply_stock_deltas(deltas, source_type=StockMouvement.Source.ACHAT, source_id=achat.id)
@@ -0,0 +1,139 @@
+# achats/services/cmp.py
+from __future__ import annotations
+
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from article.models import Article, StockMouvement
+from achats.models import AchatLigne
+from vente.dates import day_start
+from vente.models import Commande, LigneCommande
+
+
+# =========================
+# Coût moyen pondéré (CMP)
+# =========================
+# - entrée (achat) : CMP = (stock * CMP + qte * prix) / (stock + qte)
+# - sortie (livraison) : le CMP ne change pas
+# - vente (ligne créée): fige cout_unitaire = CMP courant
+# - stock <= 0 ou CMP inconnu (0) : CMP = prix du nouvel achat
+# Création d'achat: mise à jour incrémentale (cmp_apres_entree).
+# Modification / suppression d'achat: l'historique change => rejeu (recalculer_cmp).
+
+Q4 = Decimal("0.0001")
+
+
+def cmp_apres_entree(stock_avant, cmp_avant, quantite, prix) -> Decimal:
+    """CMP après l'entrée de `quantite` unités à `prix`, sur un stock de `stock_avant` valorisé à `cmp_avant`."""
+    q = int(quantite or 0)
+    p = Decimal(prix or 0)
+    cmp_avant = Decimal(cmp_avant or 0)
+    if q <= 0:
+        return cmp_avant
+    stock = max(int(stock_avant or 0), 0)
+    if stock == 0 or not cmp_avant:
+        return p.quantize(Q4, rounding=ROUND_HALF_UP)
+    return ((stock * cmp_avant + q * p) / (stock + q)).quantize(Q4, rounding=ROUND_HALF_UP)
+
+
+def _moment_achat(date_achat, created_at):
+    """Instant d'effet d'un achat: created_at, ou début de date_achat si l'achat est antidaté."""
+    if date_achat and (not created_at or timezone.localtime(created_at).date() != date_achat):
+        return day_start(date_achat)
+    return created_at
+
+
+def _replay_chunk(article_ids: list[int], maj_ventes: bool) -> tuple[list[Article], list[LigneCommande], set]:
+    achats = defaultdict(list)
+    for ligne_id, article_id, qte, prix, date_achat, achat_created in (
+        AchatLigne.objects
+        .filter(article_id__in=article_ids)
+        .values_list("id", "article_id", "quantite", "prix_achat_unitaire", "achat__date_achat", "achat__created_at")
+        .iterator(chunk_size=2000)
+    ):
+        achats[article_id].append((_moment_achat(date_achat, achat_created), 0, ligne_id, qte, prix, None))
+
+    # - sortie de stock = livraison (mouvement VENTE négatif du journal), commandes LIVREE seulement:
+    #   ouvertes (réservées) et annulées ne touchent pas quantite_stock
+    #   pas de mouvement (livrée avant le journal): sortie à la création de la ligne (ancien modèle)
+    # - coût figé (cout_unitaire) = CMP à la création de la ligne, quel que soit le statut
+    sortie = Subquery(
+        StockMouvement.objects.filter(
+            source_type=StockMouvement.Source.VENTE,
+            source_id=OuterRef("commande_id"),
+            article_id=OuterRef("article_id"),
+            delta__lt=0,
+        ).order_by("-created_at").values("created_at")[:1]
+    )
+    ventes = defaultdict(list)
+    for ligne_id, article_id, qte, cout, created_at, cmd_created, statut, livree_le in (
+        LigneCommande.objects
+        .filter(article_id__in=article_ids)
+        .annotate(livree_le=sortie)
+        .values_list(
+            "id", "article_id", "quantite", "cout_unitaire", "created_at",
+            "commande__created_at", "commande__statut", "livree_le",
+        )
+        .iterator(chunk_size=2000)
+    ):
+        ventes[article_id].append((created_at, 2, ligne_id, 0, cout, cmd_created))
+        if statut == Commande.Statut.LIVREE:
+            ventes[article_id].append((livree_le or created_at, 1, ligne_id, qte, None, None))
+
+    articles = []
+    lignes_vente = []
+    jours = set()
+
+    for art in Article.objects.filter(id__in=article_ids).only("id", "quantite_stock", "cout_moyen"):
+        events = sorted(achats[art.id] + ventes[art.id], key=lambda e: (e[0] is None, e[0] or 0, e[1], e[2]))
+
+        # stock d'ouverture = stock actuel - entrées + sorties (stock initial saisi à la main)
+        stock = int(art.quantite_stock) - sum(e[3] for e in achats[art.id]) + sum(e[3] for e in ventes[art.id])
+        cmp = Decimal("0")
+
+        for moment, kind, ligne_id, qte, val, cmd_created in events:
+            if kind == 0:
+                cmp = cmp_apres_entree(stock, cmp, qte, val)
+                stock += int(qte)
+            elif kind == 1:
+                stock -= int(qte)
+            elif maj_ventes and Decimal(val or 0) != cmp:
+                lignes_vente.append(LigneCommande(id=ligne_id, cout_unitaire=cmp))
+                if cmd_created:
+                    jours.add(timezone.localtime(cmd_created).date())
+
+        if art.cout_moyen != cmp:
+            art.cout_moyen = cmp
+            articles.append(art)
+
+    return articles, lignes_vente, jours
+
+
+@transaction.atomic
+def recalculer_cmp(article_ids: Iterable[int] | None = None, *, maj_ventes: bool = False, chunk: int = 200) -> dict:
+    """
+    Rejoue l'historique (achats + ventes) par ordre chronologique et recalcule Article.cout_moyen.
+    maj_ventes=True => réécrit aussi LigneCommande.cout_unitaire (coût figé de chaque vente).
+    Renvoie {"articles": nb CMP modifiés, "lignes_vente": nb lignes réécrites, "jours": jours de commande touchés}.
+    """
+    if article_ids is None:
+        ids = list(Article.objects.order_by("id").values_list("id", flat=True))
+    else:
+        ids = sorted({int(x) for x in article_ids if x})
+
+    stats = {"articles": 0, "lignes_vente": 0, "jours": set()}
+    for i in range(0, len(ids), chunk):
+        articles, lignes_vente, jours = _replay_chunk(ids[i:i + chunk], maj_ventes)
+        Article.objects.bulk_update(articles, ["cout_moyen"], batch_size=500)
+        LigneCommande.objects.bulk_update(lignes_vente, ["cout_unitaire"], batch_size=1000)
+        stats["articles"] += len(articles)
+        stats["lignes_vente"] += len(lignes_vente)
+        stats["jours"] |= jours
+
+    return stats
+
@@ -1,3 +1,115 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import F
 from django.test import TestCase
+from django.utils import timezone
+
+from article.models import Article
+from client.models import Client
+from livraison.models import FraisLivraison, LieuLivraison
+from vente.models import Commande, LigneCommande
+from vente.stock import transition_stock
+from achats.models import Achat
+from achats.serializers import AchatSerializer
+from achats.services.cmp import cmp_apres_entree, recalculer_cmp
+
+
+class CmpTests(TestCase):
+    """CMP incrémental (création d'achat) == rejeu chronologique de l'historique."""
+
+    def setUp(self):
+        self.article = Article.objects.create(nom_produit="Savon", reference="SAV", quantite_stock=0)
+        lieu = LieuLivraison.objects.create(nom="Lieu", categorie=LieuLivraison.Categorie.VILLE)
+        self.commande = Commande.objects.create(
+            client=Client.objects.create(nom="C", contact="034"),
+            lieu_livraison=lieu,
+            frais_livraison=FraisLivraison.objects.create(lieu=lieu),
+        )
+
+    def _acheter(self, qte: int, prix: int) -> Achat:
+        ser = AchatSerializer(data={
+            "fournisseur": "F",
+            "lignes": [{"article": self.article.id, "quantite": qte, "prix_achat_unitaire": prix,
+                        "prix_vente_unitaire": prix * 2, "maj_prix_article": False}],
+        })
+        ser.is_valid(raise_exception=True)
+        achat = ser.save()
+        self.article.refresh_from_db()
+        return achat
+
+    def _vendre(self, qte: int) -> LigneCommande:
+        """Ligne sur la commande ouverte: quantité réservée, stock physique inchangé."""
+        ligne = LigneCommande.objects.create(
+            commande=self.commande, article=self.article, quantite=qte,
+            prix_vente_unitaire=1000, cout_unitaire=self.article.cout_moyen,
+        )
+        Article.objects.filter(pk=self.article.pk).update(quantite_reservee=F("quantite_reservee") + qte)
+        self.article.refresh_from_db()
+        return ligne
+
+    def _livrer(self):
+        """Livraison de la commande: réservation débitée du stock (mouvement VENTE)."""
+        transition_stock({self.commande.id: (self.commande.statut, Commande.Statut.LIVREE)})
+        Commande.objects.filter(pk=self.commande.pk).update(statut=Commande.Statut.LIVREE)
+        self.commande.refresh_from_db()
+        self.article.refresh_from_db()
+
+    def test_formule(self):
+        self.assertEqual(cmp_apres_entree(0, 0, 10, 100), Decimal("100"))
+        self.assertEqual(cmp_apres_entree(6, 100, 10, 200), Decimal("162.5"))
+        self.assertEqual(cmp_apres_entree(-3, 100, 10, 200), Decimal("200"))
+        self.assertEqual(cmp_apres_entree(5, 100, 0, 999), Decimal("100"))
+
+    def test_incremental_puis_rejeu(self):
+        self._acheter(10, 100)
+        self.assertEqual(self.article.cout_moyen, Decimal("100"))
+
+        vente = self._vendre(4)
+        self.assertEqual(vente.cout_unitaire, Decimal("100"))
+        self._livrer()
+        self.assertEqual(self.article.quantite_stock, 6)
+
+        self._acheter(10, 200)
+        self.assertEqual(self.article.cout_moyen, Decimal("162.5"))
+
+        # rejeu: même CMP final, coût de vente inchangé
+        LigneCommande.objects.filter(pk=vente.pk).update(cout_unitaire=0)
+        stats = recalculer_cmp([self.article.id], maj_ventes=True)
+        self.article.refresh_from_db()
+        vente.refresh_from_db()
+        self.assertEqual(self.article.cout_moyen, Decimal("162.5"))
+        self.assertEqual(vente.cout_unitaire, Decimal("100"))
+        self.assertEqual(stats["lignes_vente"], 1)
+
+    def test_commande_ouverte_ne_sort_pas_du_stock(self):
+        # réservée mais pas livrée: le stock reste à 10 => CMP (10×100 + 10×200) / 20
+        self._acheter(10, 100)
+        vente = self._vendre(4)
+        self._acheter(10, 200)
+        self.assertEqual(self.article.cout_moyen, Decimal("150"))
+
+        recalculer_cmp([self.article.id], maj_ventes=True)
+        self.article.refresh_from_db()
+        vente.refresh_from_db()
+        self.assertEqual(self.article.cout_moyen, Decimal("150"))
+        self.assertEqual(vente.cout_unitaire, Decimal("100"))
+
+    def test_suppression_achat_rejoue(self):
+        self._acheter(10, 100)
+        self._vendre(4)
+        second = self._acheter(10, 200)
+
+        # achat antidaté avant la vente: il entre dans le CMP vendu
+        Achat.objects.filter(pk=second.pk).update(date_achat=timezone.localdate() - timedelta(days=3))
+        recalculer_cmp([self.article.id], maj_ventes=True)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.cout_moyen, Decimal("150"))
+        self.assertEqual(LigneCommande.objects.get().cout_unitaire, Decimal("150"))
 
-# Create your tests here.
+        second.delete()
+        recalculer_cmp([self.article.id])
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.cout_moyen, Decimal("100"))
@@ -1,9 +1,11 @@
 # achats/views.py
 from rest_framework import viewsets, permissions
+from django.db import transaction
 from django.db.models import Prefetch
 
 from .models import Achat, AchatLigne
 from .serializers import AchatSerializer
+from .services.cmp import recalculer_cmp
 
 
 class AchatViewSet(viewsets.ModelViewSet):
@@ -24,3 +26,9 @@ class AchatViewSet(viewsets.ModelViewSet):
         ctx = super().get_serializer_context()
         ctx["request"] = self.request
         return ctx
+
+    @transaction.atomic
+    def perform_destroy(self, instance: Achat):
+        article_ids = list(instance.lignes.values_list("article_id", flat=True))
+        instance.delete()
+        recalculer_cmp(article_ids)
@@ -0,0 +1,118 @@
+# api/idempotency.py
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.models import IdempotencyKey
+
+
+# =========================
+# Header Idempotency-Key (POST rejoués par des connexions instables)
+# =========================
+# - 1 ligne (utilisateur, scope, clé) réservée DANS la transaction de l'action
+#   => doublon concurrent: bloqué sur l'index unique jusqu'au commit du premier, puis rejoue sa réponse
+#   => action en échec (exception / 4xx / 5xx): réservation annulée, la clé reste réutilisable
+# - même clé + autre requête (empreinte méthode/chemin/corps) => 422
+# - réponse 2xx conservée IDEMPOTENCY_TTL secondes (purge: manage.py purge_idempotency_keys)
+# Sans header: comportement inchangé.
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "IDEMPOTENCY_TTL", 24 * 3600))
+
+
+def fingerprint(request) -> str:
+    data = request.data
+    if hasattr(data, "lists"):  # QueryDict (form / multipart)
+        data = {k: v for k, v in data.lists()}
+    raw = json.dumps([request.method, request.path, data], sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _replay(row: IdempotencyKey) -> Response:
+    resp = Response(row.response, status=row.status_code)
+    resp["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def idempotent(scope: str):
+    """
+    Décorateur d'action DRF (méthode de vue: self, request, ...), à placer sous @action.
+    L'action s'exécute dans la même transaction que la réservation de la clé.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = (request.headers.get(HEADER) or "").strip()
+            if not key:
+                return view_method(self, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {"detail": f"{HEADER} trop longue ({MAX_KEY_LENGTH} caractères max)."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            user = request.user if request.user.is_authenticated else None
+            empreinte = fingerprint(request)
+            now = timezone.now()
+
+            with transaction.atomic():
+                # clé expirée: libérée avant réservation
+                IdempotencyKey.objects.filter(user=user, scope=scope, key=key, expires_at__lte=now).delete()
+                try:
+                    with transaction.atomic():
+                        row = IdempotencyKey.objects.create(
+                            user=user, scope=scope, key=key, fingerprint=empreinte,
+                            expires_at=now + timedelta(seconds=_ttl()),
+                        )
+                except IntegrityError:
+                    row = IdempotencyKey.objects.get(user=user, scope=scope, key=key)
+                    if row.fingerprint != empreinte:
+                        return Response(
+                            {"detail": f"{HEADER} déjà utilisée pour une autre requête."},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        )
+                    if row.status_code is None:
+                        # SQLite / autre connexion sans verrou de ligne: premier appel pas encore terminé
+                        return Response(
+                            {"detail": "Requête identique en cours de traitement."},
+                            status=status.HTTP_409_CONFLICT,
+                        )
+                    return _replay(row)
+
+                resp = view_method(self, request, *args, **kwargs)
+                if 200 <= resp.status_code < 300:
+                    row.status_code = resp.status_code
+                    row.response = resp.data
+                    row.save(update_fields=["status_code", "response"])
+                else:
+                    row.delete()
+                return resp
+
+        return wrapper
+
+    return decorator
+
+
+def purge_expired(*, chunk: int = 5000) -> int:
+    """Supprime les clés expirées par lots (index expires_at). Renvoie le nombre de lignes supprimées."""
+    total = 0
+    now = timezone.now()
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list("id", flat=True)[:chunk])
+        if not ids:
+            return total
+        total += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
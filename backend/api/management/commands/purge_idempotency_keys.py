@@ -0,0 +1,17 @@
+# api/management/commands/purge_idempotency_keys.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from api.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Supprime les clés Idempotency-Key expirées (IDEMPOTENCY_TTL), par lots. À planifier (cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk", type=int, default=5000, help="Lignes supprimées par requête.")
+
+    def handle(self, *args, **opts):
+        n = purge_expired(chunk=opts["chunk"])
+        self.stdout.write(self.style.SUCCESS(f"{n} clé(s) expirée(s) supprimée(s)."))
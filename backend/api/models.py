@@ -1,3 +1,32 @@
+# api/models.py
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
-# Create your models here.
+
+class IdempotencyKey(models.Model):
+    """
+    Header Idempotency-Key (api/idempotency.py): 1 ligne par (utilisateur, endpoint, clé).
+    status_code NULL = requête en cours; sinon réponse rejouée telle quelle jusqu'à expires_at.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    scope = models.CharField(max_length=64)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # sha256(méthode, chemin, corps)
+
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "scope", "key"], name="uniq_idempotency_user_scope_key"),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="idx_idempotency_expires"),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key}"
@@ -0,0 +1,34 @@
+# article/management/commands/reconcile_stock.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from article.stock import iter_stock_ecarts, ajuster_journal
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie Article.quantite_stock contre le journal StockMouvement (SUM des deltas), en 1 passe streamée. "
+        "--fix écrit un mouvement AJUSTEMENT pour chaque écart (le stock n'est pas modifié)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Aligne le journal sur le stock actuel.")
+        parser.add_argument("--limit", type=int, default=50, help="Écarts affichés au maximum.")
+
+    def handle(self, *args, **opts):
+        ecarts = []
+        for article_id, stock, journal in iter_stock_ecarts():
+            if len(ecarts) < opts["limit"]:
+                self.stdout.write(f"article #{article_id}: stock={stock} journal={journal} (écart {stock - journal:+d})")
+            ecarts.append(article_id)
+
+        if not ecarts:
+            self.stdout.write(self.style.SUCCESS("Stock conforme au journal."))
+            return
+
+        if opts["fix"]:
+            n = ajuster_journal(ecarts)
+            self.stdout.write(self.style.SUCCESS(f"{n} ajustement(s) journalisé(s) sur {len(ecarts)} écart(s)."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(ecarts)} article(s) en écart (--fix pour ajuster le journal)."))
@@ -0,0 +1,33 @@
+# article/management/commands/snapshot_stock.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from article.stock import take_snapshots
+from vente.dates import day_start
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot périodique du stock (StockSnapshot) des articles ayant bougé depuis le précédent. "
+        "Défaut: début de la journée (minuit local), à lancer une fois par jour."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", default="", help="Snapshot au début de ce jour (YYYY-MM-DD). Défaut: aujourd'hui.")
+
+    def handle(self, *args, **opts):
+        jour = timezone.localdate()
+        if opts["date"]:
+            jour = parse_date(opts["date"])
+            if jour is None:
+                raise CommandError("--date: format YYYY-MM-DD attendu.")
+
+        at = day_start(jour)
+        try:
+            n = take_snapshots(at)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"{n} snapshot(s) de stock au {at:%Y-%m-%d %H:%M}."))
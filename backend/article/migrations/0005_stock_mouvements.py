@@ -0,0 +1,59 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def stock_initial(apps, schema_editor):
+    """Ouvre le journal: 1 mouvement INITIAL par article = stock actuel."""
+    Article = apps.get_model("article", "Article")
+    StockMouvement = apps.get_model("article", "StockMouvement")
+
+    batch = []
+    for article_id, qte in Article.objects.exclude(quantite_stock=0).values_list("id", "quantite_stock").iterator(chunk_size=1000):
+        batch.append(StockMouvement(article_id=article_id, delta=qte, source_type="INITIAL"))
+        if len(batch) >= 1000:
+            StockMouvement.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        StockMouvement.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0004_article_cout_moyen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMouvement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('source_type', models.CharField(choices=[('INITIAL', 'Stock initial'), ('VENTE', 'Vente (commande)'), ('ACHAT', 'Achat'), ('AJUSTEMENT', 'Ajustement')], max_length=20)),
+                ('source_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mouvements', to='article.article')),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['article', 'created_at'], name='stockmvt_article_date_idx'), models.Index(fields=['source_type', 'source_id'], name='stockmvt_source_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('at', models.DateTimeField()),
+                ('quantite', models.IntegerField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='article.article')),
+            ],
+            options={
+                'ordering': ['-at'],
+                'constraints': [models.UniqueConstraint(fields=('article', 'at'), name='stocksnapshot_article_at_uniq')],
+            },
+        ),
+        migrations.RunPython(stock_initial, migrations.RunPython.noop),
+    ]
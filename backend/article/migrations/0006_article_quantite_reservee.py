@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0005_stock_mouvements'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='quantite_reservee',
+            field=models.IntegerField(default=0),
+        ),
+    ]
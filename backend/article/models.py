@@ -1,5 +1,6 @@
 # articles/models.py
 from django.db import models
+from django.utils import timezone
 
 class Article(models.Model):
     nom_produit = models.CharField(max_length=180)
@@ -10,6 +11,11 @@ class Article(models.Model):
 
     # ✅ stock
     quantite_stock = models.IntegerField(default=0)
+    # ✅ réservé par les commandes ouvertes (EN_ATTENTE / EN_LIVRAISON), débité du stock à la livraison
+    quantite_reservee = models.IntegerField(default=0)
+
+    # ✅ coût moyen pondéré (CMP), tenu à jour par les achats (achats/services/cmp.py)
+    cout_moyen = models.DecimalField(max_digits=14, decimal_places=4, default=0)
 
     photo = models.ImageField(upload_to="articles/", blank=True, null=True)
 
@@ -21,3 +27,58 @@ class Article(models.Model):
 
     def __str__(self):
         return f"{self.nom_produit} ({self.reference})"
+
+    @property
+    def disponible(self) -> int:
+        return int(self.quantite_stock) - int(self.quantite_reservee)
+
+
+class StockMouvement(models.Model):
+    """
+    Journal (append-only) des variations de Article.quantite_stock.
+    Écrit en bulk par article/stock.py:apply_stock_deltas, jamais modifié ensuite.
+    stock(article, t) = SUM(delta) des mouvements created_at <= t
+    """
+    class Source(models.TextChoices):
+        INITIAL = "INITIAL", "Stock initial"
+        VENTE = "VENTE", "Vente (commande)"
+        ACHAT = "ACHAT", "Achat"
+        AJUSTEMENT = "AJUSTEMENT", "Ajustement"
+
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name="mouvements")
+    delta = models.IntegerField()
+
+    source_type = models.CharField(max_length=20, choices=Source.choices)
+    source_id = models.PositiveIntegerField(null=True, blank=True)
+
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["article", "created_at"], name="stockmvt_article_date_idx"),
+            models.Index(fields=["source_type", "source_id"], name="stockmvt_source_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.article_id} {self.delta:+d} ({self.source_type}#{self.source_id or '-'})"
+
+
+class StockSnapshot(models.Model):
+    """
+    Stock d'un article juste avant `at` (= SUM(delta) des mouvements created_at < at).
+    Pris périodiquement (commande snapshot_stock) pour les articles ayant bougé:
+    stock à t = dernier snapshot (at <= t) + mouvements [at, t].
+    """
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name="stock_snapshots")
+    at = models.DateTimeField()
+    quantite = models.IntegerField()
+
+    class Meta:
+        ordering = ["-at"]
+        constraints = [
+            models.UniqueConstraint(fields=["article", "at"], name="stocksnapshot_article_at_uniq"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.article_id} @ {self.at:%Y-%m-%d %H:%M} = {self.quantite}"
@@ -6,6 +6,9 @@ class ArticleSerializer(serializers.ModelSerializer):
     nom_produit = serializers.CharField(required=True, allow_blank=False)
     reference = serializers.CharField(required=True, allow_blank=False)
 
+    # ✅ stock - réservé (2 compteurs de la ligne article, tenus à jour par vente/stock.py)
+    disponible = serializers.IntegerField(read_only=True)
+
     # ✅ renvoyer URL complète si possible
     photo_url = serializers.SerializerMethodField(read_only=True)
 
@@ -17,12 +20,17 @@ class ArticleSerializer(serializers.ModelSerializer):
             "reference",
             "prix_achat",
             "prix_vente",
+            "cout_moyen",
+            "quantite_stock",
+            "quantite_reservee",
+            "disponible",
             "description",
             "photo",       # ✅ pour upload
             "photo_url",   # ✅ pour affichage
             "created_at",
             "updated_at",
         ]
+        read_only_fields = ["cout_moyen", "quantite_stock", "quantite_reservee"]
 
     def get_photo_url(self, obj: Article):
         request = self.context.get("request")
@@ -0,0 +1,246 @@
+# article/stock.py
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from django.db import transaction
+from django.dispatch import Signal
+from django.db.models import Case, When, Value, F, IntegerField, Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from article.models import Article, StockMouvement, StockSnapshot
+
+
+# =========================
+# Mouvements de stock groupés
+# =========================
+# - verrouillage: 1 SELECT ... FOR UPDATE, lignes triées par id
+#   => deux transactions sur les mêmes articles verrouillent dans le même ordre (pas de deadlock)
+# - écriture: 1 UPDATE quantite_stock (et/ou quantite_reservee) = ... + CASE id WHEN ... END
+#   + 1 INSERT groupé dans le journal StockMouvement (même transaction)
+
+
+# ✅ envoyé après chaque UPDATE groupé des compteurs (pas de post_save avec update()):
+#   stock_changed.send(sender=Article, deltas={article_id: Δstock}, reservations={article_id: Δréservé})
+stock_changed = Signal()
+
+
+def lock_articles(article_ids: Iterable[int]) -> dict[int, Article]:
+    """Verrouille (FOR UPDATE, ordre id croissant) et renvoie {id: article}. À appeler dans un atomic()."""
+    ids = sorted({int(x) for x in article_ids if x})
+    if not ids:
+        return {}
+    return {a.id: a for a in Article.objects.select_for_update().filter(id__in=ids).order_by("id")}
+
+
+def lock_stocks(article_ids: Iterable[int]) -> dict[int, int]:
+    """Comme lock_articles, mais ne relit que {id: quantite_stock} (articles déjà chargés ailleurs)."""
+    ids = sorted({int(x) for x in article_ids if x})
+    if not ids:
+        return {}
+    return dict(
+        Article.objects.select_for_update().filter(id__in=ids).order_by("id").values_list("id", "quantite_stock")
+    )
+
+
+def lock_disponibles(article_ids: Iterable[int]) -> dict[int, int]:
+    """Comme lock_stocks, mais renvoie {id: quantite_stock - quantite_reservee}."""
+    ids = sorted({int(x) for x in article_ids if x})
+    if not ids:
+        return {}
+    return {
+        article_id: stock - reserve
+        for article_id, stock, reserve in Article.objects.select_for_update().filter(id__in=ids).order_by("id")
+        .values_list("id", "quantite_stock", "quantite_reservee")
+    }
+
+
+def _case(deltas: dict[int, int]) -> Case:
+    return Case(
+        *[When(id=article_id, then=Value(d)) for article_id, d in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def apply_stock_deltas(
+    deltas: dict[int, int],
+    *,
+    source_type: str,
+    source_id: int | None = None,
+    reservations: dict[int, int] | None = None,
+) -> int:
+    """
+    quantite_stock += delta pour chaque article (delta négatif = sortie), en 1 UPDATE,
+    et journalise chaque delta (StockMouvement source_type/source_id).
+    reservations: quantite_reservee += delta dans le même UPDATE (non journalisé: le stock physique ne bouge pas).
+    Les articles doivent déjà être verrouillés (lock_articles) dans la transaction courante.
+    """
+    return apply_stock_mouvements(
+        [(article_id, d, source_id) for article_id, d in deltas.items()],
+        source_type=source_type,
+        reservations=reservations,
+    )
+
+
+def apply_stock_mouvements(
+    mouvements: Iterable[tuple[int, int, int | None]],
+    *,
+    source_type: str,
+    reservations: dict[int, int] | None = None,
+) -> int:
+    """
+    Comme apply_stock_deltas, pour plusieurs sources à la fois: mouvements = [(article_id, delta, source_id)].
+    1 ligne de journal par (article, source), 1 seul UPDATE (deltas cumulés par article).
+    """
+    rows = [(int(a), int(d), source_id) for a, d, source_id in mouvements if d]
+    reservations = {int(k): int(v) for k, v in (reservations or {}).items() if v}
+    if not (rows or reservations):
+        return 0
+
+    now = timezone.now()
+    StockMouvement.objects.bulk_create([
+        StockMouvement(article_id=a, delta=d, source_type=source_type, source_id=source_id, created_at=now)
+        for a, d, source_id in rows
+    ])
+
+    deltas: dict[int, int] = {}
+    for a, d, _ in rows:
+        deltas[a] = deltas.get(a, 0) + d
+    deltas = {a: d for a, d in deltas.items() if d}
+
+    fields = {"updated_at": now}
+    if deltas:
+        fields["quantite_stock"] = F("quantite_stock") + _case(deltas)
+    if reservations:
+        fields["quantite_reservee"] = F("quantite_reservee") + _case(reservations)
+    ids = {a for a, _, _ in rows} | reservations.keys()
+    n = Article.objects.filter(id__in=list(ids)).update(**fields)
+    stock_changed.send(sender=Article, deltas=deltas, reservations=reservations)
+    return n
+
+
+# =========================
+# Journal: stock à une date, snapshots, rapprochement
+# =========================
+# - snapshot (article, at) = SUM(delta) des mouvements created_at < at
+# - pris pour tous les articles ayant bougé depuis le snapshot précédent (instants croissants)
+#   => stock à t = dernier snapshot at <= t (index unique article, at) + mouvements [at, t]
+
+
+def stock_at(article_id: int, moment: datetime) -> int:
+    """Stock de l'article à l'instant `moment` (snapshot le plus proche + mouvements suivants)."""
+    snap = (
+        StockSnapshot.objects
+        .filter(article_id=article_id, at__lte=moment)
+        .order_by("-at")
+        .values_list("at", "quantite")
+        .first()
+    )
+    mouvements = StockMouvement.objects.filter(article_id=article_id, created_at__lte=moment)
+    base = 0
+    if snap:
+        mouvements = mouvements.filter(created_at__gte=snap[0])
+        base = snap[1]
+    return base + int(mouvements.aggregate(s=Sum("delta"))["s"] or 0)
+
+
+@transaction.atomic
+def take_snapshots(at: datetime, *, chunk: int = 500) -> int:
+    """
+    Snapshot à `at` des articles ayant des mouvements depuis le snapshot précédent.
+    `at` doit être postérieur au dernier snapshot existant. Renvoie le nombre de snapshots créés.
+    """
+    prev_at = StockSnapshot.objects.aggregate(m=Max("at"))["m"]
+    if prev_at and at <= prev_at:
+        raise ValueError(f"Snapshot déjà pris à {prev_at:%Y-%m-%d %H:%M}, `at` doit être postérieur.")
+
+    mouvements = StockMouvement.objects.filter(created_at__lt=at)
+    if prev_at:
+        mouvements = mouvements.filter(created_at__gte=prev_at)
+    deltas = (
+        mouvements
+        .order_by("article_id")
+        .values("article_id")
+        .annotate(total=Sum("delta"))
+        .values_list("article_id", "total")
+        .iterator(chunk_size=2000)
+    )
+
+    created = 0
+    batch: list[tuple[int, int]] = []
+
+    def flush():
+        nonlocal created
+        base = {}
+        if prev_at:
+            # dernier snapshot de chaque article (seek sur l'index unique article, at)
+            base = dict(
+                Article.objects.filter(id__in=[a for a, _ in batch])
+                .annotate(q=Subquery(
+                    StockSnapshot.objects.filter(article_id=OuterRef("pk")).order_by("-at").values("quantite")[:1]
+                ))
+                .values_list("id", "q")
+            )
+        StockSnapshot.objects.bulk_create([
+            StockSnapshot(article_id=a, at=at, quantite=int(base.get(a) or 0) + int(d)) for a, d in batch
+        ])
+        created += len(batch)
+        batch.clear()
+
+    for article_id, total in deltas:
+        batch.append((article_id, total))
+        if len(batch) >= chunk:
+            flush()
+    if batch:
+        flush()
+    return created
+
+
+def iter_stock_ecarts() -> Iterator[tuple[int, int, int]]:
+    """
+    Rapprochement en 1 passe: articles (par id) fusionnés avec SUM(delta) du journal (par article).
+    Renvoie (article_id, quantite_stock, stock_journal) pour chaque article en écart.
+    """
+    articles = Article.objects.order_by("id").values_list("id", "quantite_stock").iterator(chunk_size=2000)
+    journal = (
+        StockMouvement.objects
+        .order_by("article_id")
+        .values("article_id")
+        .annotate(total=Sum("delta"))
+        .values_list("article_id", "total")
+        .iterator(chunk_size=2000)
+    )
+    courant = next(journal, None)
+    for article_id, stock in articles:
+        total = 0
+        while courant is not None and courant[0] <= article_id:
+            if courant[0] == article_id:
+                total = int(courant[1] or 0)
+            courant = next(journal, None)
+        if total != stock:
+            yield article_id, stock, total
+
+
+@transaction.atomic
+def ajuster_journal(article_ids: Iterable[int]) -> int:
+    """
+    Aligne le journal sur quantite_stock (mouvement AJUSTEMENT = écart), écart revérifié sous verrou.
+    Le stock lui-même n'est pas modifié. Renvoie le nombre d'ajustements écrits.
+    """
+    stocks = lock_stocks(article_ids)
+    totaux = dict(
+        StockMouvement.objects.filter(article_id__in=list(stocks))
+        .order_by("article_id")
+        .values("article_id")
+        .annotate(total=Sum("delta"))
+        .values_list("article_id", "total")
+    )
+    ajustements = [
+        StockMouvement(article_id=a, delta=stock - int(totaux.get(a) or 0), source_type=StockMouvement.Source.AJUSTEMENT)
+        for a, stock in stocks.items()
+        if stock != int(totaux.get(a) or 0)
+    ]
+    StockMouvement.objects.bulk_create(ajustements)
+    return len(ajustements)
@@ -1,3 +1,68 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.db import transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from article.models import Article, StockMouvement, StockSnapshot
+from article.stock import apply_stock_deltas, stock_at, take_snapshots, iter_stock_ecarts, ajuster_journal
+from achats.serializers import AchatSerializer
+
+
+class StockJournalTests(TestCase):
+    """Journal StockMouvement: rapprochement, achats journalisés, stock à une date via snapshots."""
+
+    def setUp(self):
+        self.article = Article.objects.create(nom_produit="Savon", reference="SAV", quantite_stock=0)
+
+    def _mouvement(self, delta: int, moment):
+        with transaction.atomic():
+            apply_stock_deltas({self.article.id: delta}, source_type=StockMouvement.Source.AJUSTEMENT)
+        StockMouvement.objects.filter(pk=StockMouvement.objects.latest("id").pk).update(created_at=moment)
+
+    def test_achat_journalise_et_rapprochement(self):
+        ser = AchatSerializer(data={
+            "fournisseur": "F",
+            "lignes": [
+                {"article": self.article.id, "quantite": 4, "prix_achat_unitaire": 100, "maj_prix_article": False},
+                {"article": self.article.id, "quantite": 6, "prix_achat_unitaire": 100, "maj_prix_article": False},
+            ],
+        })
+        ser.is_valid(raise_exception=True)
+        achat = ser.save()
+
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.quantite_stock, 10)
+        self.assertEqual(
+            list(StockMouvement.objects.values_list("delta", "source_type", "source_id")),
+            [(10, StockMouvement.Source.ACHAT, achat.id)],
+        )
+        self.assertEqual(list(iter_stock_ecarts()), [])
+
+        # écart (stock modifié hors journal) détecté puis ajusté
+        Article.objects.filter(pk=self.article.pk).update(quantite_stock=7)
+        self.assertEqual(list(iter_stock_ecarts()), [(self.article.id, 7, 10)])
+        self.assertEqual(ajuster_journal([self.article.id]), 1)
+        self.assertEqual(list(iter_stock_ecarts()), [])
+
+    def test_stock_at_avec_snapshots(self):
+        t0 = timezone.now() - timedelta(days=10)
+        self._mouvement(50, t0)
+        self._mouvement(-20, t0 + timedelta(days=2))
+        self.assertEqual(take_snapshots(t0 + timedelta(days=3)), 1)
+        self._mouvement(-5, t0 + timedelta(days=4))
+        # article sans mouvement depuis le précédent => pas de nouveau snapshot
+        self.assertEqual(take_snapshots(t0 + timedelta(days=4, hours=1)), 1)
+        self.assertEqual(take_snapshots(t0 + timedelta(days=6)), 0)
+        self._mouvement(8, t0 + timedelta(days=7))
+
+        self.assertEqual(StockSnapshot.objects.order_by("at").last().quantite, 25)
+        with self.assertRaises(ValueError):
+            take_snapshots(t0)
 
-# Create your tests here.
+        attendu = {1: 50, 2: 30, 3: 30, 5: 25, 6: 25, 8: 33}
+        for jour, qte in attendu.items():
+            self.assertEqual(stock_at(self.article.id, t0 + timedelta(days=jour)), qte)
+        self.assertEqual(stock_at(self.article.id, t0 - timedelta(days=1)), 0)
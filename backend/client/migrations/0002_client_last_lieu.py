@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0001_initial'),
+        ('livraison', '0003_rename_frais_calculé_fraislivraison_frais_calcule_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='last_frais',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='last_lieu',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='livraison.lieulivraison'),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='last_precision_lieu',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
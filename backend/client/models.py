@@ -6,6 +6,13 @@ class Client(models.Model):
     adresse = models.CharField(max_length=255, blank=True, default="")
     contact = models.CharField(max_length=100, blank=True, default="")  # tel/email
 
+    # ✅ dernier lieu de livraison (dénormalisé depuis la dernière commande, vente/clients.py)
+    last_lieu = models.ForeignKey(
+        "livraison.LieuLivraison", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    last_frais = models.PositiveIntegerField(default=0)
+    last_precision_lieu = models.CharField(max_length=255, blank=True, default="")
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
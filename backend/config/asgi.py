@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# ✅ index d'autocomplétion construits au démarrage du serveur (pas au 1er appel)
+from vente.autocomplete import warm_up  # noqa: E402
+
+warm_up()
@@ -3,6 +3,8 @@ from pathlib import Path
 from datetime import timedelta
 import os
 
+from corsheaders.defaults import default_headers
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # =========================================================
@@ -110,6 +112,9 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173",
 ]
 
+# ✅ header Idempotency-Key (création commande, encaissement, programmation) autorisé en cross-origin
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+
 # Si tu utilises cookies cross-site un jour, active ceci :
 # CORS_ALLOW_CREDENTIALS = True
 
@@ -167,6 +172,40 @@ else:
         }
     }
 
+# =========================================================
+# ✅ CACHE (dashboard)
+# =========================================================
+# locmem: 1 process (dev)
+# file: partagé entre workers (gunicorn...), sans service externe
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem").lower()
+
+if CACHE_BACKEND == "file":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("CACHE_DIR", str(BASE_DIR / "cache")),
+            "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "20000"))},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "mbolafy-default",
+            "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "20000"))},
+        }
+    }
+
+DASHBOARD_CACHE_ALIAS = "default"
+# filet de sécurité (ex: coût d'achat d'un article modifié après coup)
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", str(24 * 3600)))
+
+# ✅ réponses Idempotency-Key conservées (api/idempotency.py), purge: manage.py purge_idempotency_keys
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+
+# ✅ autocomplétion (vente/autocomplete.py): index construits au démarrage du serveur (config/wsgi.py / asgi.py)
+SUGGEST_INDEX_WARMUP = os.getenv("SUGGEST_INDEX_WARMUP", "1") == "1"
+
 # =========================================================
 # ✅ PASSWORD VALIDATORS
 # =========================================================
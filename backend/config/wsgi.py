@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# ✅ index d'autocomplétion construits au démarrage du serveur (pas au 1er appel)
+from vente.autocomplete import warm_up  # noqa: E402
+
+warm_up()
@@ -0,0 +1,26 @@
+# conflivraison/management/commands/reconcile_livraisons.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from conflivraison.services.livraisons import commandes_sans_livraison, create_missing_livraisons
+
+
+class Command(BaseCommand):
+    help = (
+        "Crée les livraisons manquantes (commandes non finalisées avec date_livraison, sans suivi), "
+        "par lots groupés. Backfill après import / données antérieures à la création côté écriture."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Compte seulement les commandes concernées.")
+        parser.add_argument("--chunk", type=int, default=1000, help="Commandes traitées par lot.")
+
+    def handle(self, *args, **opts):
+        if opts["dry_run"]:
+            n = commandes_sans_livraison().count()
+            self.stdout.write(self.style.WARNING(f"{n} commande(s) sans livraison."))
+            return
+
+        n = create_missing_livraisons(chunk=opts["chunk"], message="Création via reconcile_livraisons")
+        self.stdout.write(self.style.SUCCESS(f"{n} livraison(s) créée(s)."))
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conflivraison', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='livraison',
+            index=models.Index(fields=['statut', 'date_prevue'], name='livraison_statut_date_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill(apps, schema_editor):
+    """last_event = événement d'id max, events_count = nombre d'événements (même calcul que services/events.py)."""
+    Livraison = apps.get_model("conflivraison", "Livraison")
+    LivraisonEvent = apps.get_model("conflivraison", "LivraisonEvent")
+
+    events = LivraisonEvent.objects.filter(livraison_id=OuterRef("pk")).order_by()
+    Livraison.objects.update(
+        last_event_id=Subquery(events.order_by("-id").values("id")[:1]),
+        events_count=Coalesce(
+            Subquery(events.values("livraison_id").annotate(n=Count("id")).values("n")[:1]),
+            Value(0),
+            output_field=IntegerField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conflivraison', '0002_livraison_livraison_statut_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livraison',
+            name='events_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='livraison',
+            name='last_event',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='conflivraison.livraisonevent'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conflivraison', '0003_livraison_last_event'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='livraison',
+            index=models.Index(fields=['date_prevue'], name='livraison_date_prevue_idx'),
+        ),
+    ]
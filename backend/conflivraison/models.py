@@ -44,11 +44,25 @@ class Livraison(models.Model):
         related_name="livraisons_updates",
     )
 
+    # ✅ Historique dénormalisé (tenu à jour par conflivraison/services/events.py)
+    # => la liste affiche le dernier événement sans charger tout l'historique
+    last_event = models.ForeignKey(
+        "LivraisonEvent",
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name="+",
+    )
+    events_count = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["statut", "date_prevue"], name="livraison_statut_date_idx"),
+            models.Index(fields=["date_prevue"], name="livraison_date_prevue_idx"),  # ✅ feuille de route du jour
+        ]
 
     def __str__(self) -> str:
         return f"Livraison #{self.id} (cmd:{self.commande_id}) - {self.statut}"
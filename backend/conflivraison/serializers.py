@@ -20,8 +20,8 @@ class LivraisonEventSerializer(serializers.ModelSerializer):
 
 
 class CommandeMiniSerializer(serializers.ModelSerializer):
-    total_commande = serializers.IntegerField(read_only=True)
-    total_articles = serializers.IntegerField(read_only=True)
+    total_commande = serializers.IntegerField(source="total_commande_cache", read_only=True)
+    total_articles = serializers.IntegerField(source="total_articles_cache", read_only=True)
 
     class Meta:
         model = Commande
@@ -42,7 +42,8 @@ class CommandeMiniSerializer(serializers.ModelSerializer):
 
 class LivraisonSerializer(serializers.ModelSerializer):
     commande_detail = CommandeMiniSerializer(source="commande", read_only=True)
-    events = LivraisonEventSerializer(many=True, read_only=True)
+    # ✅ dernier événement + compteur (dénormalisés); historique complet: action history (paginée)
+    last_event = LivraisonEventSerializer(read_only=True)
 
     class Meta:
         model = Livraison
@@ -56,21 +57,24 @@ class LivraisonSerializer(serializers.ModelSerializer):
             "raison",
             "commentaire",
             "updated_by",
-            "events",
+            "last_event",
+            "events_count",
             "created_at",
             "updated_at",
         ]
         extra_kwargs = {
             "commande": {"write_only": True},
             "updated_by": {"read_only": True},
+            "events_count": {"read_only": True},
         }
 
 
 # ✅ Pour afficher les commandes même si livraison inexistante
+# livraison_id / livraison_statut / date_prevue: annotations du queryset (LEFT JOIN suivi_livraison, pas de N+1)
 class CommandeProgrammationSerializer(serializers.ModelSerializer):
-    livraison_id = serializers.SerializerMethodField()
-    livraison_statut = serializers.SerializerMethodField()
-    date_prevue = serializers.SerializerMethodField()
+    livraison_id = serializers.IntegerField(read_only=True, allow_null=True)
+    livraison_statut = serializers.CharField(read_only=True, allow_null=True)
+    date_prevue = serializers.DateField(read_only=True, allow_null=True)
 
     class Meta:
         model = Commande
@@ -89,18 +93,6 @@ class CommandeProgrammationSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
 
-    def get_livraison_id(self, obj: Commande):
-        liv = getattr(obj, "suivi_livraison", None)
-        return liv.id if liv else None
-
-    def get_livraison_statut(self, obj: Commande):
-        liv = getattr(obj, "suivi_livraison", None)
-        return liv.statut if liv else None
-
-    def get_date_prevue(self, obj: Commande):
-        liv = getattr(obj, "suivi_livraison", None)
-        return liv.date_prevue if liv else None
-
 
 class LivraisonActionSerializer(serializers.Serializer):
     raison = serializers.CharField(required=False, allow_blank=True, default="")
@@ -108,6 +100,11 @@ class LivraisonActionSerializer(serializers.Serializer):
     date_prevue = serializers.DateField(required=False, allow_null=True)
 
 
+class BulkTransitionSerializer(LivraisonActionSerializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1, max_length=500)
+    statut = serializers.ChoiceField(choices=Livraison.Statut.choices)
+
+
 class ProgrammerCommandeSerializer(serializers.Serializer):
     commande_id = serializers.IntegerField()
     date_livraison = serializers.DateField(required=True)
@@ -0,0 +1,34 @@
+# conflivraison/services/events.py
+from __future__ import annotations
+
+from django.db.models import Case, F, IntegerField, Value, When
+
+from conflivraison.models import Livraison, LivraisonEvent
+
+
+# =========================
+# Écriture des événements livraison
+# =========================
+# Toujours passer par create_events: 1 INSERT groupé des événements
+# + 1 UPDATE des livraisons (last_event = plus récent, events_count += n), même transaction.
+# Événement supprimé à la main: last_event => NULL (SET_NULL), events_count non recalculé.
+
+
+def create_events(events: list[LivraisonEvent]) -> list[LivraisonEvent]:
+    if not events:
+        return []
+    events = LivraisonEvent.objects.bulk_create(events)
+
+    last: dict[int, int] = {}
+    counts: dict[int, int] = {}
+    for ev in events:
+        last[ev.livraison_id] = max(last.get(ev.livraison_id, 0), ev.id)
+        counts[ev.livraison_id] = counts.get(ev.livraison_id, 0) + 1
+
+    Livraison.objects.filter(id__in=list(last)).update(
+        last_event_id=Case(*[When(id=k, then=Value(v)) for k, v in last.items()], output_field=IntegerField()),
+        events_count=F("events_count") + Case(
+            *[When(id=k, then=Value(v)) for k, v in counts.items()], default=Value(0), output_field=IntegerField(),
+        ),
+    )
+    return events
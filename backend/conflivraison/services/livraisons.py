@@ -0,0 +1,99 @@
+# conflivraison/services/livraisons.py
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from conflivraison.models import Livraison, LivraisonEvent
+from conflivraison.services.events import create_events
+from vente.models import Commande
+
+
+# =========================
+# Création des livraisons manquantes (côté écriture)
+# =========================
+# - appelée quand une commande reçoit une date_livraison (CommandeSerializer)
+# - rattrapage / backfill: manage.py reconcile_livraisons (ou POST sync-from-commandes)
+# - commandes non finalisées, datées, sans livraison => 1 INSERT groupé de livraisons + 1 d'événements
+# - concurrence: les commandes du lot sont verrouillées (ordre id) puis l'anti-jointure est rejouée,
+#   comme la programmation d'une commande (qui crée sa livraison sous le même verrou)
+#   => 2 appels simultanés ne tentent jamais d'insérer la même livraison (OneToOne)
+# Le listing des livraisons reste une lecture pure.
+
+FINALS = (Commande.Statut.LIVREE, Commande.Statut.ANNULEE)
+
+
+def commandes_sans_livraison(commande_ids: Iterable[int] | None = None):
+    """(id, date_livraison) des commandes non finalisées, datées, sans livraison (anti-jointure)."""
+    qs = (
+        Commande.objects
+        .exclude(statut__in=FINALS)
+        .filter(date_livraison__isnull=False)
+        .filter(~Exists(Livraison.objects.filter(commande_id=OuterRef("pk"))))
+    )
+    if commande_ids is not None:
+        qs = qs.filter(id__in=[int(x) for x in commande_ids if x])
+    return qs.order_by("id").values_list("id", "date_livraison")
+
+
+def _lock_commandes(ids: list[int]) -> None:
+    list(Commande.objects.select_for_update().filter(id__in=ids).order_by("id").values_list("id", flat=True))
+
+
+@transaction.atomic
+def create_missing_livraisons(
+    commande_ids: Iterable[int] | None = None,
+    *,
+    actor=None,
+    message: str = "Création du suivi livraison",
+    chunk: int = 1000,
+) -> int:
+    """
+    Crée les livraisons (A_PREPARER, date_prevue = date_livraison) des commandes `commande_ids`
+    (toutes si None) qui n'en ont pas encore, avec leur événement de création. Renvoie le nombre créé.
+    """
+    if commande_ids is not None:
+        commande_ids = list(commande_ids)
+        if not commande_ids:
+            return 0
+    actor = actor if actor and getattr(actor, "is_authenticated", False) else None
+
+    created = 0
+    last_id = 0
+    while True:
+        # pagination keyset sur l'id (pas de curseur ouvert pendant les INSERT)
+        rows = list(commandes_sans_livraison(commande_ids).filter(id__gt=last_id)[:chunk])
+        if not rows:
+            return created
+        last_id = rows[-1][0]
+
+        # ✅ verrou puis re-lecture: une livraison créée entre-temps (commitée) est vue ici
+        ids = [commande_id for commande_id, _ in rows]
+        _lock_commandes(ids)
+        rows = list(commandes_sans_livraison(ids))
+        if not rows:
+            continue
+
+        livraisons = Livraison.objects.bulk_create([
+            Livraison(
+                commande_id=commande_id,
+                statut=Livraison.Statut.A_PREPARER,
+                date_prevue=date_livraison,
+                updated_by=actor,
+            )
+            for commande_id, date_livraison in rows
+        ])
+        create_events([
+            LivraisonEvent(
+                livraison=liv,
+                from_statut="",
+                to_statut=liv.statut,
+                actor=actor,
+                message=message,
+                meta={"commande_id": liv.commande_id},
+            )
+            for liv in livraisons
+        ])
+        created += len(livraisons)
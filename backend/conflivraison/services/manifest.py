@@ -0,0 +1,229 @@
+# conflivraison/services/manifest.py
+from __future__ import annotations
+
+import csv
+from datetime import date
+from itertools import groupby
+from typing import Iterator
+
+from django.db.models import Case, IntegerField, Value, When
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+from conflivraison.models import Livraison
+from encaissement.models import Encaissement
+from facturation.services.pdf_base import ar, draw_printed_footer, render_pdf_bytes
+from livraison.models import LieuLivraison
+
+
+# =========================
+# Feuille de route du jour (manifest)
+# =========================
+# - livraisons date_prevue = jour (hors annulées), groupées catégorie de lieu > lieu (id, trié par nom) > n° commande
+# - 1 seule requête: values_list + iterator() (pas d'instances, pas de N+1)
+#   commande / lieu / frais: FK, encaissement: one-to-one inverse (LEFT JOIN, absent = en attente)
+# - montant à encaisser = total_commande_cache (articles + frais), 0 si encaissement PAYEE
+# - CSV: lignes générées au fil du curseur (StreamingHttpResponse)
+# - PDF: même curseur, dessiné ligne à ligne (reportlab n'écrit le fichier qu'au save())
+
+COLUMNS = (
+    "id", "statut", "commande_id",
+    "commande__client_nom", "commande__client_contact", "commande__client_adresse",
+    "commande__lieu_livraison__categorie", "commande__lieu_livraison_id", "commande__lieu_livraison__nom",
+    "commande__precision_lieu",
+    "commande__total_commande_cache", "commande__frais_livraison__frais_final",
+    "commande__encaissement__statut", "commande__encaissement__mode",
+)
+
+CSV_HEADER = (
+    "Catégorie", "Lieu", "Livraison", "Commande", "Statut livraison",
+    "Client", "Contact", "Adresse", "Précision lieu",
+    "Total", "Frais", "Paiement", "Mode", "À encaisser",
+)
+
+_CATEGORIES = {value: label for value, label in LieuLivraison.Categorie.choices}
+_PAIEMENTS = {value: label for value, label in Encaissement.StatutPaiement.choices}
+_MODES = {value: label for value, label in Encaissement.ModePaiement.choices}
+_STATUTS = {value: label for value, label in Livraison.Statut.choices}
+
+
+def manifest_rows(jour: date, *, chunk: int = 500) -> Iterator[dict]:
+    """Livraisons du jour dans l'ordre de la feuille de route, 1 dict par livraison."""
+    ordre_categorie = Case(
+        *[When(commande__lieu_livraison__categorie=c, then=Value(i)) for i, c in enumerate(_CATEGORIES)],
+        default=Value(len(_CATEGORIES)),
+        output_field=IntegerField(),
+    )
+    qs = (
+        Livraison.objects.filter(date_prevue=jour)
+        .exclude(statut=Livraison.Statut.ANNULEE)
+        .order_by(ordre_categorie, "commande__lieu_livraison__nom", "commande__lieu_livraison_id", "commande_id")
+        .values_list(*COLUMNS)
+    )
+    for (
+        livraison_id, statut, commande_id,
+        client_nom, client_contact, client_adresse,
+        categorie, lieu_id, lieu, precision_lieu,
+        total, frais, paiement, mode,
+    ) in qs.iterator(chunk_size=chunk):
+        paiement = paiement or Encaissement.StatutPaiement.EN_ATTENTE
+        total = int(total or 0)
+        yield {
+            "livraison_id": livraison_id,
+            "statut": statut,
+            "commande_id": commande_id,
+            "client_nom": client_nom or "",
+            "client_contact": client_contact or "",
+            "client_adresse": client_adresse or "",
+            "categorie": categorie or LieuLivraison.Categorie.AUTRE,
+            "lieu_id": lieu_id,
+            "lieu": lieu or "",
+            "precision_lieu": precision_lieu or "",
+            "total": total,
+            "frais": int(frais or 0),
+            "paiement": paiement,
+            "mode": mode or "",
+            "a_encaisser": 0 if paiement == Encaissement.StatutPaiement.PAYEE else total,
+        }
+
+
+# -------------------------
+# CSV
+# -------------------------
+class _Echo:
+    """Pseudo-fichier: csv.writer renvoie la ligne au lieu de l'écrire."""
+
+    def write(self, value):
+        return value
+
+
+def manifest_csv(jour: date) -> Iterator[str]:
+    writer = csv.writer(_Echo(), delimiter=";")
+    yield "\ufeff"  # ✅ BOM: accents lisibles dans Excel
+    yield writer.writerow(CSV_HEADER)
+    for r in manifest_rows(jour):
+        yield writer.writerow((
+            _CATEGORIES.get(r["categorie"], r["categorie"]), r["lieu"], r["livraison_id"], r["commande_id"],
+            _STATUTS.get(r["statut"], r["statut"]),
+            r["client_nom"], r["client_contact"], r["client_adresse"], r["precision_lieu"],
+            r["total"], r["frais"], _PAIEMENTS.get(r["paiement"], r["paiement"]), _MODES.get(r["mode"], r["mode"]),
+            r["a_encaisser"],
+        ))
+
+
+# -------------------------
+# PDF (socle A4 / montants / pied de page partagé avec les factures: facturation/services/pdf_base.py)
+# -------------------------
+def render_manifest_pdf_bytes(jour: date) -> bytes:
+    return render_pdf_bytes(lambda c: draw_manifest_on_canvas(c, jour))
+
+
+def draw_manifest_on_canvas(c: canvas.Canvas, jour: date):
+    width, height = A4
+    margin = 12 * mm
+
+    col_cmd = margin
+    col_client = margin + 18 * mm
+    col_contact = margin + 70 * mm
+    col_precision = margin + 102 * mm
+    col_paiement = width - margin - 42 * mm
+    col_total = width - margin - 22 * mm
+    col_du = width - margin
+
+    page = 0
+    y = 0.0
+
+    def new_page():
+        nonlocal page, y
+        if page:
+            c.showPage()
+        page += 1
+        y = height - margin
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(margin, y - 5 * mm, f"Feuille de route du {jour.strftime('%d/%m/%Y')}")
+        c.setFont("Helvetica", 8)
+        c.drawRightString(width - margin, y - 5 * mm, f"Page {page}")
+        draw_printed_footer(c)
+        y -= 10 * mm
+        c.line(margin, y, width - margin, y)
+        y -= 6 * mm
+
+    def need(h: float):
+        if y - h < 15 * mm:
+            new_page()
+
+    def row_header():
+        nonlocal y
+        c.setFont("Helvetica-Bold", 8)
+        c.drawString(col_cmd, y, "Cmd")
+        c.drawString(col_client, y, "Client")
+        c.drawString(col_contact, y, "Contact")
+        c.drawString(col_precision, y, "Précision")
+        c.drawString(col_paiement, y, "Paiement")
+        c.drawRightString(col_total, y, "Total")
+        c.drawRightString(col_du, y, "À encaisser")
+        y -= 5 * mm
+
+    def subtotal(label: str, n: int, du: int):
+        nonlocal y
+        need(6 * mm)
+        c.setFont("Helvetica-Bold", 9)
+        c.drawString(col_client, y, f"{label}: {n} livraison(s)")
+        c.drawRightString(col_du, y, ar(du))
+        y -= 7 * mm
+
+    new_page()
+    total_n = total_du = 0
+    for categorie, rows_cat in groupby(manifest_rows(jour), key=lambda r: r["categorie"]):
+        need(18 * mm)
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(margin, y, _CATEGORIES.get(categorie, categorie))
+        y -= 7 * mm
+        cat_n = cat_du = 0
+
+        # ✅ groupé par id (le nom n'est qu'affiché): un sous-total = un lieu
+        for (_, lieu), rows_lieu in groupby(rows_cat, key=lambda r: (r["lieu_id"], r["lieu"])):
+            need(16 * mm)
+            c.setFont("Helvetica-Bold", 10)
+            c.drawString(margin, y, lieu or "-")
+            y -= 5 * mm
+            row_header()
+            lieu_n = lieu_du = 0
+
+            for r in rows_lieu:
+                if y < 20 * mm:
+                    new_page()
+                    row_header()
+                c.setFont("Helvetica", 8)
+                c.drawString(col_cmd, y, f"#{r['commande_id']}")
+                c.drawString(col_client, y, r["client_nom"][:32] or "-")
+                c.drawString(col_contact, y, r["client_contact"][:20] or "-")
+                c.drawString(col_precision, y, r["precision_lieu"][:30] or "-")
+                c.drawString(col_paiement, y, _PAIEMENTS.get(r["paiement"], r["paiement"]))
+                c.drawRightString(col_total, y, ar(r["total"]))
+                c.drawRightString(col_du, y, ar(r["a_encaisser"]))
+                y -= 4 * mm
+                if r["client_adresse"]:
+                    c.setFont("Helvetica-Oblique", 7)
+                    c.drawString(col_client, y, r["client_adresse"][:90])
+                    y -= 4 * mm
+                lieu_n += 1
+                lieu_du += r["a_encaisser"]
+
+            subtotal(lieu or "-", lieu_n, lieu_du)
+            cat_n += lieu_n
+            cat_du += lieu_du
+
+        subtotal(f"Total {_CATEGORIES.get(categorie, categorie)}", cat_n, cat_du)
+        total_n += cat_n
+        total_du += cat_du
+
+    need(10 * mm)
+    c.line(margin, y + 3 * mm, width - margin, y + 3 * mm)
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(margin, y - 3 * mm, f"{total_n} livraison(s)")
+    c.drawRightString(col_du, y - 3 * mm, f"À encaisser: {ar(total_du)}")
+
+    c.showPage()
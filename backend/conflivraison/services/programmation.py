@@ -0,0 +1,45 @@
+# conflivraison/services/programmation.py
+from __future__ import annotations
+
+from datetime import date
+
+from django.db.models import Count, QuerySet
+
+from livraison.models import LieuLivraison
+
+
+# =========================
+# Programmation des commandes (calendrier)
+# =========================
+
+# colonnes lues par CommandeProgrammationSerializer (le reste: annotations suivi_livraison__*)
+PROGRAMMATION_FIELDS = (
+    "id", "statut", "date_livraison", "precision_lieu",
+    "client_nom", "client_contact", "client_adresse", "created_at", "updated_at",
+)
+
+
+def capacite_par_date(qs: QuerySet, *, depuis: date | None = None) -> list[dict]:
+    """
+    Commandes par date_livraison et catégorie de lieu, sur le queryset déjà filtré de la liste
+    (1 GROUP BY). depuis: ignore les dates antérieures. Trié par date.
+    [{"date": "2026-03-02", "total": 7, "categories": {"VILLE": 5, "PROVINCE": 2}}, ...]
+    """
+    qs = qs.filter(date_livraison__isnull=False)
+    if depuis:
+        qs = qs.filter(date_livraison__gte=depuis)
+    rows = (
+        qs.order_by()
+        .values("date_livraison", "lieu_livraison__categorie")
+        .annotate(n=Count("id"))
+        .values_list("date_livraison", "lieu_livraison__categorie", "n")
+        .order_by("date_livraison")
+    )
+
+    out: dict[date, dict] = {}
+    for jour, categorie, n in rows:
+        item = out.setdefault(jour, {"date": jour.isoformat(), "total": 0, "categories": {}})
+        categorie = categorie or LieuLivraison.Categorie.AUTRE
+        item["categories"][categorie] = item["categories"].get(categorie, 0) + n
+        item["total"] += n
+    return list(out.values())
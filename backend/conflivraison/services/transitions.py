@@ -0,0 +1,209 @@
+# conflivraison/services/transitions.py
+from __future__ import annotations
+
+import json
+from typing import Iterable
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from conflivraison.models import Livraison, LivraisonEvent
+from conflivraison.services.events import create_events
+from dashboard.services.facts import commande_day
+from dashboard.signals import mark_days_dirty
+from vente.models import Commande
+from vente.stock import transition_stock
+
+
+# =========================
+# Helpers statuts Commande
+# =========================
+def cmd_statut(name: str):
+    return getattr(Commande.Statut, name, None)
+
+
+def cmd_final_statuts() -> list[str]:
+    ann = cmd_statut("ANNULEE") or cmd_statut("ANNULE")
+    liv = cmd_statut("LIVREE")
+    return [s for s in [ann, liv] if s]
+
+
+def cmd_annule_statut() -> str | None:
+    return cmd_statut("ANNULEE") or cmd_statut("ANNULE")
+
+
+def cmd_confirmee_statut() -> str | None:
+    return cmd_statut("CONFIRMEE")
+
+
+def cmd_brouillon_statut() -> str | None:
+    return cmd_statut("BROUILLON")
+
+
+def cmd_en_livraison_statut() -> str | None:
+    return cmd_statut("EN_LIVRAISON")
+
+
+def cmd_livree_statut() -> str | None:
+    return cmd_statut("LIVREE")
+
+
+# =========================
+# JSON SAFE (FIX)
+# =========================
+def json_safe(value):
+    """
+    Convertit les objets non JSON (date/datetime/Decimal/UUID, etc.)
+    en types sérialisables pour JSONField.
+    """
+    if value is None:
+        return None
+    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+
+
+def is_final(statut: str) -> bool:
+    return statut in [Livraison.Statut.LIVREE, Livraison.Statut.ANNULEE]
+
+
+# =========================
+# Transition de statut (en mémoire)
+# =========================
+# champs modifiés par apply_transition (jamais last_event / events_count: services/events.py)
+TRANSITION_FIELDS = ["statut", "raison", "commentaire", "date_prevue", "date_reelle", "updated_by", "updated_at"]
+
+def apply_transition(livraison: Livraison, cmd: Commande, new_statut: str, payload: dict, actor) -> str:
+    """
+    Modifie `livraison` et `cmd` (statut relu sous verrou) pour passer la livraison à `new_statut`.
+    Rien n'est écrit. Renvoie l'ancien statut de la livraison; ValueError si transition refusée.
+    """
+    if is_final(livraison.statut):
+        raise ValueError("Cette livraison est déjà finalisée (livrée/annulée).")
+
+    valid_statuts = {s for (s, _) in Livraison.Statut.choices}
+    if new_statut not in valid_statuts:
+        raise ValueError(f"Statut invalide: {new_statut}")
+
+    st_en_liv = cmd_en_livraison_statut()
+    st_livree = cmd_livree_statut()
+    st_annule = cmd_annule_statut()
+    st_conf = cmd_confirmee_statut()
+    if new_statut == Livraison.Statut.ANNULEE and not st_annule:
+        raise ValueError("Statut commande annulation introuvable (ANNULEE/ANNULE).")
+
+    from_statut = livraison.statut
+
+    livraison.statut = new_statut
+    livraison.raison = payload.get("raison", livraison.raison) or ""
+    livraison.commentaire = payload.get("commentaire", livraison.commentaire) or ""
+
+    if "date_prevue" in payload:
+        livraison.date_prevue = payload.get("date_prevue")
+
+    if new_statut == Livraison.Statut.LIVREE and not livraison.date_prevue:
+        livraison.date_prevue = timezone.localdate()
+
+    if new_statut == Livraison.Statut.LIVREE:
+        livraison.date_reelle = timezone.now()
+
+    if new_statut in [Livraison.Statut.ANNULEE, Livraison.Statut.REPORTEE]:
+        livraison.date_reelle = None
+
+    livraison.updated_by = actor if actor and getattr(actor, "is_authenticated", False) else None
+
+    # ---- sync commande ----
+    if new_statut == Livraison.Statut.EN_LIVRAISON:
+        if st_en_liv:
+            cmd.statut = st_en_liv
+
+    elif new_statut == Livraison.Statut.LIVREE:
+        if st_livree:
+            cmd.statut = st_livree
+        if not getattr(cmd, "date_livraison", None) and livraison.date_prevue:
+            cmd.date_livraison = livraison.date_prevue
+
+    elif new_statut == Livraison.Statut.ANNULEE:
+        cmd.statut = st_annule
+
+    elif new_statut == Livraison.Statut.REPORTEE:
+        if st_en_liv and st_conf and cmd.statut == st_en_liv:
+            cmd.statut = st_conf
+
+    return from_statut
+
+
+def _event(livraison: Livraison, from_statut: str, actor, meta: dict) -> LivraisonEvent:
+    return LivraisonEvent(
+        livraison=livraison,
+        from_statut=from_statut or "",
+        to_statut=livraison.statut or "",
+        actor=actor if actor and getattr(actor, "is_authenticated", False) else None,
+        message=f"Changement statut: {from_statut} -> {livraison.statut}",
+        meta=meta,
+    )
+
+
+# =========================
+# Transition groupée (fin de tournée)
+# =========================
+# - 1 SELECT ... FOR UPDATE des livraisons, puis 1 des commandes (ordre id)
+#   même ordre que _set_statut (livraison puis commande) => pas d'interblocage entre les 2 chemins
+# - transitions validées en mémoire, refus par id sans bloquer les autres
+# - 1 transition_stock, 2 bulk_update (livraisons, commandes), 1 bulk_create d'événements
+# - bulk_update => pas de post_save: dashboard invalidé explicitement (mark_days_dirty)
+
+
+@transaction.atomic
+def bulk_transition(ids: Iterable[int], new_statut: str, payload: dict, actor) -> list[dict]:
+    """
+    Passe les livraisons `ids` à `new_statut`. Renvoie 1 résultat par id (ordre reçu):
+    {"id", "ok": True, "statut", "commande_statut"} ou {"id", "ok": False, "detail"}.
+    """
+    ids = list(dict.fromkeys(int(x) for x in ids))
+    livraisons = {
+        liv.id: liv
+        for liv in Livraison.objects.select_for_update().filter(id__in=ids).order_by("id")
+    }
+    commandes = {
+        cmd.id: cmd
+        for cmd in Commande.objects.select_for_update()
+        .filter(id__in=[liv.commande_id for liv in livraisons.values()])
+        .order_by("id")
+        .only("id", "statut", "date_livraison", "created_at", "updated_at")
+    }
+
+    results, ok, changes = [], [], {}
+    for livraison_id in ids:
+        liv = livraisons.get(livraison_id)
+        if liv is None:
+            results.append({"id": livraison_id, "ok": False, "detail": "Livraison introuvable."})
+            continue
+        cmd = commandes[liv.commande_id]
+        statut_avant = cmd.statut
+        try:
+            from_statut = apply_transition(liv, cmd, new_statut, payload, actor)
+        except ValueError as e:
+            results.append({"id": livraison_id, "ok": False, "detail": str(e)})
+            continue
+        changes[cmd.id] = (statut_avant, cmd.statut)
+        ok.append((liv, cmd, from_statut))
+        results.append({"id": livraison_id, "ok": True, "statut": liv.statut, "commande_statut": cmd.statut})
+
+    if not ok:
+        return results
+
+    # ✅ stock: réservations débitées (LIVREE) ou libérées (ANNULEE), toutes commandes en 1 passe
+    transition_stock(changes)
+
+    now = timezone.now()
+    for liv, cmd, _ in ok:
+        liv.updated_at = now
+        cmd.updated_at = now
+    Livraison.objects.bulk_update([liv for liv, _, _ in ok], TRANSITION_FIELDS)
+    Commande.objects.bulk_update([cmd for _, cmd, _ in ok], ["statut", "date_livraison", "updated_at"])
+
+    meta = json_safe({"payload": payload, "bulk": True})
+    create_events([_event(liv, from_statut, actor, meta) for liv, _, from_statut in ok])
+
+    mark_days_dirty([commande_day(cmd.created_at) for _, cmd, _ in ok])
+    return results
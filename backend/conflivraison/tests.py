@@ -1,3 +1,275 @@
+from __future__ import annotations
+
+from datetime import date
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from article.models import Article
+from client.models import Client
+from conflivraison.models import Livraison, LivraisonEvent
+from conflivraison.services import livraisons as livraisons_service
+from conflivraison.services.manifest import manifest_rows
+from conflivraison.views import LivraisonViewSet
+from encaissement.models import Encaissement
+from livraison.models import FraisLivraison, LieuLivraison
+from vente.models import Commande
+from vente.serializers import CommandeSerializer
+
+
+class LivraisonCreationTests(TestCase):
+    """Livraisons créées à l'écriture (conflivraison/services/livraisons.py), listing en lecture pure."""
+
+    def setUp(self):
+        self.lieu = LieuLivraison.objects.create(nom="Lieu", categorie=LieuLivraison.Categorie.VILLE)
+        self.article = Article.objects.create(nom_produit="P", reference="P", prix_vente=1000, quantite_stock=10)
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user(username="u", email="u@x.mg", password="x"))
+
+    def _commande(self, **extra) -> Commande:
+        return Commande.objects.create(
+            client=Client.objects.create(nom="C"), lieu_livraison=self.lieu,
+            frais_livraison=FraisLivraison.objects.create(lieu=self.lieu), **extra,
+        )
+
+    def test_created_on_write_and_backfilled(self):
+        ser = CommandeSerializer(data={
+            "client_input": {"nom": "C"}, "lieu_input": {"id": self.lieu.id}, "date_livraison": "2026-03-02",
+            "lignes": [{"article": self.article.id, "quantite": 1}],
+        })
+        ser.is_valid(raise_exception=True)
+        cmd = ser.save()
+        liv = Livraison.objects.get(commande=cmd)
+        self.assertEqual((liv.statut, liv.date_prevue), (Livraison.Statut.A_PREPARER, date(2026, 3, 2)))
+        self.assertEqual(LivraisonEvent.objects.filter(livraison=liv).count(), 1)
+
+        # commandes écrites hors serializer: plus de création au listing, rattrapage par la commande
+        oubliee = self._commande(date_livraison=date(2026, 3, 3))
+        self._commande()  # sans date
+        self._commande(date_livraison=date(2026, 3, 3), statut=Commande.Statut.ANNULEE)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.api.get("/api/conflivraison/livraisons/").status_code, 200)
+        self.assertFalse(any(q["sql"].startswith("INSERT") for q in ctx.captured_queries))
+
+        call_command("reconcile_livraisons", stdout=StringIO())
+        self.assertEqual(
+            sorted(Livraison.objects.values_list("commande_id", flat=True)), [cmd.id, oubliee.id],
+        )
+        self.assertEqual(LivraisonEvent.objects.count(), 2)
+
+    def test_rechecks_after_locking_commandes(self):
+        a = self._commande(date_livraison=date(2026, 3, 3))
+        b = self._commande(date_livraison=date(2026, 3, 3))
+        lock = livraisons_service._lock_commandes
+
+        def concurrent_then_lock(ids):
+            # une autre transaction a créé (et commité) la livraison de `a` avant qu'on obtienne le verrou
+            Livraison.objects.create(commande=a, statut=Livraison.Statut.A_PREPARER, date_prevue=a.date_livraison)
+            lock(ids)
+
+        with mock.patch.object(livraisons_service, "_lock_commandes", side_effect=concurrent_then_lock):
+            self.assertEqual(livraisons_service.create_missing_livraisons(), 1)
+        self.assertEqual(Livraison.objects.filter(commande__in=[a, b]).count(), 2)
+        self.assertEqual(list(LivraisonEvent.objects.values_list("livraison__commande_id", flat=True)), [b.id])
+
+
+class BulkTransitionTests(TestCase):
+    """POST bulk-transition: verrous et écritures groupés, résultat par id."""
+
+    def setUp(self):
+        self.lieu = LieuLivraison.objects.create(nom="Lieu", categorie=LieuLivraison.Categorie.VILLE)
+        self.article = Article.objects.create(nom_produit="P", reference="P", prix_vente=1000, quantite_stock=100)
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user(username="u", email="u@x.mg", password="x"))
+
+    def _livraisons(self, n: int) -> list[int]:
+        ids = []
+        for _ in range(n):
+            ser = CommandeSerializer(data={
+                "client_input": {"nom": "C"}, "lieu_input": {"id": self.lieu.id}, "date_livraison": "2026-03-02",
+                "lignes": [{"article": self.article.id, "quantite": 2}],
+            })
+            ser.is_valid(raise_exception=True)
+            ids.append(ser.save().suivi_livraison.id)
+        return ids
+
+    def _post(self, ids, statut):
+        return self.api.post(
+            "/api/conflivraison/livraisons/bulk-transition/", {"ids": ids, "statut": statut}, format="json",
+        ).json()
+
+    def test_bulk_livrer(self):
+        a, b, c = self._livraisons(3)
+        self.api.post(f"/api/conflivraison/livraisons/{c}/annuler/", {})
+
+        data = self._post([a, b, c, 999999], Livraison.Statut.LIVREE)
+        self.assertEqual((data["updated"], data["failed"]), (2, 2))
+        self.assertEqual([r["ok"] for r in data["results"]], [True, True, False, False])
+        self.assertEqual(data["results"][0]["commande_statut"], Commande.Statut.LIVREE)
+
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.quantite_stock, self.article.quantite_reservee), (96, 0))
+        self.assertEqual(LivraisonEvent.objects.filter(livraison_id__in=[a, b], to_statut=Livraison.Statut.LIVREE).count(), 2)
+
+        def queries(n: int) -> int:
+            ids = self._livraisons(n)
+            with CaptureQueriesContext(connection) as ctx:
+                self._post(ids, Livraison.Statut.EN_LIVRAISON)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries(2), queries(8))
+
+    def test_single_locks_livraison_then_commande(self):
+        (liv_id,) = self._livraisons(1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.api.post(f"/api/conflivraison/livraisons/{liv_id}/livrer/", {})
+        # après get_object(): relecture livraison (verrou) puis commande, comme bulk_transition
+        sql = [q["sql"] for q in ctx.captured_queries]
+        start = next(i for i, q in enumerate(sql) if q.startswith("SAVEPOINT"))
+        selects = [q for q in sql[start:] if q.startswith("SELECT")]
+        self.assertIn('FROM "conflivraison_livraison"', selects[0])
+        self.assertIn('FROM "vente_commande"', selects[1])
+
+        # instance périmée (lue avant la livraison): statut relu sous verrou => refus, stock intact
+        (liv_id,) = self._livraisons(1)
+        perimee = Livraison.objects.get(pk=liv_id)
+        self._post([liv_id], Livraison.Statut.LIVREE)
+        view = LivraisonViewSet()
+        view.request = SimpleNamespace(user=None)
+        with self.assertRaisesMessage(ValueError, "déjà finalisée"):
+            view._set_statut(perimee, Livraison.Statut.ANNULEE, {})
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.quantite_stock, self.article.quantite_reservee), (96, 0))
+
+
+class LivraisonHistoryTests(TestCase):
+    """Liste: last_event + events_count dénormalisés; historique complet via history (paginé)."""
+
+    def setUp(self):
+        lieu = LieuLivraison.objects.create(nom="Lieu", categorie=LieuLivraison.Categorie.VILLE)
+        article = Article.objects.create(nom_produit="P", reference="P", prix_vente=1000, quantite_stock=10)
+        ser = CommandeSerializer(data={
+            "client_input": {"nom": "C"}, "lieu_input": {"id": lieu.id}, "date_livraison": "2026-03-02",
+            "lignes": [{"article": article.id, "quantite": 1}],
+        })
+        ser.is_valid(raise_exception=True)
+        self.liv = ser.save().suivi_livraison
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user(username="u", email="u@x.mg", password="x"))
+
+    def test_last_event_and_history(self):
+        for _ in range(3):
+            self.api.post(f"/api/conflivraison/livraisons/{self.liv.id}/reporter/", {"raison": "absent"})
+        self.api.post("/api/conflivraison/livraisons/bulk-transition/", {"ids": [self.liv.id], "statut": "EN_LIVRAISON"}, format="json")
+
+        row = self.api.get("/api/conflivraison/livraisons/").json()["results"][0]
+        self.assertNotIn("events", row)
+        self.assertEqual(row["events_count"], 5)
+        self.assertEqual((row["last_event"]["from_statut"], row["last_event"]["to_statut"]), ("REPORTEE", "EN_LIVRAISON"))
+
+        page = self.api.get(f"/api/conflivraison/livraisons/{self.liv.id}/history/", {"page_size": 2}).json()
+        self.assertEqual(page["count"], 5)
+        self.assertEqual(page["livraison"]["id"], self.liv.id)
+        self.assertEqual([e["to_statut"] for e in page["results"]], ["EN_LIVRAISON", "REPORTEE"])
+        self.assertIsNotNone(page["next"])
+
+
+class CommandesAProgrammerTests(TestCase):
+    """commandes-a-programmer: livraison en annotations (pas de N+1) + charge par date et catégorie."""
+
+    def setUp(self):
+        self.ville = LieuLivraison.objects.create(nom="Ville", categorie=LieuLivraison.Categorie.VILLE)
+        self.province = LieuLivraison.objects.create(nom="Province", categorie=LieuLivraison.Categorie.PROVINCE)
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user(username="u", email="u@x.mg", password="x"))
+
+    def _commande(self, lieu, jour) -> Commande:
+        cmd = Commande.objects.create(
+            client=Client.objects.create(nom="C"), lieu_livraison=lieu,
+            frais_livraison=FraisLivraison.objects.create(lieu=lieu), date_livraison=jour,
+        )
+        Livraison.objects.create(commande=cmd, date_prevue=jour)
+        return cmd
+
+    def _get(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.api.get("/api/conflivraison/livraisons/commandes-a-programmer/", {"date_livraison": "2026-03-02"}).json()
+        return data, len(ctx.captured_queries)
+
+    def test_annotations_and_capacity(self):
+        self._commande(self.ville, date(2026, 3, 2))
+        _, peu = self._get()
+        for lieu in (self.ville, self.province, self.province):
+            self._commande(lieu, date(2026, 3, 2))
+        data, beaucoup = self._get()
+
+        self.assertEqual(peu, beaucoup)
+        row = data["results"][0]
+        self.assertEqual((row["livraison_statut"], row["date_prevue"]), ("A_PREPARER", "2026-03-02"))
+        self.assertEqual(data["capacite"], [
+            {"date": "2026-03-02", "total": 4, "categories": {"VILLE": 2, "PROVINCE": 2}},
+        ])
+
+
+class ManifestTests(TestCase):
+    """Feuille de route: 1 requête, groupée catégorie > lieu, montant à encaisser selon le paiement."""
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user(username="u", email="u@x.mg", password="x"))
+
+    def _livraison(self, lieu, total, statut=Livraison.Statut.A_PREPARER) -> Livraison:
+        cmd = Commande.objects.create(
+            client=Client.objects.create(nom="C"), client_nom=f"Client {lieu.nom}", lieu_livraison=lieu,
+            frais_livraison=FraisLivraison.objects.create(lieu=lieu), total_commande_cache=total,
+        )
+        return Livraison.objects.create(commande=cmd, date_prevue=date(2026, 3, 2), statut=statut)
+
+    def test_rows_csv_and_pdf(self):
+        province = LieuLivraison.objects.create(nom="Toamasina", categorie=LieuLivraison.Categorie.PROVINCE)
+        ville = LieuLivraison.objects.create(nom="Analakely", categorie=LieuLivraison.Categorie.VILLE)
+        payee = self._livraison(province, 20000)
+        Encaissement.objects.create(commande=payee.commande, statut=Encaissement.StatutPaiement.PAYEE)
+        self._livraison(ville, 15000)
+        self._livraison(ville, 9000, statut=Livraison.Statut.ANNULEE)
+
+        with self.assertNumQueries(1):
+            rows = list(manifest_rows(date(2026, 3, 2)))
+        self.assertEqual(
+            [(r["categorie"], r["lieu"], r["a_encaisser"]) for r in rows],
+            [("VILLE", "Analakely", 15000), ("PROVINCE", "Toamasina", 0)],
+        )
+
+        url = "/api/conflivraison/livraisons/manifest/"
+        resp = self.api.get(url, {"date": "2026-03-02", "export": "csv"})
+        lines = b"".join(resp.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith("Ville;Analakely;"))
+
+        resp = self.api.get(url, {"date": "2026-03-02"})
+        self.assertEqual(resp["Content-Type"], "application/pdf")
+        self.assertTrue(resp.content.startswith(b"%PDF"))
+        self.assertEqual(self.api.get(url, {"date": "02/03/2026"}).status_code, 400)
+        self.assertEqual(self.api.get(url, {"date": "2026-02-30"}).status_code, 400)
+
+    def test_rows_grouped_by_lieu_id(self):
+        b = LieuLivraison.objects.create(nom="Ivato", categorie=LieuLivraison.Categorie.VILLE)
+        a = LieuLivraison.objects.create(nom="Ambohimanarina", categorie=LieuLivraison.Categorie.VILLE)
+        for lieu in (b, a, b, a):
+            self._livraison(lieu, 1000)
+
+        rows = list(manifest_rows(date(2026, 3, 2)))
+        self.assertEqual(
+            [(r["lieu_id"], r["lieu"]) for r in rows],
+            [(a.pk, a.nom), (a.pk, a.nom), (b.pk, b.nom), (b.pk, b.nom)],
+        )
 
-# Create your tests here.
+        resp = self.api.get("/api/conflivraison/livraisons/manifest/", {"date": "2026-03-02"})
+        self.assertEqual(resp.status_code, 200)
@@ -1,78 +1,44 @@
 # conflivraison/views.py
 from __future__ import annotations
 
-import json
-
-from django.core.serializers.json import DjangoJSONEncoder
 from django.db import transaction
-from django.db.models import Q, Exists, OuterRef
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 
+from api.idempotency import idempotent
 from conflivraison.models import Livraison, LivraisonEvent
+from conflivraison.services.events import create_events
+from conflivraison.services.livraisons import create_missing_livraisons
+from conflivraison.services.manifest import manifest_csv, render_manifest_pdf_bytes
+from conflivraison.services.programmation import PROGRAMMATION_FIELDS, capacite_par_date
+from conflivraison.services.transitions import (
+    TRANSITION_FIELDS,
+    apply_transition,
+    bulk_transition,
+    cmd_brouillon_statut,
+    cmd_confirmee_statut,
+    cmd_final_statuts,
+    is_final,
+    json_safe,
+)
 from conflivraison.serializers import (
     LivraisonSerializer,
+    LivraisonEventSerializer,
     LivraisonActionSerializer,
+    BulkTransitionSerializer,
     CommandeProgrammationSerializer,
     ProgrammerCommandeSerializer,
 )
 from vente.models import Commande
-
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 20
-    page_size_query_param = "page_size"
-    max_page_size = 200
-
-
-# =========================
-# Helpers statuts Commande
-# =========================
-def _cmd_statut(name: str):
-    return getattr(Commande.Statut, name, None)
-
-
-def _cmd_final_statuts() -> list[str]:
-    ann = _cmd_statut("ANNULEE") or _cmd_statut("ANNULE")
-    liv = _cmd_statut("LIVREE")
-    return [s for s in [ann, liv] if s]
-
-
-def _cmd_annule_statut() -> str | None:
-    return _cmd_statut("ANNULEE") or _cmd_statut("ANNULE")
-
-
-def _cmd_confirmee_statut() -> str | None:
-    return _cmd_statut("CONFIRMEE")
-
-
-def _cmd_brouillon_statut() -> str | None:
-    return _cmd_statut("BROUILLON")
-
-
-def _cmd_en_livraison_statut() -> str | None:
-    return _cmd_statut("EN_LIVRAISON")
-
-
-def _cmd_livree_statut() -> str | None:
-    return _cmd_statut("LIVREE")
-
-
-# =========================
-# JSON SAFE (FIX)
-# =========================
-def _json_safe(value):
-    """
-    Convertit les objets non JSON (date/datetime/Decimal/UUID, etc.)
-    en types sérialisables pour JSONField.
-    """
-    if value is None:
-        return None
-    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+from vente.pagination import CommandeCursorPagination
+from vente.search import search_q
+from vente.stock import transition_stock
 
 
 # =========================
@@ -88,80 +54,28 @@ def _log_event(
     meta: dict | None = None,
 ):
     meta = meta or {}
-    meta = _json_safe(meta)  # ✅ FIX: meta devient 100% JSON serializable
+    meta = json_safe(meta)  # ✅ FIX: meta devient 100% JSON serializable
 
-    LivraisonEvent.objects.create(
+    create_events([LivraisonEvent(
         livraison=livraison,
         from_statut=from_s or "",
         to_statut=to_s or "",
         actor=actor if actor and getattr(actor, "is_authenticated", False) else None,
         message=message or "",
         meta=meta,
-    )
-
-
-def _is_final(statut: str) -> bool:
-    return statut in [Livraison.Statut.LIVREE, Livraison.Statut.ANNULEE]
+    )])
 
 
 class LivraisonViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = LivraisonSerializer
-    pagination_class = StandardResultsSetPagination
-
-    # -------------------------
-    # AUTO-SYNC (sans bouton)
-    # -------------------------
-    def _autosync_missing_livraisons(self):
-        """
-        Crée automatiquement les livraisons manquantes pour les commandes non finalisées.
-        Objectif: la liste s'affiche sans cliquer sur 'Synchroniser'.
-        """
-        finals = _cmd_final_statuts()
-
-        qs_cmd = Commande.objects.all()
-        if finals:
-            qs_cmd = qs_cmd.exclude(statut__in=finals)
-
-        # commandes sans livraison
-        has_liv = Livraison.objects.filter(commande_id=OuterRef("pk"))
-        qs_cmd = qs_cmd.annotate(_has_liv=Exists(has_liv)).filter(_has_liv=False)
-
-        # option: éviter de créer des livraisons si commande n'a aucune date
-        qs_cmd = qs_cmd.filter(date_livraison__isnull=False)
-
-        cmds = list(qs_cmd.order_by("-id")[:300])  # cap de sécurité
-        if not cmds:
-            return 0
-
-        created = 0
-        for cmd in cmds:
-            liv = Livraison.objects.create(
-                commande=cmd,
-                statut=Livraison.Statut.A_PREPARER,
-                date_prevue=getattr(cmd, "date_livraison", None),
-                updated_by=self.request.user,
-            )
-            _log_event(
-                livraison=liv,
-                from_s="",
-                to_s=liv.statut,
-                actor=self.request.user,
-                message="Création automatique (autosync) lors du listing",
-                meta={"commande_id": cmd.id},
-            )
-            created += 1
-
-        return created
+    pagination_class = CommandeCursorPagination
 
     # -------------------------
     # Queryset
     # -------------------------
     def get_queryset(self):
-        # ✅ autosync avant listing
-        if getattr(self, "action", None) == "list":
-            self._autosync_missing_livraisons()
-
+        # ✅ lecture pure: livraisons créées à l'écriture (conflivraison/services/livraisons.py)
         qs = (
             Livraison.objects.select_related(
                 "commande",
@@ -170,8 +84,8 @@ class LivraisonViewSet(viewsets.ModelViewSet):
                 "commande__lieu_livraison",
                 "commande__frais_livraison",
                 "updated_by",
+                "last_event__actor",
             )
-            .prefetch_related("events")
             .order_by("-id")
         )
 
@@ -193,12 +107,8 @@ class LivraisonViewSet(viewsets.ModelViewSet):
             qs = qs.filter(commande__page_id=int(page_id))
 
         if q:
-            qs = qs.filter(
-                Q(commande__client_nom__icontains=q)
-                | Q(commande__client_contact__icontains=q)
-                | Q(commande__lieu_livraison__nom__icontains=q)
-                | Q(commande__id__icontains=q)
-            )
+            # ✅ recherche indexée (client / lieu) + n° de commande exact
+            qs = qs.filter(search_q(q, field="commande_id"))
 
         return qs
 
@@ -223,60 +133,17 @@ class LivraisonViewSet(viewsets.ModelViewSet):
     # -------------------------
     @transaction.atomic
     def _set_statut(self, livraison: Livraison, new_statut: str, payload: dict):
-        if _is_final(livraison.statut):
-            raise ValueError("Cette livraison est déjà finalisée (livrée/annulée).")
-
-        from_statut = livraison.statut
-
-        valid_statuts = {s for (s, _) in Livraison.Statut.choices}
-        if new_statut not in valid_statuts:
-            raise ValueError(f"Statut invalide: {new_statut}")
-
-        livraison.statut = new_statut
-        livraison.raison = payload.get("raison", livraison.raison) or ""
-        livraison.commentaire = payload.get("commentaire", livraison.commentaire) or ""
-
-        if "date_prevue" in payload:
-            livraison.date_prevue = payload.get("date_prevue")
-
-        if new_statut == Livraison.Statut.LIVREE and not livraison.date_prevue:
-            livraison.date_prevue = timezone.localdate()
-
-        if new_statut == Livraison.Statut.LIVREE:
-            livraison.date_reelle = timezone.now()
+        # ✅ verrous dans le même ordre que bulk_transition: livraison puis commande
+        # (livraison relue sous verrou: l'instance de get_object() peut être périmée)
+        livraison = Livraison.objects.select_for_update().get(pk=livraison.pk)
+        cmd = Commande.objects.select_for_update().get(pk=livraison.commande_id)
+        cmd_statut_avant = cmd.statut
+        from_statut = apply_transition(livraison, cmd, new_statut, payload, self.request.user)
 
-        if new_statut in [Livraison.Statut.ANNULEE, Livraison.Statut.REPORTEE]:
-            livraison.date_reelle = None
+        livraison.save(update_fields=TRANSITION_FIELDS)
 
-        livraison.updated_by = self.request.user
-        livraison.save()
-
-        # ---- sync commande ----
-        cmd = livraison.commande
-
-        st_en_liv = _cmd_en_livraison_statut()
-        st_livree = _cmd_livree_statut()
-        st_annule = _cmd_annule_statut()
-        st_conf = _cmd_confirmee_statut()
-
-        if new_statut == Livraison.Statut.EN_LIVRAISON:
-            if st_en_liv:
-                cmd.statut = st_en_liv
-
-        elif new_statut == Livraison.Statut.LIVREE:
-            if st_livree:
-                cmd.statut = st_livree
-            if not getattr(cmd, "date_livraison", None) and livraison.date_prevue:
-                cmd.date_livraison = livraison.date_prevue
-
-        elif new_statut == Livraison.Statut.ANNULEE:
-            if not st_annule:
-                raise ValueError("Statut commande annulation introuvable (ANNULEE/ANNULE).")
-            cmd.statut = st_annule
-
-        elif new_statut == Livraison.Statut.REPORTEE:
-            if st_en_liv and st_conf and cmd.statut == st_en_liv:
-                cmd.statut = st_conf
+        # ✅ stock: réservation débitée (LIVREE) ou libérée (ANNULEE)
+        transition_stock({cmd.id: (cmd_statut_avant, cmd.statut)})
 
         update_fields = ["updated_at", "statut", "date_livraison"]
         cmd.save(update_fields=update_fields)
@@ -342,24 +209,87 @@ class LivraisonViewSet(viewsets.ModelViewSet):
         livraison.refresh_from_db()
         return Response(LivraisonSerializer(livraison, context={"request": request}).data)
 
+    # ✅ fin de tournée: N livraisons en 1 transaction (verrous, mises à jour et événements groupés)
+    @action(detail=False, methods=["post"], url_path="bulk-transition")
+    def bulk_set_statut(self, request):
+        ser = BulkTransitionSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        payload = dict(ser.validated_data)
+        ids = payload.pop("ids")
+        new_statut = payload.pop("statut")
+
+        results = bulk_transition(ids, new_statut, payload, request.user)
+        return Response({
+            "statut": new_statut,
+            "updated": sum(1 for r in results if r["ok"]),
+            "failed": sum(1 for r in results if not r["ok"]),
+            "results": results,
+        })
+
     @action(detail=True, methods=["get"], url_path="history")
     def history(self, request, pk=None):
-        liv = (
-            Livraison.objects.select_related("commande")
-            .prefetch_related("events")
-            .get(pk=pk)
+        # ✅ historique complet uniquement ici, paginé (curseur -id: plus récents d'abord)
+        liv = self.get_object()
+        paginator = CommandeCursorPagination()
+        events = paginator.paginate_queryset(
+            LivraisonEvent.objects.filter(livraison=liv).select_related("actor"), request, view=self,
         )
-        return Response(LivraisonSerializer(liv, context={"request": request}).data)
+        resp = paginator.get_paginated_response(LivraisonEventSerializer(events, many=True).data)
+        resp.data["livraison"] = LivraisonSerializer(liv, context={"request": request}).data
+        return resp
+
+    # -------------------------
+    # Feuille de route du jour
+    # -------------------------
+    @action(detail=False, methods=["get"], url_path="manifest")
+    def manifest(self, request):
+        """
+        Feuille de route des livraisons prévues un jour, groupées par catégorie de lieu puis lieu.
+        ?date=YYYY-MM-DD (défaut: aujourd'hui)
+        ?export=pdf (défaut) | csv  (pas ?format=: réservé à DRF)
+        ?download=1 pour forcer le téléchargement
+        """
+        qp = request.query_params
+        raw = (qp.get("date") or "").strip()
+        try:
+            jour = parse_date(raw) if raw else timezone.localdate()
+        except ValueError:  # ✅ bien formée mais impossible (2026-02-30)
+            jour = None
+        if not jour:
+            return Response({"detail": "date invalide (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+
+        export = (qp.get("export") or "pdf").strip().lower()
+        download = (qp.get("download") or "").strip() == "1"
+
+        if export == "csv":
+            # ✅ CSV streamé: rien n'est accumulé en mémoire
+            resp = StreamingHttpResponse(manifest_csv(jour), content_type="text/csv; charset=utf-8")
+            resp["Content-Disposition"] = f'attachment; filename="feuille_de_route_{jour.isoformat()}.csv"'
+            return resp
+        if export != "pdf":
+            return Response({"detail": "export invalide (pdf|csv)."}, status=status.HTTP_400_BAD_REQUEST)
+
+        resp = HttpResponse(render_manifest_pdf_bytes(jour), content_type="application/pdf")
+        filename = f"feuille_de_route_{jour.isoformat()}.pdf"
+        resp["Content-Disposition"] = f'{"attachment" if download else "inline"}; filename="{filename}"'
+        return resp
 
     # -------------------------
     # Commandes à programmer
     # -------------------------
     @action(detail=False, methods=["get"], url_path="commandes-a-programmer")
     def commandes_a_programmer(self, request):
-        finals = _cmd_final_statuts()
+        finals = cmd_final_statuts()
 
+        # ✅ 1 requête: colonnes affichées + livraison (LEFT JOIN du one-to-one inverse) en annotations
         qs = (
-            Commande.objects.select_related("page", "client", "lieu_livraison", "frais_livraison")
+            Commande.objects
+            .only(*PROGRAMMATION_FIELDS)
+            .annotate(
+                livraison_id=F("suivi_livraison__id"),
+                livraison_statut=F("suivi_livraison__statut"),
+                date_prevue=F("suivi_livraison__date_prevue"),
+            )
             .order_by("-id")
         )
         if finals:
@@ -378,22 +308,22 @@ class LivraisonViewSet(viewsets.ModelViewSet):
         if date_livraison:
             qs = qs.filter(date_livraison=date_livraison)
         if q:
-            qs = qs.filter(
-                Q(client_nom__icontains=q)
-                | Q(client_contact__icontains=q)
-                | Q(client_adresse__icontains=q)
-                | Q(lieu_livraison__nom__icontains=q)
-                | Q(id__icontains=q)
-            )
+            qs = qs.filter(search_q(q))
 
         page = self.paginate_queryset(qs)
         ser = CommandeProgrammationSerializer(page, many=True, context={"request": request})
-        return self.get_paginated_response(ser.data)
+        resp = self.get_paginated_response(ser.data)
+
+        # ✅ charge par date (calendrier): 1ère page seulement, mêmes filtres
+        if not qp.get(self.paginator.cursor_query_param):
+            resp.data["capacite"] = capacite_par_date(qs, depuis=None if date_livraison else timezone.localdate())
+        return resp
 
     # -------------------------
     # Programmer commande
     # -------------------------
     @action(detail=False, methods=["post"], url_path="programmer-commande")
+    @idempotent("conflivraison.programmer_commande")
     @transaction.atomic
     def programmer_commande(self, request):
         ser = ProgrammerCommandeSerializer(data=request.data)
@@ -404,14 +334,14 @@ class LivraisonViewSet(viewsets.ModelViewSet):
 
         cmd = Commande.objects.select_for_update().get(id=commande_id)
 
-        finals = _cmd_final_statuts()
+        finals = cmd_final_statuts()
         if finals and cmd.statut in finals:
             return Response({"detail": "Commande finalisée (annulée/livrée)."}, status=status.HTTP_400_BAD_REQUEST)
 
         cmd.date_livraison = date_livraison
 
-        brouillon = _cmd_brouillon_statut()
-        conf = _cmd_confirmee_statut()
+        brouillon = cmd_brouillon_statut()
+        conf = cmd_confirmee_statut()
         if brouillon and conf and cmd.statut == brouillon:
             cmd.statut = conf
 
@@ -437,7 +367,7 @@ class LivraisonViewSet(viewsets.ModelViewSet):
             )
             created = True
         else:
-            if _is_final(liv.statut):
+            if is_final(liv.statut):
                 return Response({"detail": "Livraison déjà finalisée (livrée/annulée)."}, status=status.HTTP_400_BAD_REQUEST)
 
             liv.date_prevue = date_livraison
@@ -470,5 +400,5 @@ class LivraisonViewSet(viewsets.ModelViewSet):
     # -------------------------
     @action(detail=False, methods=["post"], url_path="sync-from-commandes")
     def sync_from_commandes(self, request):
-        created = self._autosync_missing_livraisons()
+        created = create_missing_livraisons(actor=request.user, message="Création via synchronisation manuelle")
         return Response({"created": created})
@@ -0,0 +1,124 @@
+# dashboard/cache.py
+from __future__ import annotations
+
+import hashlib
+import uuid
+from datetime import date, timedelta
+from functools import wraps
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.response import Response
+
+
+# =========================
+# Cache dashboard versionné par jour
+# =========================
+# - chaque jour a un "jeton de version" (dashboard:v:YYYY-MM-DD)
+# - une écriture (commande, ligne, encaissement, charge, achat...) change le jeton des jours touchés
+# - la clé d'une réponse inclut les jetons de tous les jours de la période
+#   => une période passée non modifiée reste servie depuis le cache
+# - une période qui contient aujourd'hui n'est jamais mise en cache
+# Compatible locmem / file (aucun service externe). En multi-process, utiliser "file".
+
+VERSION_KEY = "dashboard:v:{day}"
+
+
+def _cache():
+    return caches[getattr(settings, "DASHBOARD_CACHE_ALIAS", "default")]
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "DASHBOARD_CACHE_TTL", 24 * 3600))
+
+
+def _new_token() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def bump_days(days: Iterable[date]):
+    """Invalide les réponses en cache qui couvrent au moins un de ces jours."""
+    days = {d for d in days if d}
+    if not days:
+        return
+    token = _new_token()
+    _cache().set_many({VERSION_KEY.format(day=d.isoformat()): token for d in days}, timeout=None)
+
+
+def _versions_digest(dfrom: date, dto: date) -> str:
+    keys = [
+        VERSION_KEY.format(day=(dfrom + timedelta(days=i)).isoformat())
+        for i in range((dto - dfrom).days + 1)
+    ]
+    cache = _cache()
+    found = cache.get_many(keys)
+
+    # jeton manquant (jamais écrit, ou évincé): on en crée un nouveau
+    # => jamais de retour à un ancien jeton, donc jamais de réponse périmée
+    missing = {k: _new_token() for k in keys if k not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+
+    h = hashlib.sha1()
+    for k in keys:
+        h.update(f"{k}={found[k]};".encode())
+    return h.hexdigest()
+
+
+def response_cache_key(endpoint: str, request) -> str | None:
+    """
+    Clé (endpoint, période, page, autres params) + versions des jours.
+    None => période non cachable (contient aujourd'hui / futur, ou dates invalides).
+    """
+    qp = request.query_params
+    dfrom = parse_date((qp.get("date_from") or "").strip())
+    dto = parse_date((qp.get("date_to") or "").strip())
+    if not dfrom or not dto or dfrom > dto:
+        return None
+    if dto >= timezone.localdate():
+        return None
+
+    params = sorted(
+        (k, ",".join(qp.getlist(k)))
+        for k in qp.keys()
+        if k not in ("date_from", "date_to")
+    )
+    raw = f"{endpoint}|{dfrom.isoformat()}|{dto.isoformat()}|{params}"
+    params_hash = hashlib.sha1(raw.encode()).hexdigest()
+    return f"dashboard:r:{endpoint}:{params_hash}:{_versions_digest(dfrom, dto)}"
+
+
+def dashboard_cached(endpoint: str):
+    """
+    Décorateur pour une vue dashboard (fonction DRF), à placer sous @permission_classes.
+    Header X-Dashboard-Cache: HIT | MISS | BYPASS
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = response_cache_key(endpoint, request)
+            if key is None:
+                resp = view_func(request, *args, **kwargs)
+                resp["X-Dashboard-Cache"] = "BYPASS"
+                return resp
+
+            cache = _cache()
+            data = cache.get(key)
+            if data is not None:
+                resp = Response(data)
+                resp["X-Dashboard-Cache"] = "HIT"
+                return resp
+
+            resp = view_func(request, *args, **kwargs)
+            if resp.status_code == 200:
+                cache.set(key, resp.data, timeout=_ttl())
+            resp["X-Dashboard-Cache"] = "MISS"
+            return resp
+
+        return wrapper
+
+    return decorator
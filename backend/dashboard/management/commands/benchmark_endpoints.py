@@ -0,0 +1,144 @@
+# dashboard/management/commands/benchmark_endpoints.py
+from __future__ import annotations
+
+import json
+import logging
+import math
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from vente.models import Commande
+from dashboard import urls as dashboard_urls
+
+
+# listes principales (1ère page, paramètres par défaut)
+LIST_ENDPOINTS = [
+    "/api/vente/commandes/",
+    "/api/conflivraison/livraisons/",
+    "/api/encaissement/commandes/",
+    "/api/facturation/commandes/",
+    "/api/achats/achats/",
+    "/api/charge/charges/",
+]
+
+
+def _percentile(values: list[float], p: float) -> float:
+    """Percentile "nearest rank" (p dans [0, 100])."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+    return round(ordered[k], 2)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure les endpoints dashboard (dashboard/urls.py) et les listes principales: "
+        "latence p50/p95 et nombre de requêtes SQL, en JSON. "
+        "--scales=10000,100000,1000000 complète d'abord la base via seed_bulk jusqu'à chaque volume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scales", default="", help="Volumes de commandes, ex: 10000,100000,1000000")
+        parser.add_argument("--runs", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--days", type=int, default=90, help="Période dashboard mesurée (jusqu'à aujourd'hui)")
+        parser.add_argument("--seed", type=int, default=42, help="Graine passée à seed_bulk")
+        parser.add_argument("--output", default="", help="Fichier JSON (défaut: stdout)")
+
+    def handle(self, *args, **opts):
+        try:
+            scales = [int(x) for x in opts["scales"].split(",") if x.strip()]
+        except ValueError:
+            raise CommandError("--scales: entiers séparés par des virgules.")
+        if opts["runs"] < 1:
+            raise CommandError("--runs >= 1.")
+
+        # logs SQL (DEBUG) => temps faussés
+        db_logger = logging.getLogger("django.db.backends")
+        old_level = db_logger.level
+        db_logger.setLevel(logging.WARNING)
+        try:
+            results = []
+            if not scales:
+                results.append(self._bench(opts))
+            for scale in scales:
+                missing = scale - Commande.objects.count()
+                if missing > 0:
+                    self.stderr.write(f"seed_bulk: +{missing} commande(s) pour atteindre {scale}")
+                    call_command("seed_bulk", commandes=missing, seed=opts["seed"] + scale, stdout=self.stderr)
+                results.append(self._bench(opts))
+        finally:
+            db_logger.setLevel(old_level)
+
+        payload = json.dumps(results, indent=2)
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as fh:
+                fh.write(payload)
+            self.stderr.write(f"Résultats écrits dans {opts['output']}")
+        else:
+            self.stdout.write(payload)
+
+    def _client(self) -> APIClient:
+        user, _ = get_user_model().objects.get_or_create(
+            username="benchmark", defaults={"email": "benchmark@localhost"}
+        )
+        hosts = [h for h in settings.ALLOWED_HOSTS if h and h != "*" and not h.startswith(".")]
+        client = APIClient(HTTP_HOST=hosts[0] if hosts else "localhost")
+        client.force_authenticate(user)
+        return client
+
+    def _endpoints(self, opts) -> dict[str, tuple[str, dict]]:
+        today = timezone.localdate()
+        # période incluant aujourd'hui => jamais servie par le cache dashboard (BYPASS)
+        params = {"date_from": (today - timedelta(days=opts["days"] - 1)).isoformat(), "date_to": today.isoformat()}
+        endpoints = {
+            f"dashboard/{p.pattern}": (f"/api/dashboard/{p.pattern}", params)
+            for p in dashboard_urls.urlpatterns
+        }
+        endpoints.update({url.removeprefix("/api/"): (url, {}) for url in LIST_ENDPOINTS})
+        return endpoints
+
+    def _bench(self, opts) -> dict:
+        client = self._client()
+        out = {
+            "commandes": Commande.objects.count(),
+            "runs": opts["runs"],
+            "db": connection.vendor,
+            "endpoints": {},
+        }
+
+        for name, (url, params) in self._endpoints(opts).items():
+            for _ in range(max(0, opts["warmup"])):
+                client.get(url, params)
+
+            timings = []
+            queries = 0
+            status_code = None
+            for _ in range(opts["runs"]):
+                with CaptureQueriesContext(connection) as ctx:
+                    t0 = time.perf_counter()
+                    resp = client.get(url, params)
+                    timings.append((time.perf_counter() - t0) * 1000)
+                queries = len(ctx.captured_queries)
+                status_code = resp.status_code
+
+            out["endpoints"][name] = {
+                "status": status_code,
+                "p50_ms": _percentile(timings, 50),
+                "p95_ms": _percentile(timings, 95),
+                "max_ms": round(max(timings), 2),
+                "queries": queries,
+            }
+            self.stderr.write(f"  {name}: p50={out['endpoints'][name]['p50_ms']}ms q={queries}")
+
+        return out
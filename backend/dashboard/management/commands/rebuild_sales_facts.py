@@ -0,0 +1,47 @@
+# dashboard/management/commands/rebuild_sales_facts.py
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from vente.models import Commande
+from dashboard.models import DailySalesFact
+from dashboard.cache import bump_days
+from dashboard.services.facts import rebuild_range, commande_day
+
+
+class Command(BaseCommand):
+    help = "Reconstruit la table DailySalesFact à partir des commandes (par défaut: tout l'historique)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date-from", dest="date_from", default="", help="YYYY-MM-DD (défaut: 1ère commande)")
+        parser.add_argument("--date-to", dest="date_to", default="", help="YYYY-MM-DD (défaut: aujourd'hui)")
+        parser.add_argument("--chunk-days", dest="chunk_days", type=int, default=31)
+
+    def handle(self, *args, **opts):
+        dfrom = parse_date(opts["date_from"]) if opts["date_from"] else None
+        dto = parse_date(opts["date_to"]) if opts["date_to"] else timezone.localdate()
+
+        if opts["date_from"] and not dfrom:
+            raise CommandError("--date-from invalide (YYYY-MM-DD).")
+        if opts["date_to"] and not parse_date(opts["date_to"]):
+            raise CommandError("--date-to invalide (YYYY-MM-DD).")
+
+        if not dfrom:
+            first = Commande.objects.aggregate(m=Min("created_at"))["m"]
+            if not first:
+                DailySalesFact.objects.all().delete()
+                self.stdout.write(self.style.WARNING("Aucune commande: table vidée."))
+                return
+            dfrom = commande_day(first)
+
+        if dfrom > dto:
+            raise CommandError("--date-from doit être <= --date-to.")
+
+        n = rebuild_range(dfrom, dto, chunk_days=max(1, int(opts["chunk_days"])))
+        bump_days(dfrom + timedelta(days=i) for i in range((dto - dfrom).days + 1))
+        self.stdout.write(self.style.SUCCESS(f"{n} ligne(s) de facts reconstruites ({dfrom} -> {dto})."))
@@ -0,0 +1,351 @@
+# dashboard/management/commands/seed_bulk.py
+from __future__ import annotations
+
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from achats.models import Achat, AchatLigne
+from article.models import Article, StockMouvement
+from article.stock import lock_articles, apply_stock_deltas
+from charge.models import Charge, ChargeCategorie
+from client.models import Client
+from configuration.models import AppConfiguration, Page
+from conflivraison.models import Livraison
+from encaissement.models import Encaissement
+from livraison.models import FraisLivraison, LieuLivraison, default_frais_par_categorie
+from vente.models import Commande, LigneCommande
+from vente.clients import refresh_last_lieu
+from vente.search import refresh_search
+from dashboard.cache import bump_days
+from dashboard.services.facts import rebuild_range
+
+
+# =========================
+# Données synthétiques (benchmark)
+# =========================
+# - référentiels (clients, articles, pages, lieux): "au moins N" => relancer ne les duplique pas
+# - commandes / achats / charges: toujours N nouveaux
+# - bulk_create par lots, sans signaux => facts dashboard reconstruits à la fin
+# - created_at réparti sur --days jours (auto_now_add désactivé pendant l'insertion)
+
+
+@contextmanager
+def _dates_libres(*models):
+    """Désactive auto_now_add / auto_now le temps de l'insertion (dates historiques)."""
+    saved = []
+    for model in models:
+        for f in model._meta.concrete_fields:
+            if getattr(f, "auto_now_add", False) or getattr(f, "auto_now", False):
+                saved.append((f, f.auto_now_add, f.auto_now))
+                f.auto_now_add = f.auto_now = False
+    try:
+        yield
+    finally:
+        for f, add, now in saved:
+            f.auto_now_add, f.auto_now = add, now
+
+
+def _skewed(rnd: random.Random, n: int, power: float = 2.0) -> int:
+    """Index dans [0, n) biaisé vers les premiers éléments (popularité type Pareto)."""
+    return min(n - 1, int(n * rnd.random() ** power))
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un volume réaliste de données (clients, articles, commandes + lignes, encaissements, "
+        "livraisons, achats, charges) en bulk_create par lots, pour mesurer dashboard et listes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--commandes", type=int, default=10000)
+        parser.add_argument("--clients", type=int, default=None, help="Défaut: commandes / 5 (min 50)")
+        parser.add_argument("--articles", type=int, default=500)
+        parser.add_argument("--pages", type=int, default=5)
+        parser.add_argument("--lieux", type=int, default=60)
+        parser.add_argument("--achats", type=int, default=None, help="Défaut: commandes / 20")
+        parser.add_argument("--charges", type=int, default=None, help="Défaut: commandes / 10")
+        parser.add_argument("--days", type=int, default=365, help="Période couverte (jours jusqu'à aujourd'hui)")
+        parser.add_argument("--batch-size", dest="batch_size", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=None, help="Graine aléatoire (reproductible)")
+
+    def handle(self, *args, **opts):
+        n_cmd = int(opts["commandes"])
+        if n_cmd < 0 or opts["days"] < 1 or opts["batch_size"] < 1:
+            raise CommandError("--commandes >= 0, --days >= 1, --batch-size >= 1.")
+
+        self.rnd = random.Random(opts["seed"])
+        self.tag = uuid.uuid4().hex[:6]
+        self.batch = int(opts["batch_size"])
+        self.today = timezone.localdate()
+        self.dfrom = self.today - timedelta(days=int(opts["days"]) - 1)
+        self.tz = timezone.get_current_timezone()
+
+        clients = self._ensure_clients(opts["clients"] or max(50, n_cmd // 5))
+        articles = self._ensure_articles(int(opts["articles"]))
+        pages = self._ensure_pages(int(opts["pages"]))
+        lieux = self._ensure_lieux(int(opts["lieux"]))
+        if not (clients and articles and lieux):
+            raise CommandError("Il faut au moins 1 client, 1 article et 1 lieu.")
+
+        n_achats = opts["achats"] if opts["achats"] is not None else n_cmd // 20
+        n_charges = opts["charges"] if opts["charges"] is not None else n_cmd // 10
+
+        with _dates_libres(Commande, LigneCommande, FraisLivraison, Encaissement, Livraison, Achat, AchatLigne, Charge):
+            self._seed_achats(int(n_achats), articles)
+            done = 0
+            while done < n_cmd:
+                size = min(self.batch, n_cmd - done)
+                self._seed_commandes_batch(size, clients, articles, pages, lieux)
+                done += size
+                self.stdout.write(f"  commandes: {done}/{n_cmd}")
+            self._seed_charges(int(n_charges))
+
+        rebuild_range(self.dfrom, self.today)
+        bump_days(self.dfrom + timedelta(days=i) for i in range((self.today - self.dfrom).days + 1))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{n_cmd} commande(s), {n_achats} achat(s), {n_charges} charge(s) générés "
+            f"({self.dfrom} -> {self.today}). Total commandes: {Commande.objects.count()}."
+        ))
+
+    # -------------------------
+    # Dates
+    # -------------------------
+    def _random_moment(self) -> datetime:
+        # plus de volume sur les jours récents, pic d'activité 9h-20h
+        days = (self.today - self.dfrom).days
+        d = self.dfrom + timedelta(days=int(days * self.rnd.random() ** 0.7))
+        hour = min(23, max(0, int(self.rnd.gauss(14, 3.5))))
+        t = time(hour, self.rnd.randint(0, 59), self.rnd.randint(0, 59))
+        moment = timezone.make_aware(datetime.combine(d, t), self.tz)
+        return min(moment, timezone.now())
+
+    # -------------------------
+    # Référentiels ("au moins N")
+    # -------------------------
+    def _ensure_clients(self, n: int) -> list[tuple[int, str, str]]:
+        missing = n - Client.objects.count()
+        if missing > 0:
+            Client.objects.bulk_create(
+                (
+                    Client(
+                        nom=f"Client {self.tag}-{i}",
+                        contact=f"03{self.rnd.choice('2348')}{self.rnd.randint(1000000, 9999999)}",
+                        adresse="",
+                    )
+                    for i in range(missing)
+                ),
+                batch_size=self.batch,
+            )
+        return list(Client.objects.order_by("id").values_list("id", "nom", "contact")[:n])
+
+    def _ensure_articles(self, n: int) -> list[Article]:
+        missing = n - Article.objects.count()
+        if missing > 0:
+            rows = []
+            for i in range(missing):
+                prix_achat = Decimal(self.rnd.choice([500, 1000, 2000, 3500, 5000, 8000, 15000]))
+                marge = Decimal(str(round(self.rnd.uniform(1.2, 2.2), 2)))
+                rows.append(Article(
+                    nom_produit=f"Produit {self.tag}-{i}",
+                    reference=f"SEED-{self.tag}-{i}",
+                    prix_achat=prix_achat,
+                    prix_vente=(prix_achat * marge).quantize(Decimal("1")),
+                    cout_moyen=prix_achat,
+                    quantite_stock=1_000_000,
+                ))
+            Article.objects.bulk_create(rows, batch_size=self.batch)
+            # ✅ stock initial journalisé (reconcile_stock reste cohérent)
+            StockMouvement.objects.bulk_create(
+                [
+                    StockMouvement(article_id=a.id, delta=a.quantite_stock, source_type=StockMouvement.Source.INITIAL)
+                    for a in rows
+                ],
+                batch_size=self.batch,
+            )
+        return list(Article.objects.order_by("id").only("id", "prix_vente", "prix_achat", "cout_moyen")[:n])
+
+    def _ensure_pages(self, n: int) -> list[int | None]:
+        cfg = AppConfiguration.get_solo()
+        missing = n - Page.objects.count()
+        if missing > 0:
+            Page.objects.bulk_create(
+                [Page(config=cfg, nom=f"Page {self.tag}-{i}", lien=f"/seed/{self.tag}/{i}") for i in range(missing)],
+                batch_size=self.batch,
+            )
+        return list(Page.objects.order_by("id").values_list("id", flat=True)[:n])
+
+    def _ensure_lieux(self, n: int) -> list[LieuLivraison]:
+        missing = n - LieuLivraison.objects.count()
+        if missing > 0:
+            cats = [c for c, _ in LieuLivraison.Categorie.choices]
+            weights = [50, 25, 12, 10, 3]
+            LieuLivraison.objects.bulk_create(
+                [
+                    LieuLivraison(nom=f"Lieu {self.tag}-{i}", categorie=self.rnd.choices(cats, weights)[0])
+                    for i in range(missing)
+                ],
+                batch_size=self.batch,
+            )
+        return list(LieuLivraison.objects.order_by("id").only("id", "nom", "categorie")[:n])
+
+    # -------------------------
+    # Commandes (+ frais, lignes, encaissement, livraison)
+    # -------------------------
+    def _pick_statut(self, created: datetime) -> str:
+        age = (timezone.now() - created).days
+        S = Commande.Statut
+        if age < 2:
+            return self.rnd.choices([S.EN_ATTENTE, S.EN_LIVRAISON, S.LIVREE, S.ANNULEE], [55, 25, 15, 5])[0]
+        return self.rnd.choices([S.EN_ATTENTE, S.EN_LIVRAISON, S.LIVREE, S.ANNULEE], [5, 3, 80, 12])[0]
+
+    @transaction.atomic
+    def _seed_commandes_batch(self, size, clients, articles, pages, lieux):
+        rnd = self.rnd
+        page_weights = [1 / (i + 1) for i in range(len(pages))]
+
+        specs = []
+        frais_rows = []
+        for _ in range(size):
+            created = self._random_moment()
+            lieu = lieux[_skewed(rnd, len(lieux))]
+            override = rnd.choice([None] * 8 + [0, 2000])
+            calcule = default_frais_par_categorie(lieu.categorie)
+            frais_rows.append(FraisLivraison(
+                lieu=lieu,
+                frais_calcule=calcule,
+                frais_override=override,
+                frais_final=int(override if override is not None else calcule),
+                created_at=created, updated_at=created,
+            ))
+            nb_lignes = rnd.choices([1, 2, 3, 4, 5], [50, 25, 12, 8, 5])[0]
+            lignes = {}
+            for _ in range(nb_lignes):
+                art = articles[_skewed(rnd, len(articles))]
+                lignes[art.id] = (art, rnd.choices([1, 2, 3], [70, 22, 8])[0])
+            specs.append((created, lieu, lignes))
+
+        FraisLivraison.objects.bulk_create(frais_rows, batch_size=self.batch)
+
+        commandes = []
+        for (created, lieu, lignes), frais in zip(specs, frais_rows):
+            client_id, client_nom, client_contact = clients[_skewed(rnd, len(clients), 3.0)]
+            total_articles = sum(int(art.prix_vente) * q for art, q in lignes.values())
+            commandes.append(Commande(
+                page_id=rnd.choices(pages, page_weights)[0] if pages and rnd.random() > 0.05 else None,
+                client_id=client_id,
+                client_nom=client_nom,
+                client_contact=client_contact,
+                lieu_livraison=lieu,
+                frais_livraison=frais,
+                date_livraison=timezone.localtime(created).date() + timedelta(days=rnd.choice([0, 1, 1, 2, 3])),
+                statut=self._pick_statut(created),
+                total_articles_cache=total_articles,
+                total_commande_cache=total_articles + frais.frais_final,
+                created_at=created, updated_at=created,
+            ))
+        Commande.objects.bulk_create(commandes, batch_size=self.batch)
+        refresh_search(commandes, chunk=self.batch)  # bulk_create => pas de signal
+        refresh_last_lieu({c.client_id for c in commandes})
+
+        lignes_rows, encaissements, livraisons = [], [], []
+        modes = [m for m, _ in Encaissement.ModePaiement.choices]
+        statut_livraison = {
+            Commande.Statut.EN_ATTENTE: Livraison.Statut.A_PREPARER,
+            Commande.Statut.EN_LIVRAISON: Livraison.Statut.EN_LIVRAISON,
+            Commande.Statut.LIVREE: Livraison.Statut.LIVREE,
+            Commande.Statut.ANNULEE: Livraison.Statut.ANNULEE,
+        }
+        reservations: dict[int, int] = {}
+        for cmd, (created, _, lignes) in zip(commandes, specs):
+            ouverte = cmd.statut in (Commande.Statut.EN_ATTENTE, Commande.Statut.EN_LIVRAISON)
+            for art, q in lignes.values():
+                if ouverte:
+                    reservations[art.id] = reservations.get(art.id, 0) + q
+                lignes_rows.append(LigneCommande(
+                    commande=cmd, article=art, quantite=q,
+                    prix_vente_unitaire=art.prix_vente, cout_unitaire=art.cout_moyen,
+                    created_at=created, updated_at=created,
+                ))
+
+            livree = cmd.statut == Commande.Statut.LIVREE
+            if livree or rnd.random() < 0.3:
+                paid = livree and rnd.random() < 0.92
+                encaissements.append(Encaissement(
+                    commande=cmd,
+                    statut=Encaissement.StatutPaiement.PAYEE if paid else Encaissement.StatutPaiement.EN_ATTENTE,
+                    mode=rnd.choices(modes, [45, 40, 15])[0] if paid else "",
+                    encaisse_le=created + timedelta(hours=rnd.randint(2, 72)) if paid else None,
+                    created_at=created, updated_at=created,
+                ))
+
+            livraisons.append(Livraison(
+                commande=cmd,
+                statut=statut_livraison[cmd.statut],
+                date_prevue=cmd.date_livraison,
+                date_reelle=created + timedelta(days=1) if livree else None,
+                created_at=created, updated_at=created,
+            ))
+
+        LigneCommande.objects.bulk_create(lignes_rows, batch_size=self.batch)
+        Encaissement.objects.bulk_create(encaissements, batch_size=self.batch)
+        Livraison.objects.bulk_create(livraisons, batch_size=self.batch)
+        # ✅ commandes ouvertes => quantités réservées (stock seedé fixe: pas de débit des livrées)
+        lock_articles(reservations)
+        apply_stock_deltas({}, source_type=StockMouvement.Source.VENTE, reservations=reservations)
+
+    # -------------------------
+    # Achats / charges
+    # -------------------------
+    @transaction.atomic
+    def _seed_achats(self, n: int, articles: list[Article]):
+        rnd = self.rnd
+        for start in range(0, n, self.batch):
+            achats = []
+            for _ in range(min(self.batch, n - start)):
+                created = self._random_moment()
+                achats.append(Achat(
+                    fournisseur=rnd.choice(["Grossiste Tana", "Import Chine", "Fournisseur local"]),
+                    date_achat=timezone.localtime(created).date(),
+                    created_at=created, updated_at=created,
+                ))
+            Achat.objects.bulk_create(achats, batch_size=self.batch)
+
+            lignes = []
+            for achat in achats:
+                for art in rnd.sample(articles, k=min(len(articles), rnd.randint(1, 8))):
+                    prix = (art.prix_achat * Decimal(str(round(rnd.uniform(0.9, 1.1), 2)))).quantize(Decimal("1"))
+                    lignes.append(AchatLigne(
+                        achat=achat, article=art, quantite=rnd.randint(5, 200),
+                        prix_achat_unitaire=prix, prix_vente_unitaire=art.prix_vente,
+                        maj_prix_article=False,
+                        created_at=achat.created_at, updated_at=achat.created_at,
+                    ))
+            AchatLigne.objects.bulk_create(lignes, batch_size=self.batch)
+
+    @transaction.atomic
+    def _seed_charges(self, n: int):
+        rnd = self.rnd
+        cats = []
+        for nom in ["Livreur", "Transport", "Publicité", "Loyer"]:
+            cats.append(ChargeCategorie.objects.get_or_create(nom=nom)[0])
+
+        rows = []
+        for _ in range(n):
+            created = self._random_moment()
+            rows.append(Charge(
+                categorie=rnd.choice(cats),
+                libelle=rnd.choice(["Prime livraison", "Carburant", "Boost Facebook", "Divers"]),
+                montant=Decimal(rnd.choice([1000, 2000, 5000, 10000, 25000, 50000])),
+                statut=rnd.choices(["PAYEE", "BROUILLON", "ANNULEE"], [85, 10, 5])[0],
+                date_charge=timezone.localtime(created).date(),
+                created_at=created, updated_at=created,
+            ))
+        Charge.objects.bulk_create(rows, batch_size=self.batch)
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configuration', '0001_initial'),
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('statut', models.CharField(max_length=20)),
+                ('mode_paiement', models.CharField(blank=True, default='', max_length=20)),
+                ('nb_commandes', models.PositiveIntegerField(default=0)),
+                ('ca_articles', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('frais', models.BigIntegerField(default=0)),
+                ('cogs', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('page', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='configuration.page')),
+            ],
+            options={
+                'ordering': ['day'],
+                'indexes': [models.Index(fields=['day', 'page'], name='dashboard_d_day_04e828_idx')],
+            },
+        ),
+    ]
@@ -19,3 +19,38 @@ class DashboardSnapshot(models.Model):
 
     def __str__(self) -> str:
         return f"Snapshot {self.date}"
+
+
+class DailySalesFact(models.Model):
+    """
+    Rollup des ventes: 1 ligne par jour × page × statut commande × mode de paiement.
+    Alimenté par les signaux (dashboard/signals.py) et la commande rebuild_sales_facts.
+    - mode_paiement vide = commande non encaissée
+    - day = date de commande (fuseau local)
+    """
+    day = models.DateField()
+    page = models.ForeignKey(
+        "configuration.Page",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    statut = models.CharField(max_length=20)
+    mode_paiement = models.CharField(max_length=20, blank=True, default="")
+
+    nb_commandes = models.PositiveIntegerField(default=0)
+    ca_articles = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    frais = models.BigIntegerField(default=0)
+    cogs = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["day"]
+        indexes = [
+            models.Index(fields=["day", "page"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"Fact {self.day} page:{self.page_id or '-'} {self.statut}/{self.mode_paiement or '-'}"
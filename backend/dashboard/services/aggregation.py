@@ -0,0 +1,88 @@
+# dashboard/services/aggregation.py
+from __future__ import annotations
+
+from django.db.models import (
+    Case, When, Count, Sum, F, Value, OuterRef, Subquery,
+    CharField, DecimalField, BigIntegerField, ExpressionWrapper, QuerySet,
+)
+from django.db.models.functions import Cast, Coalesce, TruncDate
+from django.utils import timezone
+
+from encaissement.models import Encaissement
+from vente.models import LigneCommande
+
+# =========================
+# Agrégation dashboard en 2 étapes
+# =========================
+# 1) par commande: CA articles lu sur Commande.total_articles_cache, COGS calculé par
+#    sous-requête sur SES lignes, frais lus une seule fois (FK)
+#    => 1 ligne par commande, pas de produit lignes × frais
+# 2) rollup: GROUP BY des clés demandées sur ces lignes "commande"
+# Joindre lignes + frais (ou lignes + charges) dans un même GROUP BY multiplie
+# les frais par le nombre de lignes: à ne pas faire.
+
+MONEY = DecimalField(max_digits=18, decimal_places=2)
+
+
+def _zero():
+    return Value(0, output_field=MONEY)
+
+
+def _per_commande_lines_sum(expr) -> Subquery:
+    sq = (
+        LigneCommande.objects
+        .filter(commande_id=OuterRef("pk"))
+        .order_by()
+        .values("commande_id")
+        .annotate(s=Sum(ExpressionWrapper(expr, output_field=MONEY)))
+        .values("s")
+    )
+    return Subquery(sq, output_field=MONEY)
+
+
+def commandes_stage(qs: QuerySet) -> QuerySet:
+    """
+    Étape 1: annote chaque commande avec ses totaux.
+    - ca_articles: total_articles_cache (= SUM(qte * prix_vente_unitaire) de ses lignes)
+    - cogs       : SUM(qte * cout_unitaire) de ses lignes (CMP figé à la vente)
+    - frais      : frais_final (1 fois par commande)
+    - mode_paye  : mode d'encaissement si PAYEE, sinon ""
+    """
+    return qs.annotate(
+        ca_articles=Cast(F("total_articles_cache"), MONEY),
+        cogs=Coalesce(
+            _per_commande_lines_sum(F("quantite") * F("cout_unitaire")),
+            _zero(),
+        ),
+        frais=Coalesce(F("frais_livraison__frais_final"), Value(0), output_field=BigIntegerField()),
+        mode_paye=Case(
+            When(encaissement__statut=Encaissement.StatutPaiement.PAYEE, then=F("encaissement__mode")),
+            default=Value(""),
+            output_field=CharField(),
+        ),
+    )
+
+
+def rollup(stage_qs: QuerySet, *keys: str, **expr_keys) -> QuerySet:
+    """
+    Étape 2: GROUP BY des clés sur les commandes annotées par commandes_stage().
+    keys: champs / annotations existants ; expr_keys: clés calculées (ex: day=day_expr()).
+    Renvoie des dicts {clés..., nb, ca_articles, frais, cogs}.
+    """
+    qs = stage_qs.order_by()
+    if expr_keys:
+        qs = qs.annotate(**expr_keys)
+    return (
+        qs.values(*keys, *expr_keys.keys())
+        .annotate(
+            nb=Count("id"),
+            ca_articles_sum=Coalesce(Sum("ca_articles"), _zero()),
+            frais_sum=Coalesce(Sum("frais"), Value(0), output_field=BigIntegerField()),
+            cogs_sum=Coalesce(Sum("cogs"), _zero()),
+        )
+    )
+
+
+def day_expr():
+    """Jour de commande dans le fuseau local (même découpage que vente.dates.day_range)."""
+    return TruncDate("created_at", tzinfo=timezone.get_current_timezone())
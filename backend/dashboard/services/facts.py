@@ -0,0 +1,77 @@
+# dashboard/services/facts.py
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Iterable
+
+from django.db import transaction
+from django.utils import timezone
+
+from vente.models import Commande
+from vente.dates import days_q
+from dashboard.models import DailySalesFact
+from dashboard.services.aggregation import commandes_stage, rollup, day_expr
+
+
+def commande_day(created_at) -> date | None:
+    """Jour (fuseau local) auquel une commande est rattachée dans les facts."""
+    if not created_at:
+        return None
+    return timezone.localtime(created_at).date()
+
+
+def compute_facts(days: Iterable[date]) -> list[DailySalesFact]:
+    """
+    Calcule (sans sauvegarder) les lignes de facts pour les jours donnés,
+    via l'agrégation 2 étapes (par commande, puis rollup jour × page × statut × mode).
+    """
+    days = sorted(set(d for d in days if d))
+    if not days:
+        return []
+
+    stage = commandes_stage(Commande.objects.filter(days_q("created_at", days)))
+    rows = rollup(stage, "page_id", "statut", "mode_paye", day=day_expr())
+
+    return [
+        DailySalesFact(
+            day=r["day"],
+            page_id=r["page_id"],
+            statut=r["statut"],
+            mode_paiement=r["mode_paye"] or "",
+            nb_commandes=r["nb"],
+            ca_articles=r["ca_articles_sum"],
+            frais=r["frais_sum"],
+            cogs=r["cogs_sum"],
+        )
+        for r in rows
+    ]
+
+
+@transaction.atomic
+def refresh_days(days: Iterable[date]) -> int:
+    """
+    Recalcule les facts des jours donnés (delete + bulk_create).
+    Idempotent: peut être rappelé sans risque.
+    """
+    days = sorted(set(d for d in days if d))
+    if not days:
+        return 0
+
+    facts = compute_facts(days)
+    DailySalesFact.objects.filter(day__in=days).delete()
+    DailySalesFact.objects.bulk_create(facts, batch_size=500)
+    return len(facts)
+
+
+def rebuild_range(dfrom: date, dto: date, *, chunk_days: int = 31) -> int:
+    """
+    Reconstruit tous les facts entre dfrom et dto (inclus), par paquets de jours.
+    """
+    total = 0
+    cur = dfrom
+    while cur <= dto:
+        end = min(cur + timedelta(days=chunk_days - 1), dto)
+        days = [cur + timedelta(days=i) for i in range((end - cur).days + 1)]
+        total += refresh_days(days)
+        cur = end + timedelta(days=1)
+    return total
@@ -0,0 +1,172 @@
+# dashboard/signals.py
+from __future__ import annotations
+
+import threading
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from vente.models import Commande, LigneCommande
+from encaissement.models import Encaissement
+from charge.models import Charge
+from livraison.models import FraisLivraison
+from achats.models import Achat, AchatLigne
+from dashboard.cache import bump_days
+from dashboard.services.facts import commande_day, refresh_days
+
+
+# =========================
+# Jours à recalculer / invalider (après commit)
+# =========================
+_pending = threading.local()
+
+
+def _pending_set(name: str) -> set:
+    days = getattr(_pending, name, None)
+    if days is None:
+        days = set()
+        setattr(_pending, name, days)
+    return days
+
+
+def _flush_pending():
+    fact_days = _pending_set("fact_days")
+    cache_days = _pending_set("cache_days")
+    if not fact_days and not cache_days:
+        return
+
+    todo_facts, todo_cache = set(fact_days), set(cache_days)
+    fact_days.clear()
+    cache_days.clear()
+
+    # facts d'abord, puis invalidation: une lecture entre les deux ne peut pas
+    # remettre en cache des facts pas encore recalculés
+    if todo_facts:
+        refresh_days(todo_facts)
+    bump_days(todo_facts | todo_cache)
+
+
+def mark_days_dirty(days, *, facts: bool = True):
+    """
+    Planifie, après le commit, le recalcul des facts (si facts=True)
+    et l'invalidation du cache dashboard pour ces jours.
+    Plusieurs écritures dans la même transaction => un seul recalcul par jour.
+    """
+    days = {d for d in days if d}
+    if not days:
+        return
+    _pending_set("fact_days" if facts else "cache_days").update(days)
+    transaction.on_commit(_flush_pending)
+
+
+def _day_for_commande_id(commande_id: int | None, cached: Commande | None = None):
+    if cached is not None and cached.created_at:
+        return commande_day(cached.created_at)
+    if not commande_id:
+        return None
+    created_at = (
+        Commande.objects.filter(id=commande_id).values_list("created_at", flat=True).first()
+    )
+    # commande supprimée: le signal de la commande elle-même s'en charge
+    return commande_day(created_at)
+
+
+def _cached_commande(instance) -> Commande | None:
+    return instance._state.fields_cache.get("commande")
+
+
+def _achat_day(date_achat, created_at):
+    if date_achat:
+        return date_achat
+    return timezone.localtime(created_at).date() if created_at else None
+
+
+def _day_for_achat_id(achat_id: int | None, cached: Achat | None = None):
+    if cached is not None:
+        return _achat_day(cached.date_achat, cached.created_at)
+    if not achat_id:
+        return None
+    row = Achat.objects.filter(id=achat_id).values_list("date_achat", "created_at").first()
+    return _achat_day(*row) if row else None
+
+
+# =========================
+# Receivers ventes (facts + cache)
+# =========================
+@receiver(pre_save, sender=Commande)
+def commande_remember_old_day(sender, instance: Commande, update_fields=None, **kwargs):
+    # date de commande modifiée (correction / import): l'ancien jour est à recalculer aussi
+    if not instance.pk or (update_fields is not None and "created_at" not in update_fields):
+        instance._dashboard_old_day = None
+        return
+    instance._dashboard_old_day = _day_for_commande_id(instance.pk)
+
+
+@receiver(post_save, sender=Commande)
+@receiver(post_delete, sender=Commande)
+def commande_changed(sender, instance: Commande, **kwargs):
+    mark_days_dirty([commande_day(instance.created_at), getattr(instance, "_dashboard_old_day", None)])
+
+
+@receiver(post_save, sender=LigneCommande)
+@receiver(post_delete, sender=LigneCommande)
+def ligne_commande_changed(sender, instance: LigneCommande, **kwargs):
+    mark_days_dirty([_day_for_commande_id(instance.commande_id, _cached_commande(instance))])
+
+
+@receiver(post_save, sender=Encaissement)
+@receiver(post_delete, sender=Encaissement)
+def encaissement_changed(sender, instance: Encaissement, **kwargs):
+    mark_days_dirty([_day_for_commande_id(instance.commande_id, _cached_commande(instance))])
+
+
+@receiver(post_save, sender=FraisLivraison)
+@receiver(post_delete, sender=FraisLivraison)
+def frais_changed(sender, instance: FraisLivraison, created=False, raw=False, **kwargs):
+    # frais_final lu par les facts (colonne frais): jours des commandes qui pointent ce frais
+    if raw or created:
+        return  # nouveau frais: aucune commande liée encore
+    mark_days_dirty(
+        commande_day(created_at)
+        for created_at in Commande.objects.filter(frais_livraison_id=instance.id).values_list("created_at", flat=True)
+    )
+
+
+# =========================
+# Receivers dépenses (cache seulement)
+# =========================
+@receiver(pre_save, sender=Charge)
+def charge_remember_old_day(sender, instance: Charge, **kwargs):
+    instance._dashboard_old_day = (
+        Charge.objects.filter(pk=instance.pk).values_list("date_charge", flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Charge)
+@receiver(post_delete, sender=Charge)
+def charge_changed(sender, instance: Charge, **kwargs):
+    mark_days_dirty([instance.date_charge, getattr(instance, "_dashboard_old_day", None)], facts=False)
+
+
+@receiver(pre_save, sender=Achat)
+def achat_remember_old_day(sender, instance: Achat, **kwargs):
+    instance._dashboard_old_day = _day_for_achat_id(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Achat)
+@receiver(post_delete, sender=Achat)
+def achat_changed(sender, instance: Achat, **kwargs):
+    mark_days_dirty(
+        [_achat_day(instance.date_achat, instance.created_at), getattr(instance, "_dashboard_old_day", None)],
+        facts=False,
+    )
+
+
+@receiver(post_save, sender=AchatLigne)
+@receiver(post_delete, sender=AchatLigne)
+def achat_ligne_changed(sender, instance: AchatLigne, **kwargs):
+    cached = instance._state.fields_cache.get("achat")
+    mark_days_dirty([_day_for_achat_id(instance.achat_id, cached)], facts=False)
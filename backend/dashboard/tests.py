@@ -1,3 +1,337 @@
+from __future__ import annotations
+
+import random
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from article.models import Article
+from charge.models import Charge, ChargeCategorie
+from client.models import Client
+from configuration.models import AppConfiguration, Page
+from encaissement.models import Encaissement
+from livraison.models import FraisLivraison, LieuLivraison
+from user.models import User
+from vente.models import Commande, LigneCommande
+from dashboard.models import DailySalesFact
+from dashboard.services.facts import rebuild_range
+
+
+class DashboardAggregationRegressionTests(TestCase):
+    """
+    Compare les widgets dashboard à un calcul Python de référence sur un jeu généré.
+    Commandes à plusieurs lignes + charges rattachées: un JOIN lignes × frais (ou × charges)
+    dans un même GROUP BY fausserait les totaux.
+    """
+
+    DAYS = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        rnd = random.Random(42)
+
+        cls.user = User.objects.create_user(username="dash", email="dash@test.mg", password="x")
+        cfg = AppConfiguration.get_solo()
+        cls.pages = [
+            Page.objects.create(config=cfg, nom=f"Page {i}", lien=f"/p{i}") for i in range(2)
+        ]
+        lieux = [
+            LieuLivraison.objects.create(nom=f"Lieu {i}", categorie=cat)
+            for i, cat in enumerate([LieuLivraison.Categorie.VILLE, LieuLivraison.Categorie.PERIPHERIE])
+        ]
+        client = Client.objects.create(nom="Client test", contact="0340000000")
+        cat = ChargeCategorie.objects.create(nom="Livreur")
+
+        articles = []
+        for i in range(6):
+            a = Article.objects.create(
+                nom_produit=f"Produit {i}", reference=f"REF{i}",
+                prix_vente=Decimal(1000 * (i + 1)), quantite_stock=1000,
+            )
+            # un article sans coût connu (CMP = 0)
+            a.cout_moyen = Decimal(400 * (i + 1)) if i != 5 else Decimal("0")
+            articles.append(a)
+
+        cls.today = timezone.localdate()
+        cls.dfrom = cls.today - timedelta(days=cls.DAYS)
+        statuts = [s for s, _ in Commande.Statut.choices]
+        modes = [m for m, _ in Encaissement.ModePaiement.choices]
+
+        for n in range(40):
+            frais = FraisLivraison(lieu=rnd.choice(lieux))
+            frais.frais_override = rnd.choice([None, 0, 2500])
+            frais.save()
+            cmd = Commande.objects.create(
+                page=rnd.choice(cls.pages + [None]),
+                client=client,
+                lieu_livraison=frais.lieu,
+                frais_livraison=frais,
+                statut=rnd.choice(statuts),
+            )
+            for _ in range(rnd.randint(1, 5)):
+                art = rnd.choice(articles)
+                LigneCommande.objects.create(
+                    commande=cmd, article=art,
+                    quantite=rnd.randint(1, 4), prix_vente_unitaire=art.prix_vente,
+                    cout_unitaire=art.cout_moyen,
+                )
+            cmd.refresh_totals()
+            if rnd.random() < 0.5:
+                enc = Encaissement(commande=cmd)
+                if rnd.random() < 0.8:
+                    enc.mark_paid(mode=rnd.choice(modes), reference="REF")
+                enc.save()
+            for _ in range(rnd.randint(0, 2)):
+                Charge.objects.create(
+                    categorie=cat, libelle="Prime", montant=Decimal("500"),
+                    commande=cmd, date_charge=cls.today,
+                )
+            # dates de commande réparties sur la période (heure locale variable)
+            created = timezone.now() - timedelta(days=rnd.randint(0, cls.DAYS), hours=rnd.randint(0, 20))
+            Commande.objects.filter(pk=cmd.pk).update(created_at=created)
+
+        rebuild_range(cls.dfrom - timedelta(days=1), cls.today)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.params = {"date_from": self.dfrom.isoformat(), "date_to": self.today.isoformat()}
+
+    # -------------------------
+    # Référence Python
+    # -------------------------
+    def _reference(self):
+        rows = []
+        qs = (
+            Commande.objects
+            .filter(created_at__date__gte=self.dfrom, created_at__date__lte=self.today)
+            .select_related("frais_livraison")
+            .prefetch_related("lignes")
+        )
+        for cmd in qs:
+            enc = Encaissement.objects.filter(commande=cmd).first()
+            paid = bool(enc and enc.statut == Encaissement.StatutPaiement.PAYEE)
+            lignes = list(cmd.lignes.all())
+            rows.append({
+                "day": timezone.localtime(cmd.created_at).date(),
+                "page_id": cmd.page_id,
+                "statut": cmd.statut,
+                "mode": enc.mode if paid else "",
+                "ca": sum((l.quantite * l.prix_vente_unitaire for l in lignes), Decimal("0")),
+                "frais": int(cmd.frais_livraison.frais_final or 0),
+                "cogs": sum((l.quantite * l.cout_unitaire for l in lignes), Decimal("0")),
+            })
+        return rows
+
+    @staticmethod
+    def _ca(rows) -> int:
+        return int(float(sum((r["ca"] for r in rows), Decimal("0")))) + sum(r["frais"] for r in rows)
+
+    def _get(self, endpoint: str, **extra):
+        resp = self.api.get(f"/api/dashboard/{endpoint}/", {**self.params, **extra})
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return resp.json()
+
+    # -------------------------
+    # Tests
+    # -------------------------
+    def test_dataset_has_fan_out_cases(self):
+        multi = Commande.objects.filter(lignes__isnull=False).values("id").distinct().count()
+        self.assertGreater(multi, 0)
+        self.assertTrue(Charge.objects.exclude(commande=None).exists())
+
+    def test_overview_matches_reference(self):
+        ref = self._reference()
+        data = self._get("overview")
+
+        paid = [r for r in ref if r["mode"]]
+        not_cancelled = [r for r in ref if r["statut"] != Commande.Statut.ANNULEE]
+
+        self.assertEqual(data["nb_commandes"], len(ref))
+        self.assertEqual(data["nb_livrees"], sum(1 for r in ref if r["statut"] == Commande.Statut.LIVREE))
+        self.assertEqual(data["nb_annulees"], len(ref) - len(not_cancelled))
+        self.assertEqual(data["ca_total_commandes"], self._ca(ref))
+        self.assertEqual(data["ca_total_encaisse"], self._ca(paid))
+        self.assertEqual(data["cogs_estime"], int(float(sum((r["cogs"] for r in not_cancelled), Decimal("0")))))
+
+    def test_ca_by_day_matches_reference(self):
+        by_day = defaultdict(list)
+        for r in self._reference():
+            by_day[r["day"]].append(r)
+        expected = [{"x": d.isoformat(), "y": self._ca(rows)} for d, rows in sorted(by_day.items())]
+        self.assertEqual(self._get("ca-by-day")["points"], expected)
+
+    def test_payment_mix_and_sales_by_page_match_reference(self):
+        ref = self._reference()
+
+        by_mode = defaultdict(list)
+        for r in ref:
+            if r["mode"]:
+                by_mode[r["mode"]].append(r)
+        expected_mix = [{"mode": m, "nb": len(rows), "ca": self._ca(rows)} for m, rows in sorted(by_mode.items())]
+        self.assertEqual(self._get("payment-mix")["items"], expected_mix)
+
+        by_page = defaultdict(list)
+        for r in ref:
+            by_page[r["page_id"]].append(r)
+        got = {it["page_id"]: (it["nb"], it["ca"]) for it in self._get("sales-by-page")["items"]}
+        self.assertEqual(got, {p: (len(rows), self._ca(rows)) for p, rows in by_page.items()})
+
+    def test_page_filter_and_bundle_are_consistent(self):
+        page = self.pages[0]
+        ref = [r for r in self._reference() if r["page_id"] == page.id]
+
+        overview = self._get("overview", page=page.id)
+        self.assertEqual(overview["nb_commandes"], len(ref))
+        self.assertEqual(overview["ca_total_commandes"], self._ca(ref))
+
+        bundle = self._get("bundle", page=page.id, widgets="overview,ca_by_day")
+        self.assertEqual(bundle["widgets"]["overview"], overview)
+        self.assertEqual(bundle["widgets"]["ca_by_day"], self._get("ca-by-day", page=page.id))
+
+    def test_bundle_rankings_use_namespaced_params(self):
+        widgets = "articles_sortants,articles_entrants"
+        # ?order / ?after d'un endpoint isolé: ignorés par le bundle (plus de 400 sur entrants)
+        bundle = self._get("bundle", widgets=widgets, order="marge", after="1,1")["widgets"]
+        self.assertEqual(bundle["articles_sortants"], self._get("articles-sortants"))
+        self.assertEqual(bundle["articles_entrants"], self._get("articles-entrants"))
+
+        sortants = self._get("articles-sortants", order="marge", limit=2)
+        bundle = self._get(
+            "bundle", widgets=widgets, limit=2, sortants_order="marge", sortants_after=sortants["next_after"],
+        )["widgets"]
+        self.assertEqual(
+            bundle["articles_sortants"],
+            self._get("articles-sortants", order="marge", limit=2, after=sortants["next_after"]),
+        )
+        self.assertEqual(bundle["articles_entrants"], self._get("articles-entrants", limit=2))
+
+        resp = self.api.get("/api/dashboard/bundle/", {**self.params, "widgets": widgets, "entrants_order": "marge"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("entrants_order", resp.json())
+
+    def test_articles_sortants_keyset_pages_match_full_ranking(self):
+        for order, key in [("total_vente", "total_vente"), ("marge", "marge_estime"), ("quantite", "quantite")]:
+            full = self._get("articles-sortants", order=order)["items"]
+            self.assertEqual([it[key] for it in full], sorted((it[key] for it in full), reverse=True))
+
+            pages, after = [], None
+            while True:
+                extra = {"order": order, "limit": 2, **({"after": after} if after else {})}
+                data = self._get("articles-sortants", **extra)
+                pages.extend(data["items"])
+                after = data["next_after"]
+                if not after:
+                    break
+            self.assertEqual([it["article_id"] for it in pages], [it["article_id"] for it in full])
+
+    def test_articles_sortants_rejects_unknown_order(self):
+        resp = self.api.get("/api/dashboard/articles-sortants/", {**self.params, "order": "nope"})
+        self.assertEqual(resp.status_code, 400)
+
+
+class DailySalesFactSignalTests(TestCase):
+    """Facts tenus à jour par les écritures (dashboard/signals.py), après commit: ancien et nouveau jour."""
+
+    def setUp(self):
+        self.lieu = LieuLivraison.objects.create(nom="Lieu", categorie=LieuLivraison.Categorie.VILLE)
+        self.client_obj = Client.objects.create(nom="C", contact="034")
+        self.article = Article.objects.create(nom_produit="P", reference="P", prix_vente=Decimal("1000"), quantite_stock=100)
+        self.today = timezone.localdate()
+
+    def _facts(self, day) -> dict:
+        return {
+            (f.statut, f.mode_paiement): (f.nb_commandes, int(f.ca_articles))
+            for f in DailySalesFact.objects.filter(day=day)
+        }
+
+    def test_writes_refresh_old_and_new_day(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cmd = Commande.objects.create(
+                client=self.client_obj, lieu_livraison=self.lieu,
+                frais_livraison=FraisLivraison.objects.create(lieu=self.lieu),
+            )
+            ligne = LigneCommande.objects.create(
+                commande=cmd, article=self.article, quantite=2, prix_vente_unitaire=Decimal("1000"),
+            )
+            cmd.refresh_totals()  # comme CommandeSerializer (UPDATE sans signal)
+        self.assertEqual(self._facts(self.today), {("EN_ATTENTE", ""): (1, 2000)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ligne.quantite = 3
+            ligne.save()
+            cmd.refresh_totals()
+            enc = Encaissement(commande=cmd)
+            enc.mark_paid(mode=Encaissement.ModePaiement.MVOLA)
+            enc.save()
+        self.assertEqual(self._facts(self.today), {("EN_ATTENTE", "MVOLA"): (1, 3000)})
+
+        # date de commande corrigée: l'ancien jour est vidé, le nouveau rempli
+        hier = self.today - timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            cmd.created_at = timezone.now() - timedelta(days=1)
+            cmd.save()
+        self.assertEqual(self._facts(self.today), {})
+        self.assertEqual(self._facts(hier), {("EN_ATTENTE", "MVOLA"): (1, 3000)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enc.delete()
+        self.assertEqual(self._facts(hier), {("EN_ATTENTE", ""): (1, 3000)})
+
+    def test_frais_edit_refreshes_fact_day(self):
+        frais = FraisLivraison.objects.create(lieu=self.lieu, frais_override=2000)
+        with self.captureOnCommitCallbacks(execute=True):
+            Commande.objects.create(client=self.client_obj, lieu_livraison=self.lieu, frais_livraison=frais)
+        self.assertEqual(DailySalesFact.objects.get(day=self.today).frais, 2000)
+
+        # frais modifié seul (PATCH /api/livraison/frais/<id>/): pas d'écriture sur la commande
+        with self.captureOnCommitCallbacks(execute=True):
+            frais.frais_override = 3500
+            frais.save()
+        self.assertEqual(DailySalesFact.objects.get(day=self.today).frais, 3500)
+
+
+class DashboardCacheTests(TestCase):
+    """X-Dashboard-Cache (dashboard/cache.py): période passée en cache, invalidée par une écriture d'un de ses jours."""
+
+    def setUp(self):
+        caches[settings.DASHBOARD_CACHE_ALIAS].clear()
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create_user(username="c", email="c@test.mg", password="x"))
+        self.today = timezone.localdate()
+        self.lieu = LieuLivraison.objects.create(nom="Lieu", categorie=LieuLivraison.Categorie.VILLE)
+
+    def _cache(self, dfrom, dto) -> str:
+        resp = self.api.get("/api/dashboard/overview/", {"date_from": dfrom.isoformat(), "date_to": dto.isoformat()})
+        self.assertEqual(resp.status_code, 200)
+        return resp["X-Dashboard-Cache"]
+
+    def test_hit_miss_and_bypass(self):
+        dfrom, dto = self.today - timedelta(days=10), self.today - timedelta(days=3)
+        self.assertEqual(self._cache(dfrom, dto), "MISS")
+        self.assertEqual(self._cache(dfrom, dto), "HIT")
+
+        # écriture hors période: toujours en cache
+        with self.captureOnCommitCallbacks(execute=True):
+            cmd = Commande.objects.create(
+                client=Client.objects.create(nom="C"), lieu_livraison=self.lieu,
+                frais_livraison=FraisLivraison.objects.create(lieu=self.lieu),
+            )
+        self.assertEqual(self._cache(dfrom, dto), "HIT")
+
+        # commande rattachée à un jour de la période => invalidée
+        with self.captureOnCommitCallbacks(execute=True):
+            cmd.created_at = timezone.now() - timedelta(days=5)
+            cmd.save()
+        self.assertEqual(self._cache(dfrom, dto), "MISS")
+        self.assertEqual(self._cache(dfrom, dto), "HIT")
 
-# Create your tests here.
+        # période qui contient aujourd'hui: jamais en cache
+        self.assertEqual(self._cache(dfrom, self.today), "BYPASS")
+        self.assertEqual(self._cache(dfrom, self.today), "BYPASS")
@@ -13,4 +13,7 @@ urlpatterns = [
      # ✅ nouveaux
     path("articles-sortants/", views.dashboard_articles_sortants),
     path("articles-entrants/", views.dashboard_articles_entrants),
+
+    # ✅ tous les widgets en 1 seul appel
+    path("bundle/", views.dashboard_bundle, name="dashboard-bundle"),
 ]
@@ -1,23 +1,26 @@
 # dashboard/views.py
 from __future__ import annotations
 
+import time
 from datetime import date
+from decimal import Decimal, InvalidOperation
 
-from django.db.models import (
-    Count, Sum, F, Q, Value, IntegerField, DecimalField, ExpressionWrapper,
-    OuterRef, Subquery
-)
-from django.db.models.functions import Coalesce, TruncDay, Cast
+from django.db.models import Sum, F, Q, Value, DecimalField, ExpressionWrapper
+from django.db.models.functions import Coalesce
 from django.utils.dateparse import parse_date
 
+from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from vente.models import Commande, LigneCommande
-from encaissement.models import Encaissement
+from vente.dates import day_range_q
 from charge.models import Charge
 from achats.models import Achat, AchatLigne
+from dashboard.models import DailySalesFact
+from dashboard.cache import dashboard_cached
 
 
 # -----------------------------
@@ -41,7 +44,7 @@ def _base_qs(request):
     qs = (
         Commande.objects
         .select_related("page", "frais_livraison", "encaissement")
-        .filter(created_at__date__gte=dfrom, created_at__date__lte=dto)
+        .filter(day_range_q("created_at", dfrom, dto))
     )
 
     page_id = (request.query_params.get("page") or "").strip()
@@ -51,17 +54,32 @@ def _base_qs(request):
     return qs, dfrom, dto
 
 
-# -----------------------------
-# Expressions CA / frais / charges
-# -----------------------------
-def _ca_expr():
+def _facts_qs(request):
     """
-    CA articles = SUM(qte * prix_vente_unitaire) via lignes
+    Même périmètre que _base_qs, mais sur la table de rollup DailySalesFact.
     """
+    dfrom, dto = _parse_dates(request)
+    qs = DailySalesFact.objects.filter(day__gte=dfrom, day__lte=dto)
+
+    page_id = (request.query_params.get("page") or "").strip()
+    if page_id.isdigit():
+        qs = qs.filter(page_id=int(page_id))
+
+    return qs, dfrom, dto
+
+
+def _achats_in_range(dfrom: date, dto: date):
+    return Achat.objects.filter(
+        Q(date_achat__gte=dfrom, date_achat__lte=dto) |
+        (Q(date_achat__isnull=True) & day_range_q("created_at", dfrom, dto))
+    )
+
+
+def _line_total(qte_field: str, prix_field: str):
     return Coalesce(
         Sum(
             ExpressionWrapper(
-                F("lignes__quantite") * F("lignes__prix_vente_unitaire"),
+                F(qte_field) * F(prix_field),
                 output_field=DecimalField(max_digits=18, decimal_places=2),
             )
         ),
@@ -69,165 +87,201 @@ def _ca_expr():
     )
 
 
-def _frais_expr():
-    return Coalesce(
-        Sum(Cast(F("frais_livraison__frais_final"), IntegerField())),
-        Value(0, output_field=IntegerField()),
-    )
-
-
-def _charges_paid_sum_expr():
-    return Coalesce(
-        Sum(
-            Cast(F("charges__montant"), DecimalField(max_digits=18, decimal_places=2)),
-            filter=Q(charges__statut="PAYEE"),
-        ),
-        Value(0, output_field=DecimalField(max_digits=18, decimal_places=2)),
+def _charges_total_in_range(dfrom: date, dto: date):
+    agg = Charge.objects.filter(
+        statut="PAYEE",
+        date_charge__gte=dfrom,
+        date_charge__lte=dto,
+    ).aggregate(
+        total=Coalesce(
+            Sum("montant"),
+            Value(0, output_field=DecimalField(max_digits=18, decimal_places=2))
+        )
     )
+    return agg["total"] or 0
 
 
 # -----------------------------
-# COGS / dépenses / subquery coût achat
+# Classements articles (tri + limite + keyset en SQL)
 # -----------------------------
-def _latest_purchase_price_subquery():
-    """
-    Dernier prix d'achat connu pour un article.
-    (On prend le plus récent AchatLigne via achat.date_achat sinon achat.created_at)
-    """
-    al_qs = (
-        AchatLigne.objects
-        .filter(article_id=OuterRef("article_id"))
-        .select_related("achat")
-        .order_by(
-            F("achat__date_achat").desc(nulls_last=True),
-            F("achat__created_at").desc(nulls_last=True),
-            F("created_at").desc(nulls_last=True),
-            "-id",
-        )
-        .values("prix_achat_unitaire")[:1]
-    )
-    return Subquery(al_qs, output_field=DecimalField(max_digits=12, decimal_places=2))
+MONEY = DecimalField(max_digits=18, decimal_places=2)
 
+# ?order= => annotation SQL (tri décroissant, départage par -article_id)
+SORTANTS_ORDERS = {"total_vente": "total_vente", "quantite": "qte_total", "marge": "marge"}
+ENTRANTS_ORDERS = {"total_achat": "total_achat", "quantite": "qte_total"}
 
-def _cogs_total_for_commandes(qs_commandes):
-    """
-    Coût estimé des articles vendus (COGS) sur la période
-    = SUM(qte_vendue * dernier_prix_achat_connu(article))
-    """
-    base = (
-        LigneCommande.objects
-        .select_related("commande", "article")
-        .filter(commande__in=qs_commandes.exclude(statut=Commande.Statut.ANNULEE))
-    )
 
-    latest_cost = _latest_purchase_price_subquery()
+def _parse_after(raw: str, key: str = "after") -> tuple[Decimal, int] | None:
+    """?after=<valeur,article_id> (curseur renvoyé dans next_after)."""
+    raw = (raw or "").strip()
+    if not raw:
+        return None
+    value, _, article_id = raw.rpartition(",")
+    try:
+        return Decimal(value), int(article_id)
+    except (InvalidOperation, ValueError):
+        raise ValidationError({key: "Format attendu: <valeur>,<article_id>"})
 
-    agg = (
-        base.annotate(
-            cout_unit=Coalesce(
-                latest_cost,
-                Value(0, output_field=DecimalField(max_digits=12, decimal_places=2))
-            ),
-            cout_ligne=ExpressionWrapper(
-                F("quantite") * F("cout_unit"),
-                output_field=DecimalField(max_digits=18, decimal_places=2),
-            ),
-        )
-        .aggregate(
-            cogs=Coalesce(
-                Sum("cout_ligne"),
-                Value(0, output_field=DecimalField(max_digits=18, decimal_places=2))
-            )
-        )
-    )
 
-    return agg["cogs"] or 0
+def _ranked(qs, orders: dict, order: str, after: tuple | None, limit: int | None):
+    field = orders[order]
+    if after is not None:
+        value, article_id = after
+        qs = qs.filter(Q(**{f"{field}__lt": value}) | Q(**{field: value, "article_id__lt": article_id}))
+    qs = qs.order_by(F(field).desc(), "-article_id")
+    return list(qs[:limit] if limit is not None else qs)
+
 
+def _next_after(rows: list[dict], field: str, limit: int | None) -> str | None:
+    if limit is None or len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return f"{last[field]},{last['article_id']}"
 
-def _achats_total_in_range(dfrom: date, dto: date):
+
+# -----------------------------
+# Scope: scans partagés (1 seule fois par requête)
+# -----------------------------
+class _DashboardScope:
     """
-    Total achats sur période = SUM(qte * prix_achat_unitaire)
+    Périmètre d'une requête dashboard (dates + page) et cache des scans partagés:
+    - facts   : lignes DailySalesFact de la période (quelques centaines max)
+    Les classements articles (sortants / entrants) sont triés, paginés et limités en SQL:
+    seules les lignes affichées remontent en Python.
     """
-    achats_qs = Achat.objects.filter(
-        Q(date_achat__gte=dfrom, date_achat__lte=dto) |
-        Q(date_achat__isnull=True, created_at__date__gte=dfrom, created_at__date__lte=dto)
-    )
 
-    agg = AchatLigne.objects.filter(achat__in=achats_qs).aggregate(
-        total=Coalesce(
-            Sum(
-                ExpressionWrapper(
-                    F("quantite") * F("prix_achat_unitaire"),
-                    output_field=DecimalField(max_digits=18, decimal_places=2),
+    def __init__(self, request, *, bundle: bool = False):
+        self.request = request
+        self.bundle = bundle
+        self.dfrom, self.dto = _parse_dates(request)
+        self._facts = None
+
+    def _param(self, name: str, widget: str | None) -> str:
+        """Bundle: paramètres propres à un widget préfixés (sortants_order, entrants_after...)."""
+        return f"{widget}_{name}" if self.bundle and widget else name
+
+    @property
+    def range(self) -> dict:
+        return {"date_from": self.dfrom.isoformat(), "date_to": self.dto.isoformat()}
+
+    def limit(self, default: int | None = None) -> int | None:
+        limit = (self.request.query_params.get("limit") or "").strip()
+        return int(limit) if limit.isdigit() else default
+
+    def order(self, orders: dict, default: str, widget: str | None = None) -> str:
+        key = self._param("order", widget)
+        order = (self.request.query_params.get(key) or "").strip() or default
+        if order not in orders:
+            raise ValidationError({key: f"Valeurs possibles: {', '.join(orders)}"})
+        return order
+
+    def after(self, widget: str | None = None) -> tuple[Decimal, int] | None:
+        key = self._param("after", widget)
+        return _parse_after(self.request.query_params.get(key), key)
+
+    def facts(self) -> list[dict]:
+        if self._facts is None:
+            qs, _, _ = _facts_qs(self.request)
+            self._facts = list(
+                qs.values(
+                    "day", "page_id", "page__nom", "statut", "mode_paiement",
+                    "nb_commandes", "ca_articles", "frais", "cogs",
                 )
-            ),
-            Value(0, output_field=DecimalField(max_digits=18, decimal_places=2)),
+            )
+        return self._facts
+
+    def sortants_qs(self):
+        qs, _, _ = _base_qs(self.request)
+        qs = qs.exclude(statut=Commande.Statut.ANNULEE)
+        return (
+            LigneCommande.objects
+            .filter(commande__in=qs)
+            .values("article_id", "article__reference", "article__nom_produit")
+            .annotate(
+                qte_total=Coalesce(Sum("quantite"), Value(0)),
+                total_vente=_line_total("quantite", "prix_vente_unitaire"),
+                total_cout=_line_total("quantite", "cout_unitaire"),  # ✅ CMP figé à la vente
+            )
+            .annotate(marge=ExpressionWrapper(F("total_vente") - F("total_cout"), output_field=MONEY))
         )
-    )
-    return agg["total"] or 0
 
+    def entrants_qs(self):
+        return (
+            AchatLigne.objects
+            .filter(achat__in=_achats_in_range(self.dfrom, self.dto))
+            .values("article_id", "article__reference", "article__nom_produit")
+            .annotate(
+                qte_total=Coalesce(Sum("quantite"), Value(0)),
+                total_achat=_line_total("quantite", "prix_achat_unitaire"),
+                total_vente_ref=_line_total("quantite", "prix_vente_unitaire"),
+            )
+        )
 
-def _charges_total_in_range(dfrom: date, dto: date):
-    agg = Charge.objects.filter(
-        statut="PAYEE",
-        date_charge__gte=dfrom,
-        date_charge__lte=dto,
-    ).aggregate(
-        total=Coalesce(
-            Sum("montant"),
-            Value(0, output_field=DecimalField(max_digits=18, decimal_places=2))
+    def achats_total(self) -> Decimal:
+        agg = (
+            AchatLigne.objects
+            .filter(achat__in=_achats_in_range(self.dfrom, self.dto))
+            .aggregate(total=_line_total("quantite", "prix_achat_unitaire"))
         )
-    )
-    return agg["total"] or 0
+        return agg["total"] or Decimal("0")
 
 
-# -----------------------------
-# Views Dashboard
-# -----------------------------
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def dashboard_overview(request):
-    qs, dfrom, dto = _base_qs(request)
+def _rollup(rows, key=None) -> dict:
+    """
+    Somme nb / CA articles / frais / cogs de lignes de facts, groupées par key(row).
+    key=None => un seul groupe (clé None).
+    """
+    out: dict = {}
+    for r in rows:
+        k = key(r) if key else None
+        acc = out.setdefault(k, {"nb": 0, "ca_articles": Decimal("0"), "frais": 0, "cogs": Decimal("0")})
+        acc["nb"] += int(r["nb_commandes"] or 0)
+        acc["ca_articles"] += r["ca_articles"] or Decimal("0")
+        acc["frais"] += int(r["frais"] or 0)
+        acc["cogs"] += r["cogs"] or Decimal("0")
+    return out
 
-    ca_articles = _ca_expr()
-    ca_frais = _frais_expr()
 
-    agg_all = qs.aggregate(
-        nb=Count("id"),
-        nb_livrees=Count("id", filter=Q(statut=Commande.Statut.LIVREE)),
-        nb_annulees=Count("id", filter=Q(statut=Commande.Statut.ANNULEE)),
-        ca_articles=ca_articles,
-        ca_frais=ca_frais,
-    )
+def _ca(acc: dict) -> int:
+    return int(float(acc["ca_articles"] or 0)) + int(acc["frais"] or 0)
 
-    ca_total_commandes = int(float(agg_all["ca_articles"] or 0)) + int(agg_all["ca_frais"] or 0)
-    nb = int(agg_all["nb"] or 0)
-    panier_moyen = int(ca_total_commandes / nb) if nb else 0
 
-    qs_paid = qs.filter(encaissement__statut=Encaissement.StatutPaiement.PAYEE)
-    agg_paid = qs_paid.aggregate(
-        nb=Count("id"),
-        ca_articles=ca_articles,
-        ca_frais=ca_frais,
-    )
+_EMPTY = {"nb": 0, "ca_articles": Decimal("0"), "frais": 0, "cogs": Decimal("0")}
+
 
-    ca_total_encaisse = int(float(agg_paid["ca_articles"] or 0)) + int(agg_paid["ca_frais"] or 0)
-    nb_paid = int(agg_paid["nb"] or 0)
+# -----------------------------
+# Widgets (payload = réponse de l'endpoint individuel)
+# -----------------------------
+def _widget_overview(scope: _DashboardScope) -> dict:
+    facts = scope.facts()
+    annulee = Commande.Statut.ANNULEE
+
+    tot = _rollup(facts).get(None, _EMPTY)
+    # mode_paiement renseigné = commande encaissée (PAYEE)
+    paid = _rollup(r for r in facts if r["mode_paiement"]).get(None, _EMPTY)
+    by_statut = _rollup(facts, key=lambda r: r["statut"])
+    cogs = sum((acc["cogs"] for st, acc in by_statut.items() if st != annulee), Decimal("0"))
+
+    ca_total_commandes = _ca(tot)
+    nb = int(tot["nb"])
+    panier_moyen = int(ca_total_commandes / nb) if nb else 0
+
+    ca_total_encaisse = _ca(paid)
+    nb_paid = int(paid["nb"])
     panier_moyen_encaisse = int(ca_total_encaisse / nb_paid) if nb_paid else 0
 
-    charges_total = _charges_total_in_range(dfrom, dto)
-    achats_total = _achats_total_in_range(dfrom, dto)
+    charges_total = _charges_total_in_range(scope.dfrom, scope.dto)
+    achats_total = scope.achats_total()
     depenses_total = (charges_total or 0) + (achats_total or 0)
 
-    cogs = _cogs_total_for_commandes(qs)
     benefice_estime = float(ca_total_commandes) - float(cogs or 0) - float(charges_total or 0)
 
-    return Response({
-        "range": {"date_from": dfrom.isoformat(), "date_to": dto.isoformat()},
+    return {
+        "range": scope.range,
 
         "nb_commandes": nb,
-        "nb_livrees": int(agg_all["nb_livrees"] or 0),
-        "nb_annulees": int(agg_all["nb_annulees"] or 0),
+        "nb_livrees": int(by_statut.get(Commande.Statut.LIVREE, _EMPTY)["nb"]),
+        "nb_annulees": int(by_statut.get(annulee, _EMPTY)["nb"]),
 
         "ca_total_commandes": ca_total_commandes,
         "ca_total_encaisse": ca_total_encaisse,
@@ -239,79 +293,29 @@ def dashboard_overview(request):
         "depenses_total": int(float(depenses_total or 0)),
         "cogs_estime": int(float(cogs or 0)),
         "benefice_estime": int(float(benefice_estime or 0)),
-    })
-
+    }
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def dashboard_ca_by_day(request):
-    qs, dfrom, dto = _base_qs(request)
-    ca_articles = _ca_expr()
-
-    rows = (
-        qs.annotate(day=TruncDay("created_at"))
-        .values("day")
-        .annotate(
-            ca_articles=ca_articles,
-            frais=Coalesce(Sum(Cast(F("frais_livraison__frais_final"), IntegerField())), Value(0)),
-            nb=Count("id"),
-        )
-        .order_by("day")
-    )
 
-    points = []
-    for r in rows:
-        ca = int(float(r["ca_articles"] or 0)) + int(r["frais"] or 0)
-        points.append({"x": r["day"].date().isoformat(), "y": ca})
-
-    return Response({
-        "range": {"date_from": dfrom.isoformat(), "date_to": dto.isoformat()},
+def _widget_ca_by_day(scope: _DashboardScope) -> dict:
+    by_day = _rollup(scope.facts(), key=lambda r: r["day"])
+    points = [{"x": d.isoformat(), "y": _ca(acc)} for d, acc in sorted(by_day.items())]
+    return {
+        "range": scope.range,
         "label": "CA (commandes)",
         "points": points,
-    })
+    }
 
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def dashboard_commandes_by_statut(request):
-    qs, dfrom, dto = _base_qs(request)
-    rows = qs.values("statut").annotate(nb=Count("id")).order_by("statut")
+def _widget_commandes_by_statut(scope: _DashboardScope) -> dict:
+    by_statut = _rollup(scope.facts(), key=lambda r: r["statut"])
+    return {
+        "range": scope.range,
+        "items": [{"statut": st, "nb": int(acc["nb"])} for st, acc in sorted(by_statut.items())],
+    }
 
-    return Response({
-        "range": {"date_from": dfrom.isoformat(), "date_to": dto.isoformat()},
-        "items": [{"statut": r["statut"], "nb": int(r["nb"] or 0)} for r in rows],
-    })
-
-
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def dashboard_top_articles(request):
-    qs, dfrom, dto = _base_qs(request)
-    qs = qs.exclude(statut=Commande.Statut.ANNULEE)
-
-    rows = (
-        LigneCommande.objects
-        .select_related("article", "commande")
-        .filter(commande__in=qs)
-        .values("article_id", "article__reference", "article__nom_produit")
-        .annotate(
-            qte_total=Coalesce(Sum("quantite"), Value(0)),
-            ca=Coalesce(
-                Sum(
-                    ExpressionWrapper(
-                        F("quantite") * F("prix_vente_unitaire"),
-                        output_field=DecimalField(max_digits=18, decimal_places=2),
-                    )
-                ),
-                Value(0, output_field=DecimalField(max_digits=18, decimal_places=2)),
-            ),
-        )
-        .order_by("-ca")
-    )
-
-    limit = (request.query_params.get("limit") or "").strip()
-    rows = rows[: int(limit)] if limit.isdigit() else rows[:10]
 
+def _widget_top_articles(scope: _DashboardScope) -> dict:
+    rows = _ranked(scope.sortants_qs(), SORTANTS_ORDERS, "total_vente", None, scope.limit(10))
     items = []
     for r in rows:
         items.append({
@@ -319,138 +323,164 @@ def dashboard_top_articles(request):
             "reference": r["article__reference"] or "",
             "nom_produit": r["article__nom_produit"] or "",
             "quantite": int(r["qte_total"] or 0),
-            "ca": int(float(r["ca"] or 0)),
+            "ca": int(float(r["total_vente"] or 0)),
         })
+    return {"range": scope.range, "items": items}
 
-    return Response({
-        "range": {"date_from": dfrom.isoformat(), "date_to": dto.isoformat()},
-        "items": items,
-    })
 
+def _widget_payment_mix(scope: _DashboardScope) -> dict:
+    by_mode = _rollup((r for r in scope.facts() if r["mode_paiement"]), key=lambda r: r["mode_paiement"])
+    items = [{"mode": mode or "", "nb": int(acc["nb"]), "ca": _ca(acc)} for mode, acc in sorted(by_mode.items())]
+    return {"range": scope.range, "items": items}
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def dashboard_payment_mix(request):
-    qs, dfrom, dto = _base_qs(request)
-    paid = qs.filter(encaissement__statut=Encaissement.StatutPaiement.PAYEE)
-
-    rows = (
-        paid.values("encaissement__mode")
-        .annotate(
-            nb=Count("id"),
-            ca_articles=_ca_expr(),
-            frais=Coalesce(Sum(Cast(F("frais_livraison__frais_final"), IntegerField())), Value(0)),
-        )
-        .order_by("encaissement__mode")
-    )
 
-    items = []
-    for r in rows:
-        ca = int(float(r["ca_articles"] or 0)) + int(r["frais"] or 0)
-        items.append({"mode": r["encaissement__mode"] or "", "nb": int(r["nb"] or 0), "ca": ca})
+def _widget_sales_by_page(scope: _DashboardScope) -> dict:
+    facts = scope.facts()
+    noms = {r["page_id"]: r["page__nom"] for r in facts}
+    by_page = _rollup(facts, key=lambda r: r["page_id"])
 
-    return Response({
-        "range": {"date_from": dfrom.isoformat(), "date_to": dto.isoformat()},
-        "items": items,
-    })
+    items = [
+        {"page_id": page_id, "page_nom": noms.get(page_id), "nb": int(acc["nb"]), "ca": _ca(acc)}
+        for page_id, acc in by_page.items()
+    ]
+    items.sort(key=lambda it: -it["nb"])
+    return {"range": scope.range, "items": items}
 
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def dashboard_sales_by_page(request):
-    qs, dfrom, dto = _base_qs(request)
-
-    rows = (
-        qs.values("page_id", "page__nom")
-        .annotate(
-            nb=Count("id"),
-            ca_articles=_ca_expr(),
-            frais=Coalesce(Sum(Cast(F("frais_livraison__frais_final"), IntegerField())), Value(0)),
-        )
-        .order_by("-nb")
-    )
+def _widget_articles_sortants(scope: _DashboardScope) -> dict:
+    """
+    ?order=total_vente|quantite|marge (décroissant) ; ?limit ; ?after=<valeur,article_id>
+    bundle: ?sortants_order / ?sortants_after
+    """
+    order = scope.order(SORTANTS_ORDERS, "total_vente", "sortants")
+    limit = scope.limit()
+    rows = _ranked(scope.sortants_qs(), SORTANTS_ORDERS, order, scope.after("sortants"), limit)
 
     items = []
     for r in rows:
-        ca = int(float(r["ca_articles"] or 0)) + int(r["frais"] or 0)
+        qte = int(r["qte_total"] or 0)
+        total_vente = float(r["total_vente"] or 0)
+        cout_total = float(r["total_cout"] or 0)
+
         items.append({
-            "page_id": r["page_id"],
-            "page_nom": r["page__nom"],
-            "nb": int(r["nb"] or 0),
-            "ca": ca,
+            "article_id": int(r["article_id"]),
+            "reference": r["article__reference"] or "",
+            "nom_produit": r["article__nom_produit"] or "",
+            "quantite": qte,  # ✅ output attendu par le frontend/serializer
+            "prix_moyen_vente": int(total_vente / qte) if qte else 0,
+            "total_vente": int(total_vente),
+            "cout_unit_estime": int(cout_total / qte) if qte else 0,
+            "cout_total_estime": int(cout_total),
+            "marge_estime": int(float(r["marge"] or 0)),
         })
 
-    return Response({
-        "range": {"date_from": dfrom.isoformat(), "date_to": dto.isoformat()},
+    return {
+        "range": scope.range,
+        "order": order,
         "items": items,
-    })
+        "next_after": _next_after(rows, SORTANTS_ORDERS[order], limit),
+    }
 
 
-# -----------------------------
-# ✅ Articles sortants (ventes) - FIX: qte_total au lieu de quantite
-# -----------------------------
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def dashboard_articles_sortants(request):
-    qs, dfrom, dto = _base_qs(request)
-    qs = qs.exclude(statut=Commande.Statut.ANNULEE)
-
-    latest_cost = _latest_purchase_price_subquery()
-
-    rows = (
-        LigneCommande.objects
-        .select_related("article", "commande")
-        .filter(commande__in=qs)
-        .values("article_id", "article__reference", "article__nom_produit")
-        .annotate(
-            qte_total=Coalesce(Sum("quantite"), Value(0)),
-            total_vente=Coalesce(
-                Sum(
-                    ExpressionWrapper(
-                        F("quantite") * F("prix_vente_unitaire"),
-                        output_field=DecimalField(max_digits=18, decimal_places=2),
-                    )
-                ),
-                Value(0, output_field=DecimalField(max_digits=18, decimal_places=2)),
-            ),
-            cout_unit=Coalesce(
-                latest_cost,
-                Value(0, output_field=DecimalField(max_digits=12, decimal_places=2))
-            ),
-        )
-        .order_by("-total_vente")
-    )
+def _widget_articles_entrants(scope: _DashboardScope) -> dict:
+    """
+    ?order=total_achat|quantite (décroissant) ; ?limit ; ?after=<valeur,article_id>
+    bundle: ?entrants_order / ?entrants_after
+    """
+    order = scope.order(ENTRANTS_ORDERS, "total_achat", "entrants")
+    limit = scope.limit()
+    rows = _ranked(scope.entrants_qs(), ENTRANTS_ORDERS, order, scope.after("entrants"), limit)
 
     items = []
     for r in rows:
         qte = int(r["qte_total"] or 0)
-        total_vente = float(r["total_vente"] or 0)
-        cout_unit = float(r["cout_unit"] or 0)
-
-        prix_moyen_vente = int(total_vente / qte) if qte else 0
-        cout_total = qte * cout_unit
-        marge = total_vente - cout_total
+        total_achat = float(r["total_achat"] or 0)
+        total_vente_ref = float(r["total_vente_ref"] or 0)
 
         items.append({
             "article_id": int(r["article_id"]),
             "reference": r["article__reference"] or "",
             "nom_produit": r["article__nom_produit"] or "",
-            "quantite": qte,  # ✅ output attendu par le frontend/serializer
-            "prix_moyen_vente": int(prix_moyen_vente),
-            "total_vente": int(total_vente),
-            "cout_unit_estime": int(cout_unit),
-            "cout_total_estime": int(cout_total),
-            "marge_estime": int(marge),
+            "quantite": qte,  # ✅ output attendu
+            "prix_moyen_achat": int(total_achat / qte) if qte else 0,
+            "prix_moyen_vente": int(total_vente_ref / qte) if qte else 0,
+            "total_achat": int(total_achat),
         })
 
-    limit = (request.query_params.get("limit") or "").strip()
-    if limit.isdigit():
-        items = items[: int(limit)]
-
-    return Response({
-        "range": {"date_from": dfrom.isoformat(), "date_to": dto.isoformat()},
+    return {
+        "range": scope.range,
+        "order": order,
         "items": items,
-    })
+        "next_after": _next_after(rows, ENTRANTS_ORDERS[order], limit),
+    }
+
+
+# ordre = ordre d'affichage par défaut du bundle
+WIDGETS = {
+    "overview": _widget_overview,
+    "ca_by_day": _widget_ca_by_day,
+    "commandes_by_statut": _widget_commandes_by_statut,
+    "top_articles": _widget_top_articles,
+    "payment_mix": _widget_payment_mix,
+    "sales_by_page": _widget_sales_by_page,
+    "articles_sortants": _widget_articles_sortants,
+    "articles_entrants": _widget_articles_entrants,
+}
+
+
+# -----------------------------
+# Views Dashboard
+# -----------------------------
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@dashboard_cached("overview")
+def dashboard_overview(request):
+    return Response(_widget_overview(_DashboardScope(request)))
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@dashboard_cached("ca-by-day")
+def dashboard_ca_by_day(request):
+    return Response(_widget_ca_by_day(_DashboardScope(request)))
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@dashboard_cached("commandes-by-statut")
+def dashboard_commandes_by_statut(request):
+    return Response(_widget_commandes_by_statut(_DashboardScope(request)))
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@dashboard_cached("top-articles")
+def dashboard_top_articles(request):
+    return Response(_widget_top_articles(_DashboardScope(request)))
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@dashboard_cached("payment-mix")
+def dashboard_payment_mix(request):
+    return Response(_widget_payment_mix(_DashboardScope(request)))
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@dashboard_cached("sales-by-page")
+def dashboard_sales_by_page(request):
+    return Response(_widget_sales_by_page(_DashboardScope(request)))
+
+
+# -----------------------------
+# ✅ Articles sortants (ventes) - FIX: qte_total au lieu de quantite
+# -----------------------------
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@dashboard_cached("articles-sortants")
+def dashboard_articles_sortants(request):
+    return Response(_widget_articles_sortants(_DashboardScope(request)))
 
 
 # -----------------------------
@@ -458,67 +488,46 @@ def dashboard_articles_sortants(request):
 # -----------------------------
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@dashboard_cached("articles-entrants")
 def dashboard_articles_entrants(request):
-    dfrom, dto = _parse_dates(request)
+    return Response(_widget_articles_entrants(_DashboardScope(request)))
 
-    achats_qs = Achat.objects.filter(
-        Q(date_achat__gte=dfrom, date_achat__lte=dto) |
-        Q(date_achat__isnull=True, created_at__date__gte=dfrom, created_at__date__lte=dto)
-    )
 
-    rows = (
-        AchatLigne.objects
-        .select_related("article", "achat")
-        .filter(achat__in=achats_qs)
-        .values("article_id", "article__reference", "article__nom_produit")
-        .annotate(
-            qte_total=Coalesce(Sum("quantite"), Value(0)),
-            total_achat=Coalesce(
-                Sum(
-                    ExpressionWrapper(
-                        F("quantite") * F("prix_achat_unitaire"),
-                        output_field=DecimalField(max_digits=18, decimal_places=2),
-                    )
-                ),
-                Value(0, output_field=DecimalField(max_digits=18, decimal_places=2)),
-            ),
-            total_vente_ref=Coalesce(
-                Sum(
-                    ExpressionWrapper(
-                        F("quantite") * F("prix_vente_unitaire"),
-                        output_field=DecimalField(max_digits=18, decimal_places=2),
-                    )
-                ),
-                Value(0, output_field=DecimalField(max_digits=18, decimal_places=2)),
-            ),
+# -----------------------------
+# ✅ Bundle: tous les widgets en 1 requête / 1 passage sur les données
+# -----------------------------
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@dashboard_cached("bundle")
+def dashboard_bundle(request):
+    """
+    GET /api/dashboard/bundle/?date_from&date_to&page&limit&widgets=overview,ca_by_day,...
+    widgets vide => tous. Le scan des facts est partagé entre widgets.
+    Classements: ?sortants_order&sortants_after / ?entrants_order&entrants_after (?order / ?after ignorés).
+    """
+    raw = (request.query_params.get("widgets") or "").strip()
+    names = [w.strip() for w in raw.split(",") if w.strip()] if raw else list(WIDGETS)
+
+    unknown = [w for w in names if w not in WIDGETS]
+    if unknown:
+        return Response(
+            {"detail": f"Widget(s) inconnu(s): {', '.join(unknown)}", "disponibles": list(WIDGETS)},
+            status=status.HTTP_400_BAD_REQUEST,
         )
-        .order_by("-total_achat")
-    )
 
-    items = []
-    for r in rows:
-        qte = int(r["qte_total"] or 0)
-        total_achat = float(r["total_achat"] or 0)
-        total_vente_ref = float(r["total_vente_ref"] or 0)
-
-        prix_moyen_achat = int(total_achat / qte) if qte else 0
-        prix_moyen_vente = int(total_vente_ref / qte) if qte else 0
-
-        items.append({
-            "article_id": int(r["article_id"]),
-            "reference": r["article__reference"] or "",
-            "nom_produit": r["article__nom_produit"] or "",
-            "quantite": qte,  # ✅ output attendu
-            "prix_moyen_achat": int(prix_moyen_achat),
-            "prix_moyen_vente": int(prix_moyen_vente),
-            "total_achat": int(total_achat),
-        })
+    scope = _DashboardScope(request, bundle=True)
+    widgets: dict = {}
+    timings: dict = {}
 
-    limit = (request.query_params.get("limit") or "").strip()
-    if limit.isdigit():
-        items = items[: int(limit)]
+    t_all = time.perf_counter()
+    for name in dict.fromkeys(names):
+        t0 = time.perf_counter()
+        widgets[name] = WIDGETS[name](scope)
+        timings[name] = round((time.perf_counter() - t0) * 1000, 2)
+    timings["total"] = round((time.perf_counter() - t_all) * 1000, 2)
 
     return Response({
-        "range": {"date_from": dfrom.isoformat(), "date_to": dto.isoformat()},
-        "items": items,
+        "range": scope.range,
+        "widgets": widgets,
+        "timings_ms": timings,
     })
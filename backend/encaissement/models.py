@@ -56,6 +56,9 @@ class Encaissement(models.Model):
 
     class Meta:
         ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["statut"], name="encaissement_statut_idx"),
+        ]
 
     def mark_paid(self, *, user=None, mode: str, reference: str = ""):
         self.statut = self.StatutPaiement.PAYEE
@@ -19,8 +19,8 @@ class CommandeEncaissementListSerializer(serializers.ModelSerializer):
     lieu_detail = LieuLivraisonLiteSerializer(source="lieu_livraison", read_only=True)
     lignes_detail = LigneCommandeReadSerializer(source="lignes", many=True, read_only=True)
 
-    total_articles = serializers.IntegerField(read_only=True)
-    total_commande = serializers.IntegerField(read_only=True)
+    total_articles = serializers.IntegerField(source="total_articles_cache", read_only=True)
+    total_commande = serializers.IntegerField(source="total_commande_cache", read_only=True)
     frais_final = serializers.SerializerMethodField()
 
     paiement_statut = serializers.SerializerMethodField()
@@ -5,9 +5,11 @@ from django.db.models import Prefetch, Q
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 
+from api.idempotency import idempotent
 from vente.models import Commande, LigneCommande
+from vente.pagination import CommandeCursorPagination
+from vente.search import search_q
 from .models import Encaissement
 from .serializers import (
     CommandeEncaissementListSerializer,
@@ -16,12 +18,6 @@ from .serializers import (
 )
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 20
-    page_size_query_param = "page_size"
-    max_page_size = 200
-
-
 class EncaissementCommandeViewSet(viewsets.ReadOnlyModelViewSet):
     """
     Liste + détails des commandes avec infos d'encaissement,
@@ -29,12 +25,12 @@ class EncaissementCommandeViewSet(viewsets.ReadOnlyModelViewSet):
     """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = CommandeEncaissementListSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = CommandeCursorPagination
 
     def get_queryset(self):
         qs = (
             Commande.objects
-            .select_related("client", "lieu_livraison", "frais_livraison")
+            .select_related("client__last_lieu", "lieu_livraison", "frais_livraison")
             .prefetch_related(
                 Prefetch("lignes", queryset=LigneCommande.objects.select_related("article")),
             )
@@ -57,15 +53,13 @@ class EncaissementCommandeViewSet(viewsets.ReadOnlyModelViewSet):
                 qs = qs.filter(encaissement__statut=paiement_statut)
 
         if q:
-            qs = qs.filter(
-                Q(client_nom__icontains=q) |
-                Q(client_contact__icontains=q) |
-                Q(id__icontains=q)
-            )
+            # ✅ recherche indexée (client) + n° de commande exact
+            qs = qs.filter(search_q(q, columns=["client"]))
 
         return qs
 
     @action(detail=True, methods=["post"], url_path="encaisser")
+    @idempotent("encaissement.encaisser")
     def encaisser(self, request, pk=None):
         commande = self.get_object()
         ser = EncaisserCommandeSerializer(data=request.data, context={"request": request})
@@ -1,7 +1,6 @@
 # facturation/services/pdf.py
 from __future__ import annotations
 
-from io import BytesIO
 from django.utils import timezone
 
 from reportlab.lib.pagesizes import A4
@@ -10,6 +9,7 @@ from reportlab.lib import utils
 from reportlab.pdfgen import canvas
 
 from facturation.models import Facture, FacturationSettings
+from facturation.services.pdf_base import ar, draw_printed_footer, render_pdf_bytes
 
 
 def _draw_image(c: canvas.Canvas, img_path: str, x: float, y: float, w: float, h: float):
@@ -127,8 +127,8 @@ def draw_facture_on_canvas(c: canvas.Canvas, facture: Facture):
         c.drawString(col_ref, y, str(ref)[:18])
         c.drawString(col_prod, y, str(prod)[:45])
         c.drawRightString(col_qte, y, str(qte))
-        c.drawRightString(col_pu, y, f"{pu:,}".replace(",", " "))
-        c.drawRightString(col_tot, y, f"{st:,}".replace(",", " "))
+        c.drawRightString(col_pu, y, ar(pu))
+        c.drawRightString(col_tot, y, ar(st))
         y -= 7 * mm
 
     y -= 3 * mm
@@ -139,12 +139,12 @@ def draw_facture_on_canvas(c: canvas.Canvas, facture: Facture):
     total_commande = int(total_articles) + int(frais_final)
 
     c.setFont("Helvetica-Bold", 11)
-    c.drawRightString(width - margin, y, f"Sous-total: {total_articles:,}".replace(",", " "))
+    c.drawRightString(width - margin, y, f"Sous-total: {ar(total_articles)}")
     y -= 6 * mm
-    c.drawRightString(width - margin, y, f"Frais livraison: {frais_final:,}".replace(",", " "))
+    c.drawRightString(width - margin, y, f"Frais livraison: {ar(frais_final)}")
     y -= 7 * mm
     c.setFont("Helvetica-Bold", 13)
-    c.drawRightString(width - margin, y, f"TOTAL: {total_commande:,}".replace(",", " "))
+    c.drawRightString(width - margin, y, f"TOTAL: {ar(total_commande)}")
 
     # -------- FOOTER --------
     footer_y = 22 * mm
@@ -172,34 +172,22 @@ def draw_facture_on_canvas(c: canvas.Canvas, facture: Facture):
     if settings_fact.signature_titre:
         c.drawString(sig_x, sig_y - 4 * mm, settings_fact.signature_titre)
 
-    c.setFont("Helvetica", 8)
-    c.drawCentredString(width / 2, 10 * mm, f"Imprimé le {timezone.now().strftime('%d/%m/%Y %H:%M')}")
+    draw_printed_footer(c)
 
     # ✅ fin de facture => page suivante (séparation entre factures)
     c.showPage()
 
 
 def render_facture_pdf_bytes(facture: Facture) -> bytes:
-    buf = BytesIO()
-    c = canvas.Canvas(buf, pagesize=A4)
-    draw_facture_on_canvas(c, facture)
-    c.save()
-    pdf = buf.getvalue()
-    buf.close()
-    return pdf
+    return render_pdf_bytes(lambda c: draw_facture_on_canvas(c, facture))
 
 
 def render_factures_merged_pdf_bytes(factures: list[Facture]) -> bytes:
     """
     Plusieurs factures -> un seul PDF multi-pages.
     """
-    buf = BytesIO()
-    c = canvas.Canvas(buf, pagesize=A4)
+    def draw(c: canvas.Canvas):
+        for f in factures:
+            draw_facture_on_canvas(c, f)
 
-    for f in factures:
-        draw_facture_on_canvas(c, f)
-
-    c.save()
-    pdf = buf.getvalue()
-    buf.close()
-    return pdf
+    return render_pdf_bytes(draw)
@@ -0,0 +1,42 @@
+# facturation/services/pdf_base.py
+from __future__ import annotations
+
+from io import BytesIO
+from typing import Callable
+
+from django.utils import timezone
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+
+# =========================
+# Socle commun des PDF (factures, feuille de route)
+# =========================
+# - page A4, canvas reportlab écrit en mémoire
+# - montants en Ariary: séparateur de milliers = espace
+# - pied de page "Imprimé le ..." (heure locale)
+
+def ar(n) -> str:
+    """12500 -> '12 500'"""
+    return f"{int(n or 0):,}".replace(",", " ")
+
+
+def draw_printed_footer(c: canvas.Canvas, y: float = 10 * mm):
+    width, _ = A4
+    c.setFont("Helvetica", 8)
+    c.drawCentredString(width / 2, y, f"Imprimé le {timezone.localtime().strftime('%d/%m/%Y %H:%M')}")
+
+
+def render_pdf_bytes(draw: Callable[[canvas.Canvas], None]) -> bytes:
+    """
+    Ouvre un canvas A4, laisse `draw` dessiner (il termine ses pages par showPage()), renvoie le PDF.
+    """
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    draw(c)
+    c.save()
+    pdf = buf.getvalue()
+    buf.close()
+    return pdf
@@ -12,6 +12,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from vente.models import Commande, LigneCommande
+from vente.pagination import CommandeCursorPagination
+from vente.search import search_q
 from encaissement.models import Encaissement
 from facturation.models import Facture
 from facturation.serializers import CommandeFacturationSerializer
@@ -32,11 +34,12 @@ class CommandeFacturationViewSet(viewsets.ReadOnlyModelViewSet):
     """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = CommandeFacturationSerializer
+    pagination_class = CommandeCursorPagination
 
     def get_queryset(self):
         qs = (
             Commande.objects
-            .select_related("client", "page", "lieu_livraison", "frais_livraison")
+            .select_related("client__last_lieu", "page", "lieu_livraison", "frais_livraison")
             .select_related("encaissement")
             .select_related("facture")
             .prefetch_related(
@@ -63,11 +66,8 @@ class CommandeFacturationViewSet(viewsets.ReadOnlyModelViewSet):
                 qs = qs.filter(encaissement__statut=paiement_statut)
 
         if q:
-            qs = qs.filter(
-                Q(client_nom__icontains=q) |
-                Q(client_contact__icontains=q) |
-                Q(id__icontains=q)
-            )
+            # ✅ recherche indexée (client) + n° de commande exact
+            qs = qs.filter(search_q(q, columns=["client"]))
 
         return qs
 
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class VenteConfig(AppConfig):
     name = 'vente'
+
+    def ready(self):
+        from . import signals  # noqa
@@ -0,0 +1,301 @@
+# vente/autocomplete.py
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Count, Max
+
+from article.models import Article
+from client.models import Client
+from livraison.models import LieuLivraison, default_frais_par_categorie
+from vente.models import Commande, LigneCommande
+from vente.search import normalize
+
+
+# =========================
+# Autocomplétion en mémoire (suggest/articles, suggest/clients, suggest/lieux)
+# =========================
+# - 1 index par source et par process: tokens normalisés triés => préfixe = bisect (O(log n + k))
+# - chaque mot de la requête doit préfixer un mot de l'entrée ("rak 034" => "Rakoto", "034 12 ...")
+# - rang: log(1 + popularité) + 2 × fraîcheur, fraîcheur = dernier usage (id commande / ligne) / plus récent
+# - payload complet en mémoire (stock / réservé des articles, dernier lieu des clients):
+#   une suggestion ne fait aucune requête
+# - construit au démarrage du serveur (warm_up, config/wsgi.py / asgi.py), sinon au 1er appel
+# - tenu à jour après commit: post_save / post_delete, article.stock.stock_changed (compteurs),
+#   vente/clients.py (dernier lieu) — voir vente/signals.py
+# - reconstruit après SUGGEST_INDEX_TTL secondes (écritures d'autres process, bulk_create, update()...)
+
+TTL = getattr(settings, "SUGGEST_INDEX_TTL", 300)
+LIMIT = 15
+
+logger = logging.getLogger(__name__)
+
+
+class SuggestIndex:
+    def __init__(self, load: Callable[[], Iterable[tuple[int, dict, tuple]]], usage: Callable[[], dict]):
+        """
+        load()  -> (id, payload, textes) pour chaque entrée
+        usage() -> {id: (nb usages, dernier id d'usage)}
+        """
+        self._load = load
+        self._usage = usage
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()  # 1 seule reconstruction à la fois
+        self._built_at: float | None = None
+        self._entries: dict[int, tuple[dict, tuple[str, ...]]] = {}
+        self._tokens: list[tuple[str, int]] = []
+        self._stats: dict[int, list[int]] = {}  # id -> [popularité, dernier usage]
+        self._last_use = 1
+        self._top: list[int] | None = None
+
+    # ---- construction ----
+    def _stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > TTL
+
+    def _ensure(self):
+        if self._stale():
+            with self._build_lock:
+                if self._stale():
+                    self.rebuild()
+
+    def rebuild(self):
+        entries = {}
+        tokens = []
+        for pk, payload, texts in self._load():
+            toks = tuple(sorted(set(normalize(" ".join(t or "" for t in texts)).split())))
+            entries[pk] = (payload, toks)
+            tokens.extend((t, pk) for t in toks)
+        tokens.sort()
+        stats = {pk: [int(n), int(last or 0)] for pk, (n, last) in self._usage().items()}
+
+        with self._lock:
+            self._entries, self._tokens, self._stats = entries, tokens, stats
+            self._last_use = max([s[1] for s in stats.values()] + [1])
+            self._top = None
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    # ---- mises à jour (signaux) ----
+    def upsert(self, pk: int, payload: dict, texts: Iterable[str]):
+        with self._lock:
+            if self._built_at is None:
+                return  # pas encore construit: le 1er appel chargera tout
+            self._remove_tokens(pk)
+            toks = tuple(sorted(set(normalize(" ".join(t or "" for t in texts)).split())))
+            self._entries[pk] = (payload, toks)
+            for t in toks:
+                insort(self._tokens, (t, pk))
+            self._top = None
+
+    def remove(self, pk: int):
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._remove_tokens(pk)
+            self._entries.pop(pk, None)
+            self._top = None
+
+    def patch(self, pk: int, **fields):
+        """Remplace des champs du payload (textes indexés inchangés)."""
+        with self._lock:
+            entry = self._entries.get(pk)
+            if entry:
+                self._entries[pk] = ({**entry[0], **fields}, entry[1])
+
+    def adjust(self, pk: int, **deltas: int):
+        """Ajoute des deltas à des champs numériques du payload (compteurs)."""
+        with self._lock:
+            entry = self._entries.get(pk)
+            if entry:
+                payload = entry[0]
+                self._entries[pk] = ({**payload, **{k: payload[k] + d for k, d in deltas.items()}}, entry[1])
+
+    def patch_where(self, match: Callable[[dict], bool], fields: Callable[[dict], dict]):
+        """patch() de toutes les entrées dont le payload vérifie `match` (parcours complet: écritures rares)."""
+        with self._lock:
+            for pk, (payload, toks) in list(self._entries.items()):
+                if match(payload):
+                    self._entries[pk] = ({**payload, **fields(payload)}, toks)
+
+    def bump(self, pk: int, use_id: int):
+        """Nouvel usage (commande / ligne `use_id`): popularité +1, fraîcheur au maximum."""
+        with self._lock:
+            if self._built_at is None:
+                return
+            stat = self._stats.setdefault(pk, [0, 0])
+            stat[0] += 1
+            stat[1] = max(stat[1], int(use_id))
+            self._last_use = max(self._last_use, int(use_id))
+            self._top = None
+
+    def _remove_tokens(self, pk: int):
+        old = self._entries.get(pk)
+        for t in old[1] if old else ():
+            i = bisect_left(self._tokens, (t, pk))
+            if i < len(self._tokens) and self._tokens[i] == (t, pk):
+                del self._tokens[i]
+
+    # ---- lecture ----
+    def _score(self, pk: int) -> tuple[float, int]:
+        n, last = self._stats.get(pk, (0, 0))
+        return math.log1p(n) + 2 * last / self._last_use, pk
+
+    def _prefix_ids(self, prefix: str) -> set[int]:
+        i = bisect_left(self._tokens, (prefix,))
+        out = set()
+        while i < len(self._tokens) and self._tokens[i][0].startswith(prefix):
+            out.add(self._tokens[i][1])
+            i += 1
+        return out
+
+    def search(self, query: str, limit: int = LIMIT) -> list[dict]:
+        self._ensure()
+        words = normalize(query).split()
+        with self._lock:
+            if not words:
+                if self._top is None:
+                    self._top = sorted(self._entries, key=self._score, reverse=True)
+                return [self._entries[pk][0] for pk in self._top[:limit]]
+
+            # candidats = mot le plus long (le plus sélectif), puis filtre sur les autres
+            words.sort(key=len, reverse=True)
+            ids = self._prefix_ids(words[0])
+            rest = words[1:]
+            if rest:
+                ids = {
+                    pk for pk in ids
+                    if all(any(t.startswith(w) for t in self._entries[pk][1]) for w in rest)
+                }
+            best = sorted(ids, key=self._score, reverse=True)[:limit]
+            return [self._entries[pk][0] for pk in best]
+
+
+# -------------------------
+# Sources
+# -------------------------
+def _decimal(v) -> str:
+    return f"{v:.2f}" if v is not None else None
+
+
+def article_payload(a: Article) -> dict:
+    return {
+        "id": a.id,
+        "nom_produit": a.nom_produit,
+        "reference": a.reference,
+        "prix_vente": _decimal(a.prix_vente),
+        "photo": a.photo.name if a.photo else "",
+        "quantite_stock": int(a.quantite_stock),
+        "quantite_reservee": int(a.quantite_reservee),
+    }
+
+
+def last_lieu_payload(lieu: LieuLivraison | None, frais, precision_lieu) -> dict | None:
+    """Même forme que ClientLiteSerializer.last_lieu."""
+    if not lieu:
+        return None
+    return {
+        "lieu_id": lieu.id,
+        "lieu_nom": lieu.nom,
+        "frais_auto": int(frais or 0),
+        "precision_lieu": precision_lieu or "",
+    }
+
+
+def client_payload(c: Client) -> dict:
+    return {
+        "id": c.id,
+        "nom": c.nom,
+        "contact": c.contact,
+        "last_lieu": last_lieu_payload(c.last_lieu, c.last_frais, c.last_precision_lieu),
+    }
+
+
+def lieu_payload(l: LieuLivraison) -> dict:
+    return {
+        "id": l.id,
+        "nom": l.nom,
+        "categorie": l.categorie,
+        "default_frais": int(default_frais_par_categorie(l.categorie)),
+    }
+
+
+def _usage(qs, field: str) -> dict:
+    return {
+        pk: (n, last)
+        for pk, n, last in qs.order_by().values(field).annotate(n=Count("id"), last=Max("id")).values_list(field, "n", "last")
+        if pk
+    }
+
+
+ARTICLES = SuggestIndex(
+    load=lambda: (
+        (a.id, article_payload(a), (a.nom_produit, a.reference))
+        for a in Article.objects.only(
+            "id", "nom_produit", "reference", "prix_vente", "photo", "quantite_stock", "quantite_reservee",
+        ).iterator(chunk_size=2000)
+    ),
+    usage=lambda: _usage(LigneCommande.objects.all(), "article_id"),
+)
+
+CLIENTS = SuggestIndex(
+    load=lambda: (
+        (c.id, client_payload(c), (c.nom, c.contact))
+        for c in Client.objects.select_related("last_lieu").only(
+            "id", "nom", "contact", "last_frais", "last_precision_lieu", "last_lieu__id", "last_lieu__nom",
+        ).iterator(chunk_size=2000)
+    ),
+    usage=lambda: _usage(Commande.objects.all(), "client_id"),
+)
+
+LIEUX = SuggestIndex(
+    load=lambda: (
+        (l.id, lieu_payload(l), (l.nom,))
+        for l in LieuLivraison.objects.filter(actif=True).only("id", "nom", "categorie").iterator(chunk_size=2000)
+    ),
+    usage=lambda: _usage(Commande.objects.all(), "lieu_livraison_id"),
+)
+
+
+def bump_lignes(lignes: Iterable[LigneCommande]):
+    """Usage des articles pour des lignes créées sans signal (bulk_create)."""
+    for l in lignes:
+        if l.id and l.article_id:
+            ARTICLES.bump(l.article_id, l.id)
+
+
+def refresh_clients(client_ids: Iterable[int]):
+    """Dernier lieu relu pour ces clients (colonnes écrites par update(), sans post_save)."""
+    ids = [int(x) for x in client_ids if x]
+    if not ids or CLIENTS._built_at is None:
+        return
+    for c in Client.objects.filter(id__in=ids).select_related("last_lieu").only(
+        "id", "last_frais", "last_precision_lieu", "last_lieu__id", "last_lieu__nom",
+    ):
+        CLIENTS.patch(c.id, last_lieu=last_lieu_payload(c.last_lieu, c.last_frais, c.last_precision_lieu))
+
+
+def warm_up():
+    """Construit les index en tâche de fond au démarrage du serveur (SUGGEST_INDEX_WARMUP=False: au 1er appel)."""
+    if not getattr(settings, "SUGGEST_INDEX_WARMUP", True):
+        return
+
+    def build():
+        try:
+            for index in (ARTICLES, CLIENTS, LIEUX):
+                index._ensure()
+        except DatabaseError:
+            logger.warning("Index d'autocomplétion non construit au démarrage (base indisponible).", exc_info=True)
+        finally:
+            connection.close()
+
+    threading.Thread(target=build, name="suggest-index-warmup", daemon=True).start()
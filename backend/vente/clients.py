@@ -0,0 +1,61 @@
+# vente/clients.py
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from client.models import Client
+from vente import autocomplete
+from vente.models import Commande
+
+
+# =========================
+# Dernier lieu de livraison du client (Client.last_lieu / last_frais / last_precision_lieu)
+# =========================
+# - création / édition d'une commande: copié depuis la commande si c'est la plus récente du client (1 UPDATE)
+# - suppression / changement de client: recalculé depuis la dernière commande restante (sous-requêtes)
+# - update() => pas de post_save: index d'autocomplétion mis à jour après commit (autocomplete.refresh_clients)
+
+
+def remember_last_lieu(commande: Commande) -> int:
+    """Recopie lieu / frais / précision de `commande` sur son client, sauf s'il a une commande plus récente."""
+    if not commande.client_id:
+        return 0
+    plus_recente = Commande.objects.filter(client_id=OuterRef("pk"), id__gt=commande.id)
+    frais = int(getattr(commande.frais_livraison, "frais_final", 0) or 0)
+    n = (
+        Client.objects.filter(id=commande.client_id)
+        .filter(~Exists(plus_recente))
+        .update(
+            last_lieu_id=commande.lieu_livraison_id,
+            last_frais=frais,
+            last_precision_lieu=commande.precision_lieu or "",
+        )
+    )
+    if n:
+        client_id = commande.client_id
+        last_lieu = autocomplete.last_lieu_payload(commande.lieu_livraison, frais, commande.precision_lieu)
+        transaction.on_commit(lambda: autocomplete.CLIENTS.patch(client_id, last_lieu=last_lieu))
+    return n
+
+
+def refresh_last_lieu(client_ids: Iterable[int] | None = None) -> int:
+    """Recalcule les colonnes depuis la dernière commande (par id) de chaque client (tous si None)."""
+    derniere = Commande.objects.filter(client_id=OuterRef("pk")).order_by("-id")
+    qs = Client.objects.all()
+    if client_ids is not None:
+        ids = {int(x) for x in client_ids if x}
+        if not ids:
+            return 0
+        qs = qs.filter(id__in=ids)
+        transaction.on_commit(lambda: autocomplete.refresh_clients(ids))
+    else:
+        transaction.on_commit(autocomplete.CLIENTS.invalidate)
+    return qs.update(
+        last_lieu_id=Subquery(derniere.values("lieu_livraison_id")[:1]),
+        last_frais=Coalesce(Subquery(derniere.values("frais_livraison__frais_final")[:1]), Value(0)),
+        last_precision_lieu=Coalesce(Subquery(derniere.values("precision_lieu")[:1]), Value("")),
+    )
@@ -0,0 +1,51 @@
+# vente/dates.py
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from typing import Iterable
+
+from django.db.models import Q
+from django.utils import timezone
+
+
+# =========================
+# Filtres de dates "sargables"
+# =========================
+# created_at__date=... fait un CAST de la colonne => index inutilisable.
+# On convertit les jours (fuseau local, ex: Indian/Antananarivo) en bornes
+# datetime aware, intervalle semi-ouvert [début jour, début jour suivant).
+
+
+def day_start(d: date) -> datetime:
+    """Minuit local du jour d (datetime aware)."""
+    return timezone.make_aware(datetime.combine(d, time.min), timezone.get_current_timezone())
+
+
+def day_range(dfrom: date, dto: date) -> tuple[datetime, datetime]:
+    """[dfrom 00:00 local, (dto + 1 jour) 00:00 local)"""
+    return day_start(dfrom), day_start(dto + timedelta(days=1))
+
+
+def day_range_q(field: str, dfrom: date, dto: date) -> Q:
+    """Q(field >= début dfrom, field < début lendemain de dto)"""
+    start, end = day_range(dfrom, dto)
+    return Q(**{f"{field}__gte": start, f"{field}__lt": end})
+
+
+def days_q(field: str, days: Iterable[date]) -> Q:
+    """
+    Équivalent sargable de field__date__in=days.
+    Les jours consécutifs sont fusionnés en une seule plage.
+    """
+    q = Q(pk__in=[])
+    run_start = prev = None
+    for d in sorted(set(days)):
+        if prev is not None and d == prev + timedelta(days=1):
+            prev = d
+            continue
+        if run_start is not None:
+            q |= day_range_q(field, run_start, prev)
+        run_start = prev = d
+    if run_start is not None:
+        q |= day_range_q(field, run_start, prev)
+    return q
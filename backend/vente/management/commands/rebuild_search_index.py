@@ -0,0 +1,28 @@
+# vente/management/commands/rebuild_search_index.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from vente.models import Commande
+from vente.search import FTS_TABLE, refresh_search
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les documents de recherche (CommandeRecherche) de toutes les commandes, "
+        "ex: après des imports en bulk_create. SQLite: reconstruit aussi l'index FTS5."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk", type=int, default=1000, help="Commandes par lot.")
+
+    def handle(self, *args, **opts):
+        ids = Commande.objects.order_by("id").values_list("id", flat=True).iterator(chunk_size=10_000)
+        n = refresh_search(ids, chunk=max(1, opts["chunk"]))
+
+        if connection.vendor == "sqlite" and FTS_TABLE in connection.introspection.table_names():
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+        self.stdout.write(self.style.SUCCESS(f"{n} document(s) de recherche recalculé(s)."))
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:20
+
+from django.db import migrations, models
+from django.db.models import Sum, F, DecimalField, ExpressionWrapper
+
+
+def backfill_totaux(apps, schema_editor):
+    Commande = apps.get_model("vente", "Commande")
+    LigneCommande = apps.get_model("vente", "LigneCommande")
+
+    totals = dict(
+        LigneCommande.objects
+        .values("commande_id")
+        .annotate(s=Sum(ExpressionWrapper(F("quantite") * F("prix_vente_unitaire"), output_field=DecimalField(max_digits=18, decimal_places=2))))
+        .values_list("commande_id", "s")
+    )
+
+    batch = []
+    for cmd in Commande.objects.select_related("frais_livraison").only("id", "frais_livraison__frais_final").iterator(chunk_size=1000):
+        articles = int(totals.get(cmd.id) or 0)
+        cmd.total_articles_cache = articles
+        cmd.total_commande_cache = articles + int(cmd.frais_livraison.frais_final or 0)
+        batch.append(cmd)
+        if len(batch) >= 1000:
+            Commande.objects.bulk_update(batch, ["total_articles_cache", "total_commande_cache"])
+            batch = []
+    if batch:
+        Commande.objects.bulk_update(batch, ["total_articles_cache", "total_commande_cache"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vente', '0004_alter_commande_statut'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commande',
+            name='total_articles_cache',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='total_commande_cache',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_totaux, migrations.RunPython.noop),
+    ]
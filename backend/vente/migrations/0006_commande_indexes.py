@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vente', '0005_commande_totaux_cache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['page', 'created_at'], name='cmd_page_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['statut', 'id'], name='cmd_statut_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['date_livraison'], name='cmd_date_livraison_idx'),
+        ),
+    ]
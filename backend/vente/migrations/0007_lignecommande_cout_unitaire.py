@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vente', '0006_commande_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lignecommande',
+            name='cout_unitaire',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=14),
+        ),
+    ]
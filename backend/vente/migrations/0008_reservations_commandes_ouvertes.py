@@ -0,0 +1,60 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:20
+
+from django.db import migrations
+from django.db.models import Sum
+from django.utils import timezone
+
+
+OUVERTS = ["EN_ATTENTE", "EN_LIVRAISON"]
+
+
+def reserver_commandes_ouvertes(apps, schema_editor):
+    """
+    Avant: les commandes ouvertes avaient déjà débité le stock.
+    Après: leurs quantités sont réservées => stock rendu (journalisé) + quantite_reservee.
+    Le disponible (stock - réservé) ne change pas.
+    """
+    Article = apps.get_model("article", "Article")
+    StockMouvement = apps.get_model("article", "StockMouvement")
+    LigneCommande = apps.get_model("vente", "LigneCommande")
+
+    now = timezone.now()
+    par_article = {}
+    batch = []
+    for commande_id, article_id, qte in (
+        LigneCommande.objects.filter(commande__statut__in=OUVERTS)
+        .order_by()
+        .values("commande_id", "article_id")
+        .annotate(q=Sum("quantite"))
+        .values_list("commande_id", "article_id", "q")
+        .iterator(chunk_size=2000)
+    ):
+        par_article[article_id] = par_article.get(article_id, 0) + int(qte)
+        batch.append(StockMouvement(
+            article_id=article_id, delta=int(qte), source_type="VENTE", source_id=commande_id, created_at=now,
+        ))
+        if len(batch) >= 1000:
+            StockMouvement.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        StockMouvement.objects.bulk_create(batch)
+
+    ids = sorted(par_article)
+    for i in range(0, len(ids), 500):
+        articles = list(Article.objects.filter(id__in=ids[i:i + 500]).only("id", "quantite_stock", "quantite_reservee"))
+        for art in articles:
+            art.quantite_stock += par_article[art.id]
+            art.quantite_reservee += par_article[art.id]
+        Article.objects.bulk_update(articles, ["quantite_stock", "quantite_reservee"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vente', '0007_lignecommande_cout_unitaire'),
+        ('article', '0006_article_quantite_reservee'),
+    ]
+
+    operations = [
+        migrations.RunPython(reserver_commandes_ouvertes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:35
+
+import django.db.models.deletion
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+FTS = "vente_commanderecherche_fts"
+
+SQLITE_FTS = [
+    f"""CREATE VIRTUAL TABLE {FTS} USING fts5(
+        client, lieu, content='vente_commanderecherche', content_rowid='commande_id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER vente_commanderecherche_ai AFTER INSERT ON vente_commanderecherche BEGIN
+        INSERT INTO {FTS}(rowid, client, lieu) VALUES (new.commande_id, new.client, new.lieu);
+    END""",
+    f"""CREATE TRIGGER vente_commanderecherche_ad AFTER DELETE ON vente_commanderecherche BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, client, lieu) VALUES ('delete', old.commande_id, old.client, old.lieu);
+    END""",
+    f"""CREATE TRIGGER vente_commanderecherche_au AFTER UPDATE ON vente_commanderecherche BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, client, lieu) VALUES ('delete', old.commande_id, old.client, old.lieu);
+        INSERT INTO {FTS}(rowid, client, lieu) VALUES (new.commande_id, new.client, new.lieu);
+    END""",
+]
+SQLITE_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS vente_commanderecherche_au",
+    "DROP TRIGGER IF EXISTS vente_commanderecherche_ad",
+    "DROP TRIGGER IF EXISTS vente_commanderecherche_ai",
+    f"DROP TABLE IF EXISTS {FTS}",
+]
+
+PG_TRGM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS vente_cmdrech_client_trgm ON vente_commanderecherche USING gin (client gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS vente_cmdrech_lieu_trgm ON vente_commanderecherche USING gin (lieu gin_trgm_ops)",
+]
+PG_TRGM_DROP = [
+    "DROP INDEX IF EXISTS vente_cmdrech_lieu_trgm",
+    "DROP INDEX IF EXISTS vente_cmdrech_client_trgm",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = SQLITE_FTS if vendor == "sqlite" else PG_TRGM if vendor == "postgresql" else []
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = SQLITE_FTS_DROP if vendor == "sqlite" else PG_TRGM_DROP if vendor == "postgresql" else []
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.sub(r"[^0-9a-z]+", " ", text).strip()
+
+
+def _join(*parts):
+    seen = []
+    for p in map(_normalize, parts):
+        if p and p not in seen:
+            seen.append(p)
+    return " ".join(seen)
+
+
+def backfill(apps, schema_editor):
+    """Documents des commandes existantes (même normalisation que vente/search.py)."""
+    Commande = apps.get_model("vente", "Commande")
+    CommandeRecherche = apps.get_model("vente", "CommandeRecherche")
+
+    batch = []
+    for row in (
+        Commande.objects.order_by()
+        .values_list(
+            "id", "client_nom", "client_contact", "client_adresse", "client__nom", "client__contact",
+            "lieu_livraison__nom", "precision_lieu",
+        )
+        .iterator(chunk_size=2000)
+    ):
+        batch.append(CommandeRecherche(commande_id=row[0], client=_join(*row[1:6]), lieu=_join(*row[6:8])))
+        if len(batch) >= 1000:
+            CommandeRecherche.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        CommandeRecherche.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vente', '0008_reservations_commandes_ouvertes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommandeRecherche',
+            fields=[
+                ('commande', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recherche', serialize=False, to='vente.commande')),
+                ('client', models.TextField(blank=True, default='')),
+                ('lieu', models.TextField(blank=True, default='')),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:11
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill(apps, schema_editor):
+    """Client.last_* depuis la dernière commande de chaque client (même calcul que vente/clients.py)."""
+    Client = apps.get_model("client", "Client")
+    Commande = apps.get_model("vente", "Commande")
+
+    derniere = Commande.objects.filter(client_id=OuterRef("pk")).order_by("-id")
+    Client.objects.update(
+        last_lieu_id=Subquery(derniere.values("lieu_livraison_id")[:1]),
+        last_frais=Coalesce(Subquery(derniere.values("frais_livraison__frais_final")[:1]), Value(0)),
+        last_precision_lieu=Coalesce(Subquery(derniere.values("precision_lieu")[:1]), Value("")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0002_client_last_lieu'),
+        ('vente', '0009_commande_recherche'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 from django.db import models
+from django.db.models import Sum, F, DecimalField, ExpressionWrapper
 from django.conf import settings
 
 from client.models import Client
@@ -51,11 +52,22 @@ class Commande(models.Model):
 
     note = models.TextField(blank=True, default="")
 
+    # ✅ Totaux dénormalisés (tenus à jour par CommandeSerializer via refresh_totals)
+    total_articles_cache = models.BigIntegerField(default=0)
+    total_commande_cache = models.BigIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)  # ✅ Date commande (source)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-id"]
+        indexes = [
+            # dashboard / liste filtrée par page sur une période
+            models.Index(fields=["page", "created_at"], name="cmd_page_created_idx"),
+            # liste filtrée par statut, triée par -id
+            models.Index(fields=["statut", "id"], name="cmd_statut_id_idx"),
+            models.Index(fields=["date_livraison"], name="cmd_date_livraison_idx"),
+        ]
 
     @property
     def date_commande(self):
@@ -70,6 +82,29 @@ class Commande(models.Model):
     def total_commande(self) -> int:
         return int(self.total_articles) + int(self.frais_livraison.frais_final or 0)
 
+    def compute_totals(self) -> tuple[int, int]:
+        """(total_articles, total_commande) recalculés en SQL depuis les lignes."""
+        agg = self.lignes.aggregate(
+            s=Sum(ExpressionWrapper(
+                F("quantite") * F("prix_vente_unitaire"),
+                output_field=DecimalField(max_digits=18, decimal_places=2),
+            ))
+        )
+        total_articles = int(agg["s"] or 0)
+        frais = int(self.frais_livraison.frais_final or 0) if self.frais_livraison_id else 0
+        return total_articles, total_articles + frais
+
+    def refresh_totals(self):
+        """
+        Recalcule et stocke total_articles_cache / total_commande_cache.
+        UPDATE direct (pas de save() => pas de signaux en double).
+        """
+        self.total_articles_cache, self.total_commande_cache = self.compute_totals()
+        Commande.objects.filter(pk=self.pk).update(
+            total_articles_cache=self.total_articles_cache,
+            total_commande_cache=self.total_commande_cache,
+        )
+
     def sync_client_snapshot(self):
         self.client_nom = self.client.nom or ""
         self.client_contact = self.client.contact or ""
@@ -95,6 +130,8 @@ class LigneCommande(models.Model):
 
     quantite = models.PositiveIntegerField(default=1)
     prix_vente_unitaire = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # ✅ CMP de l'article au moment de la vente (COGS = quantite * cout_unitaire)
+    cout_unitaire = models.DecimalField(max_digits=14, decimal_places=4, default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -108,3 +145,16 @@ class LigneCommande(models.Model):
 
     def __str__(self) -> str:
         return f"{self.article.reference} x{self.quantite}"
+
+
+class CommandeRecherche(models.Model):
+    """
+    Document de recherche d'une commande (minuscules, sans accents), tenu à jour par vente/signals.py.
+    Indexé en FTS5 trigram (SQLite) ou GIN pg_trgm (PostgreSQL): voir vente/search.py.
+    """
+    commande = models.OneToOneField(Commande, on_delete=models.CASCADE, primary_key=True, related_name="recherche")
+    client = models.TextField(blank=True, default="")  # nom, contact, adresse (snapshot + fiche client)
+    lieu = models.TextField(blank=True, default="")    # lieu de livraison + précision
+
+    def __str__(self) -> str:
+        return f"Recherche commande #{self.commande_id}"
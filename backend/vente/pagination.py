@@ -1,7 +1,74 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.db import connections
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
 
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = "page_size"  # ex: ?page_size=50
     max_page_size = 200
+
+
+class CommandeCursorPagination(CursorPagination):
+    """
+    Pagination keyset (WHERE id < curseur ORDER BY -id LIMIT n) des listes liées aux commandes:
+    coût constant quelle que soit la profondeur (pas d'OFFSET).
+    ?count=approx (défaut): COUNT borné à count_cap lignes, au-delà estimation du planner (PostgreSQL)
+    ?count=exact          : COUNT(*) complet
+    ?count=none           : pas de comptage (polling)
+    """
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = "-id"
+
+    count_query_param = "count"
+    count_cap = 10_000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.total, self.total_approx = self._count(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def _count(self, queryset, request) -> tuple[int | None, bool]:
+        mode = (request.query_params.get(self.count_query_param) or "approx").strip().lower()
+        if mode == "none":
+            return None, False
+
+        qs = queryset.order_by().values("pk")
+        if mode == "exact":
+            return qs.count(), False
+
+        # COUNT sur au plus count_cap + 1 lignes
+        n = qs[: self.count_cap + 1].count()
+        if n <= self.count_cap:
+            return n, False
+        return max(self._estimate(qs), self.count_cap), True
+
+    def _estimate(self, qs) -> int:
+        connection = connections[qs.db]
+        if connection.vendor != "postgresql":
+            return 0
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def get_paginated_response(self, data):
+        return Response({
+            "count": self.total,
+            "count_approx": self.total_approx,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        out = super().get_paginated_response_schema(schema)
+        out["properties"]["count"] = {"type": "integer", "nullable": True, "example": 123}
+        out["properties"]["count_approx"] = {"type": "boolean", "example": False}
+        return out
@@ -0,0 +1,125 @@
+# vente/search.py
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Iterable
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from vente.models import Commande, CommandeRecherche
+
+
+# =========================
+# Recherche commandes (client / lieu / n°)
+# =========================
+# - document normalisé par commande (CommandeRecherche): minuscules, sans accents, ponctuation => espaces
+# - SQLite: table FTS5 trigram vente_commanderecherche_fts (triggers, migration 0009) => sous-chaînes indexées
+# - PostgreSQL: index GIN pg_trgm sur client / lieu => LIKE '%...%' indexé
+# - requête numérique => aussi n° de commande exact (clé primaire, plus de CAST id en texte)
+# Sémantique conservée: chaque mot de la requête doit apparaître (sous-chaîne) dans client ou lieu.
+
+FTS_TABLE = "vente_commanderecherche_fts"
+COLUMNS = ("client", "lieu")
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_fts_ready: bool | None = None
+
+
+def normalize(text: str | None) -> str:
+    """'Analakely — Épicerie' => 'analakely epicerie'."""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def _join(*parts) -> str:
+    seen = []
+    for p in parts:
+        p = normalize(p)
+        if p and p not in seen:
+            seen.append(p)
+    return " ".join(seen)
+
+
+def document(commande: Commande) -> CommandeRecherche:
+    """Document de recherche d'une commande (client et lieu_livraison chargés si possible)."""
+    client = commande.client if commande.client_id else None
+    lieu = commande.lieu_livraison if commande.lieu_livraison_id else None
+    return CommandeRecherche(
+        commande_id=commande.id,
+        client=_join(
+            commande.client_nom, commande.client_contact, commande.client_adresse,
+            getattr(client, "nom", ""), getattr(client, "contact", ""),
+        ),
+        lieu=_join(getattr(lieu, "nom", ""), commande.precision_lieu),
+    )
+
+
+def refresh_search(commandes: Iterable[Commande | int], *, chunk: int = 1000) -> int:
+    """(Re)calcule les documents des commandes (instances ou ids), par lots (upsert)."""
+    ids = [c.id if isinstance(c, Commande) else int(c) for c in commandes]
+    n = 0
+    for i in range(0, len(ids), chunk):
+        docs = [
+            document(c)
+            for c in Commande.objects.filter(id__in=ids[i:i + chunk])
+            .select_related("client", "lieu_livraison")
+            .only(
+                "id", "client_nom", "client_contact", "client_adresse", "precision_lieu",
+                "client__nom", "client__contact", "lieu_livraison__nom",
+            )
+        ]
+        CommandeRecherche.objects.bulk_create(
+            docs, update_conflicts=True, unique_fields=["commande"], update_fields=list(COLUMNS),
+        )
+        n += len(docs)
+    return n
+
+
+def _fts_available() -> bool:
+    global _fts_ready
+    if _fts_ready is None:
+        _fts_ready = connection.vendor == "sqlite" and FTS_TABLE in connection.introspection.table_names()
+    return _fts_ready
+
+
+def _fts_phrase(token: str) -> str:
+    return '"' + token.replace('"', '""') + '"'
+
+
+def search_q(query: str, field: str = "id", columns: Iterable[str] = COLUMNS, *, par_id: bool = True) -> Q:
+    """
+    Filtre "chaque mot de `query` est dans client/lieu", sur le champ id de commande `field`
+    ("id" pour Commande, "commande_id" pour Livraison...). Requête vide => Q() (pas de filtre).
+    par_id: requête numérique => n° de commande exact en plus.
+    """
+    query = (query or "").strip()
+    tokens = normalize(query).split()
+    columns = tuple(columns)
+    if not tokens:
+        return Q()
+
+    # trigram: 3 caractères minimum, les mots plus courts passent par LIKE sur le document
+    longs = [t for t in tokens if len(t) >= 3]
+    courts = [t for t in tokens if len(t) < 3]
+
+    docs = CommandeRecherche.objects.all()
+    if longs and _fts_available():
+        match = "{%s} : (%s)" % (" ".join(columns), " AND ".join(_fts_phrase(t) for t in longs))
+        docs = docs.filter(commande_id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,)))
+    else:
+        courts = tokens
+    for t in courts:
+        cond = Q()
+        for col in columns:
+            cond |= Q(**{f"{col}__contains": t})
+        docs = docs.filter(cond)
+
+    cond = Q(**{f"{field}__in": docs.values("commande_id")})
+    if par_id and query.isdigit():
+        # ✅ n° de commande exact (clé primaire)
+        cond |= Q(**{field: int(query)})
+    return cond
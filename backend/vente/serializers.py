@@ -3,21 +3,41 @@ from __future__ import annotations
 
 from typing import Any
 from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 
+from vente import autocomplete
+from vente.clients import refresh_last_lieu, remember_last_lieu
+from conflivraison.services.livraisons import create_missing_livraisons
 from vente.models import Commande, LigneCommande
+from vente.stock import etat_stock, transition_stock, DEBITE, LIBRE, RESERVE
 from client.models import Client
-from article.models import Article
+from article.models import Article, StockMouvement
+from article.stock import lock_disponibles, apply_stock_deltas
 from livraison.models import LieuLivraison, FraisLivraison, default_frais_par_categorie
 from configuration.models import Page, AppConfiguration
 
 
+def _stock_shortages(lignes: list[dict], disponibles: dict[int, int], held: dict[int, int]) -> dict[int, int]:
+    """{article_id: disponible} pour les articles dont la quantité demandée dépasse le disponible."""
+    wanted: dict[int, int] = {}
+    for ld in lignes:
+        wanted[ld["article"]] = wanted.get(ld["article"], 0) + int(ld["quantite"])
+    out = {}
+    for article_id, qte in wanted.items():
+        disponible = int(disponibles.get(article_id, 0)) + held.get(article_id, 0)
+        if qte > held.get(article_id, 0) and qte > disponible:
+            out[article_id] = disponible
+    return out
+
+
 class ArticleLiteSerializer(serializers.ModelSerializer):
+    disponible = serializers.IntegerField(read_only=True)
     photo_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Article
-        fields = ["id", "nom_produit", "reference", "prix_vente", "quantite_stock", "photo_url"]
+        fields = ["id", "nom_produit", "reference", "prix_vente", "quantite_stock", "disponible", "photo_url"]
 
     def get_photo_url(self, obj: Article) -> str | None:
         request = self.context.get("request")
@@ -28,9 +48,16 @@ class ArticleLiteSerializer(serializers.ModelSerializer):
 
 
 class ClientLiteSerializer(serializers.ModelSerializer):
+    # ✅ dernier lieu (colonnes dénormalisées) => sélection d'un client sans requête client-last-lieu
+    last_lieu = serializers.SerializerMethodField()
+
     class Meta:
         model = Client
-        fields = ["id", "nom", "contact"]
+        fields = ["id", "nom", "contact", "last_lieu"]
+
+    def get_last_lieu(self, obj: Client) -> dict | None:
+        # même forme que l'index d'autocomplétion (suggest/clients)
+        return autocomplete.last_lieu_payload(obj.last_lieu, obj.last_frais, obj.last_precision_lieu)
 
 
 class LieuLivraisonLiteSerializer(serializers.ModelSerializer):
@@ -93,14 +120,10 @@ class LieuInputSerializer(serializers.Serializer):
 
 
 class LigneCommandeWriteSerializer(serializers.Serializer):
+    # existence + stock vérifiés en 1 requête dans CommandeSerializer.validate
     article = serializers.IntegerField()
     quantite = serializers.IntegerField(min_value=1)
 
-    def validate_article(self, value: int) -> int:
-        if not Article.objects.filter(id=value).exists():
-            raise serializers.ValidationError("Article introuvable.")
-        return value
-
 
 class CommandeSerializer(serializers.ModelSerializer):
     lignes_detail = LigneCommandeReadSerializer(source="lignes", many=True, read_only=True)
@@ -108,8 +131,8 @@ class CommandeSerializer(serializers.ModelSerializer):
     lieu_detail = LieuLivraisonLiteSerializer(source="lieu_livraison", read_only=True)
     page_detail = PageLiteSerializer(source="page", read_only=True)
 
-    total_articles = serializers.IntegerField(read_only=True)
-    total_commande = serializers.IntegerField(read_only=True)
+    total_articles = serializers.IntegerField(source="total_articles_cache", read_only=True)
+    total_commande = serializers.IntegerField(source="total_commande_cache", read_only=True)
     frais_final = serializers.SerializerMethodField()
 
     # ✅ date commande (read-only)
@@ -177,6 +200,62 @@ class CommandeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Page inactive.")
         return value
 
+    def validate(self, attrs):
+        lignes = attrs.get("lignes")
+        if lignes is None:
+            return attrs
+
+        # ✅ 1 seule requête pour tous les articles des lignes
+        articles = Article.objects.in_bulk({ld["article"] for ld in lignes})
+        errors = [
+            {} if ld["article"] in articles else {"article": ["Article introuvable."]}
+            for ld in lignes
+        ]
+        if any(errors):
+            raise serializers.ValidationError({"lignes": errors})
+
+        held = self._held_quantities()
+        manque = _stock_shortages(lignes, {a.id: a.disponible for a in articles.values()}, held)
+        if manque:
+            raise serializers.ValidationError({"lignes": [
+                {"quantite": [f"Stock insuffisant (disponible: {manque[ld['article']]})."]}
+                if ld["article"] in manque else {}
+                for ld in lignes
+            ]})
+
+        # ✅ réutilisés par create/update (prix, CMP) sans relecture
+        self._articles = articles
+        return attrs
+
+    def _held_quantities(self) -> dict[int, int]:
+        """Quantités réservées (ou livrées) par la commande éditée: re-disponibles pour elle."""
+        held: dict[int, int] = {}
+        if self.instance is not None and etat_stock(self.instance.statut) != LIBRE:
+            for article_id, qte in self.instance.lignes.values_list("article_id", "quantite"):
+                held[article_id] = held.get(article_id, 0) + int(qte)
+        return held
+
+    def _check_reopen_stock(self, commande: Commande, statut_avant: str, lignes_data: list[dict] | None):
+        """
+        Commande livrée / annulée rouverte: ses quantités vont être re-réservées.
+        Même contrôle que validate(), mais sous verrou (articles FOR UPDATE) et sur les lignes finales.
+        """
+        anciennes: dict[int, int] = {}
+        for article_id, qte in commande.lignes.values_list("article_id", "quantite"):
+            anciennes[article_id] = anciennes.get(article_id, 0) + int(qte)
+        lignes = lignes_data if lignes_data is not None else [
+            {"article": article_id, "quantite": qte} for article_id, qte in anciennes.items()
+        ]
+        # livrée: le stock débité revient avec la réouverture; annulée: rien n'est tenu
+        held = anciennes if etat_stock(statut_avant) == DEBITE else {}
+        disponibles = lock_disponibles(set(anciennes) | {ld["article"] for ld in lignes})
+        manque = _stock_shortages(lignes, disponibles, held)
+        if manque:
+            raise serializers.ValidationError({"lignes": [
+                f"Stock insuffisant pour l'article #{article_id} (disponible: {dispo})."
+                for article_id, dispo in sorted(manque.items())
+            ]})
+
     def get_frais_final(self, obj: Commande) -> int:
         return int(getattr(obj.frais_livraison, "frais_final", 0) or 0)
 
@@ -223,28 +302,95 @@ class CommandeSerializer(serializers.ModelSerializer):
         fr.save()
         return fr
 
-    def _apply_lines_and_stock(self, commande: Commande, lignes_data: list[dict[str, Any]]):
+    def _sync_lines(self, commande: Commande, lignes_data: list[dict[str, Any]], *, creation: bool = False) -> bool:
+        """
+        Diff des lignes par article (création et édition):
+        - article retiré   => ligne supprimée, réservation libérée
+        - article ajouté   => ligne créée (prix / CMP actuels), quantité réservée
+        - quantité changée => ligne mise à jour (prix_vente_unitaire d'origine conservé), réservé += nouveau - ancien
+        - inchangé         => aucune requête
+        Requêtes proportionnelles aux changements, pas à la taille de la commande.
+        La commande doit être ouverte (réservation): le stock lui-même n'est débité qu'à la livraison (vente/stock.py).
+        Renvoie True si des lignes ont changé (totaux à recalculer).
+        """
+        wanted: dict[int, int] = {}
         for ld in lignes_data:
-            article = Article.objects.select_for_update().get(id=ld["article"])
-            qte = int(ld["quantite"])
-
-            LigneCommande.objects.create(
-                commande=commande,
-                article=article,
-                quantite=qte,
-                prix_vente_unitaire=article.prix_vente,
-            )
-
-            article.quantite_stock = int(article.quantite_stock) - qte
-            article.save(update_fields=["quantite_stock", "updated_at"])
-
-    def _rollback_stock_from_existing_lines(self, commande: Commande):
-        old_lines = list(commande.lignes.select_related("article").all())
-        for l in old_lines:
-            art = l.article
-            art.quantite_stock = int(art.quantite_stock) + int(l.quantite)
-            art.save(update_fields=["quantite_stock", "updated_at"])
-        commande.lignes.all().delete()
+            wanted[ld["article"]] = wanted.get(ld["article"], 0) + int(ld["quantite"])
+
+        existing: dict[int, list[LigneCommande]] = {}
+        if not creation:
+            for l in commande.lignes.only("id", "commande_id", "article_id", "quantite").order_by("id"):
+                existing.setdefault(l.article_id, []).append(l)
+
+        deltas: dict[int, int] = {}
+        to_delete: list[int] = []
+        to_update: list[LigneCommande] = []
+        to_create: list[int] = []
+
+        for article_id in existing.keys() | wanted.keys():
+            lines = existing.get(article_id, [])
+            old_q = sum(int(l.quantite) for l in lines)
+            new_q = wanted.get(article_id, 0)
+
+            if not lines:
+                to_create.append(article_id)
+            elif not new_q:
+                to_delete.extend(l.id for l in lines)
+            else:
+                keep, extra = lines[0], lines[1:]
+                to_delete.extend(l.id for l in extra)
+                if int(keep.quantite) != new_q:
+                    keep.quantite = new_q
+                    to_update.append(keep)
+
+            if old_q != new_q:
+                deltas[article_id] = old_q - new_q
+
+        if not (deltas or to_delete or to_update or to_create):
+            return False
+
+        # ✅ 1 seul SELECT ... FOR UPDATE (ordre id => pas de deadlock entre commandes concurrentes)
+        disponibles = lock_disponibles(set(deltas) | set(to_create))
+        # revérifié sous verrou: une autre commande a pu réserver le stock depuis validate()
+        manque = {
+            article_id: dispo for article_id, dispo in disponibles.items()
+            if deltas.get(article_id, 0) < 0 and dispo + deltas[article_id] < 0
+        }
+        if manque:
+            raise serializers.ValidationError({"lignes": [
+                f"Stock insuffisant pour l'article #{article_id} (disponible: {dispo})."
+                for article_id, dispo in sorted(manque.items())
+            ]})
+
+        articles = getattr(self, "_articles", None) or Article.objects.in_bulk(to_create)
+
+        if to_delete:
+            LigneCommande.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            now = timezone.now()
+            for l in to_update:
+                l.updated_at = now
+            LigneCommande.objects.bulk_update(to_update, ["quantite", "updated_at"])
+        if to_create:
+            created = LigneCommande.objects.bulk_create([
+                LigneCommande(
+                    commande=commande,
+                    article=articles[article_id],
+                    quantite=wanted[article_id],
+                    prix_vente_unitaire=articles[article_id].prix_vente,
+                    cout_unitaire=articles[article_id].cout_moyen,  # ✅ CMP figé au moment de la vente
+                )
+                for article_id in sorted(to_create)
+            ])
+            # bulk_create => pas de post_save: usage des articles remonté à l'autocomplétion
+            transaction.on_commit(lambda: autocomplete.bump_lignes(created))
+
+        # deltas = variation du disponible => réservé += -delta (stock physique inchangé)
+        apply_stock_deltas(
+            {}, source_type=StockMouvement.Source.VENTE, source_id=commande.id,
+            reservations={article_id: -d for article_id, d in deltas.items()},
+        )
+        return True
 
     @transaction.atomic
     def create(self, validated_data):
@@ -277,7 +423,13 @@ class CommandeSerializer(serializers.ModelSerializer):
             statut=Commande.Statut.EN_ATTENTE,
         )
 
-        self._apply_lines_and_stock(commande, lignes_data)
+        self._sync_lines(commande, lignes_data, creation=True)
+        # ✅ totaux dénormalisés (lignes + frais)
+        commande.refresh_totals()
+        remember_last_lieu(commande)
+        if commande.date_livraison:
+            # ✅ suivi livraison créé à l'écriture (plus d'autosync au listing)
+            create_missing_livraisons([commande.id], actor=user, message="Création à la saisie de la commande")
         commande.refresh_from_db()
         return commande
 
@@ -294,6 +446,7 @@ class CommandeSerializer(serializers.ModelSerializer):
         if "page" in validated_data:
             instance.page = validated_data.get("page")
 
+        ancien_client_id = instance.client_id
         if client_data:
             instance.client = self._get_or_create_client(client_data)
 
@@ -308,13 +461,31 @@ class CommandeSerializer(serializers.ModelSerializer):
         instance.note = validated_data.get("note", instance.note)
 
         # ✅ si tu veux que même en édition ça reste EN_ATTENTE, on force aussi ici
+        # (commande livrée / annulée rouverte => stock rendu puis re-réservé, avant le diff des lignes)
+        # statut relu sous verrou: une livraison/annulation concurrente a pu le changer
+        statut_avant = Commande.objects.select_for_update().values_list("statut", flat=True).get(pk=instance.pk)
+        if etat_stock(statut_avant) != RESERVE:
+            self._check_reopen_stock(instance, statut_avant, lignes_data)
+        transition_stock({instance.id: (statut_avant, Commande.Statut.EN_ATTENTE)})
         instance.statut = Commande.Statut.EN_ATTENTE
 
         instance.save()
 
-        if lignes_data is not None:
-            self._rollback_stock_from_existing_lines(instance)
-            self._apply_lines_and_stock(instance, lignes_data)
+        lignes_changed = lignes_data is not None and self._sync_lines(instance, lignes_data)
+        frais_changed = bool(lieu_data) or ("frais_override" in self.initial_data)
+        if lignes_changed or frais_changed:
+            # ✅ totaux dénormalisés (lignes + frais)
+            instance.refresh_totals()
+
+        # ✅ dernier lieu du client (et de l'ancien client si la commande a changé de client)
+        if ancien_client_id and ancien_client_id != instance.client_id:
+            refresh_last_lieu([ancien_client_id])
+        remember_last_lieu(instance)
+        if instance.date_livraison:
+            request = self.context.get("request")
+            create_missing_livraisons(
+                [instance.id], actor=getattr(request, "user", None), message="Création à la modification de la commande",
+            )
 
         instance.refresh_from_db()
         return instance
@@ -0,0 +1,166 @@
+# vente/signals.py
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from article.models import Article
+from article.stock import stock_changed
+from client.models import Client
+from livraison.models import FraisLivraison, LieuLivraison
+from vente import autocomplete
+from vente.clients import refresh_last_lieu
+from vente.models import Commande, CommandeRecherche, LigneCommande
+from vente.search import COLUMNS, document, refresh_search
+
+
+# =========================
+# Documents de recherche (vente/search.py)
+# =========================
+# suppression: CASCADE sur CommandeRecherche (+ trigger FTS côté SQLite)
+# bulk_create / update() ne déclenchent rien => refresh_search() / rebuild_search_index
+
+
+@receiver(post_save, sender=Commande)
+def commande_saved(sender, instance: Commande, raw=False, **kwargs):
+    if raw:
+        return
+    CommandeRecherche.objects.bulk_create(
+        [document(instance)], update_conflicts=True, unique_fields=["commande"], update_fields=list(COLUMNS),
+    )
+
+
+@receiver(post_save, sender=Client)
+def client_saved(sender, instance: Client, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    refresh_search(Commande.objects.filter(client_id=instance.id).values_list("id", flat=True))
+
+
+@receiver(post_save, sender=LieuLivraison)
+def lieu_saved(sender, instance: LieuLivraison, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    refresh_search(Commande.objects.filter(lieu_livraison_id=instance.id).values_list("id", flat=True))
+
+
+# =========================
+# Totaux dénormalisés (Commande.refresh_totals)
+# =========================
+# frais modifiés hors CommandeSerializer (PATCH /api/livraison/frais/<id>/, admin):
+# total_commande_cache et Client.last_frais des commandes liées suivent frais_final
+
+
+@receiver(post_save, sender=FraisLivraison)
+def frais_saved(sender, instance: FraisLivraison, created=False, raw=False, **kwargs):
+    if raw or created:
+        return  # nouveau frais: aucune commande liée encore
+    client_ids = set()
+    for cmd in Commande.objects.filter(frais_livraison_id=instance.id).only("id", "client_id"):
+        cmd.frais_livraison = instance  # ✅ frais_final à jour, pas de relecture par commande
+        cmd.refresh_totals()
+        client_ids.add(cmd.client_id)
+    if client_ids:
+        refresh_last_lieu(client_ids)
+
+
+# =========================
+# Index d'autocomplétion en mémoire (vente/autocomplete.py)
+# =========================
+# appliqué après commit (rollback => index inchangé)
+# lignes créées par bulk_create (CommandeSerializer._sync_lines): autocomplete.bump_lignes
+# dernier lieu des clients (update() dans vente/clients.py): autocomplete.refresh_clients
+
+
+@receiver(post_save, sender=Article)
+def article_suggest_saved(sender, instance: Article, raw=False, **kwargs):
+    if raw:
+        return
+    payload = autocomplete.article_payload(instance)
+    texts = (instance.nom_produit, instance.reference)
+    transaction.on_commit(lambda: autocomplete.ARTICLES.upsert(instance.id, payload, texts))
+
+
+@receiver(stock_changed, sender=Article)
+def article_suggest_counters(sender, deltas: dict, reservations: dict, **kwargs):
+    # compteurs modifiés par UPDATE groupé (article/stock.py): deltas appliqués au payload
+    def apply():
+        for pk in deltas.keys() | reservations.keys():
+            autocomplete.ARTICLES.adjust(
+                pk, quantite_stock=deltas.get(pk, 0), quantite_reservee=reservations.get(pk, 0),
+            )
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=Article)
+def article_suggest_deleted(sender, instance: Article, **kwargs):
+    pk = instance.id
+    transaction.on_commit(lambda: autocomplete.ARTICLES.remove(pk))
+
+
+@receiver(post_save, sender=Client)
+def client_suggest_saved(sender, instance: Client, raw=False, **kwargs):
+    if raw:
+        return
+    payload = autocomplete.client_payload(instance)
+    texts = (instance.nom, instance.contact)
+    transaction.on_commit(lambda: autocomplete.CLIENTS.upsert(instance.id, payload, texts))
+
+
+@receiver(post_delete, sender=Client)
+def client_suggest_deleted(sender, instance: Client, **kwargs):
+    pk = instance.id
+    transaction.on_commit(lambda: autocomplete.CLIENTS.remove(pk))
+
+
+@receiver(post_save, sender=LieuLivraison)
+def lieu_suggest_saved(sender, instance: LieuLivraison, raw=False, **kwargs):
+    if raw:
+        return
+    pk, nom = instance.id, instance.nom
+    if instance.actif:
+        payload = autocomplete.lieu_payload(instance)
+        texts = (instance.nom,)
+        transaction.on_commit(lambda: autocomplete.LIEUX.upsert(pk, payload, texts))
+    else:
+        transaction.on_commit(lambda: autocomplete.LIEUX.remove(pk))
+
+    # lieu renommé => dernier lieu des clients qui l'utilisent
+    def rename():
+        autocomplete.CLIENTS.patch_where(
+            lambda c: (c.get("last_lieu") or {}).get("lieu_id") == pk,
+            lambda c: {"last_lieu": {**c["last_lieu"], "lieu_nom": nom}},
+        )
+
+    transaction.on_commit(rename)
+
+
+@receiver(post_delete, sender=LieuLivraison)
+def lieu_suggest_deleted(sender, instance: LieuLivraison, **kwargs):
+    pk = instance.id
+    transaction.on_commit(lambda: autocomplete.LIEUX.remove(pk))
+
+
+@receiver(post_save, sender=Commande)
+def commande_suggest_used(sender, instance: Commande, created=False, raw=False, **kwargs):
+    if raw or not created:
+        return
+    pk, client_id, lieu_id = instance.id, instance.client_id, instance.lieu_livraison_id
+
+    def bump():
+        if client_id:
+            autocomplete.CLIENTS.bump(client_id, pk)
+        if lieu_id:
+            autocomplete.LIEUX.bump(lieu_id, pk)
+
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=LigneCommande)
+def ligne_suggest_used(sender, instance: LigneCommande, created=False, raw=False, **kwargs):
+    if raw or not created:
+        return
+    pk, article_id = instance.id, instance.article_id
+    transaction.on_commit(lambda: autocomplete.ARTICLES.bump(article_id, pk))
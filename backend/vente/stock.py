@@ -0,0 +1,66 @@
+# vente/stock.py
+from __future__ import annotations
+
+from article.models import StockMouvement
+from article.stock import lock_articles, apply_stock_mouvements
+from vente.models import Commande, LigneCommande
+
+
+# =========================
+# Stock d'une commande selon son statut
+# =========================
+# - EN_ATTENTE / EN_LIVRAISON : quantités réservées (Article.quantite_reservee)
+# - LIVREE                    : quantités débitées du stock (mouvement VENTE)
+# - ANNULEE                   : rien (réservation libérée / stock rendu)
+# Toute transition se résume à: stock -= q si on entre en DEBITE, += q si on en sort;
+# réservé += q si on entre en RESERVE, -= q si on en sort.
+
+RESERVE = "RESERVE"
+DEBITE = "DEBITE"
+LIBRE = "LIBRE"
+
+
+def etat_stock(statut: str) -> str:
+    if statut == Commande.Statut.LIVREE:
+        return DEBITE
+    if statut == Commande.Statut.ANNULEE:
+        return LIBRE
+    return RESERVE
+
+
+def transition_stock(changes: dict[int, tuple[str, str]]) -> int:
+    """
+    Applique les mouvements de stock de changements de statut {commande_id: (ancien, nouveau)}:
+    1 lecture des lignes, 1 verrou sur les articles, 1 UPDATE (journal: 1 ligne par commande × article).
+    À appeler dans un atomic(), avant toute modification des lignes. Renvoie le nombre d'articles touchés.
+    """
+    facteurs = {}
+    for commande_id, (ancien, nouveau) in changes.items():
+        a, b = etat_stock(ancien), etat_stock(nouveau)
+        if a != b:
+            facteurs[commande_id] = (
+                (a == DEBITE) - (b == DEBITE),    # sens du mouvement de stock
+                (b == RESERVE) - (a == RESERVE),  # sens de la réservation
+            )
+    if not facteurs:
+        return 0
+
+    quantites: dict[tuple[int, int], int] = {}
+    for commande_id, article_id, qte in (
+        LigneCommande.objects.filter(commande_id__in=list(facteurs))
+        .values_list("commande_id", "article_id", "quantite")
+    ):
+        key = (commande_id, article_id)
+        quantites[key] = quantites.get(key, 0) + int(qte)
+
+    mouvements = []
+    reservations: dict[int, int] = {}
+    for (commande_id, article_id), qte in quantites.items():
+        sens_stock, sens_reserve = facteurs[commande_id]
+        if sens_stock:
+            mouvements.append((article_id, sens_stock * qte, commande_id))
+        if sens_reserve:
+            reservations[article_id] = reservations.get(article_id, 0) + sens_reserve * qte
+
+    lock_articles(article_id for _, article_id in quantites)
+    return apply_stock_mouvements(mouvements, source_type=StockMouvement.Source.VENTE, reservations=reservations)
@@ -1,3 +1,534 @@
-from django.test import TestCase
+from __future__ import annotations
 
-# Create your tests here.
+import threading
+import unittest
+from unittest.mock import patch
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from achats.models import AchatLigne
+from article.models import Article, StockMouvement
+from client.models import Client
+from configuration.models import AppConfiguration, Page
+from conflivraison.models import Livraison
+from encaissement.models import Encaissement
+from livraison.models import FraisLivraison, LieuLivraison
+from vente import autocomplete
+from vente.dates import day_range_q, days_q
+from vente.models import Commande
+from vente.pagination import CommandeCursorPagination
+from vente.search import search_q
+from vente.serializers import CommandeSerializer
+from vente.views import CommandeViewSet
+
+
+@override_settings(TIME_ZONE="Indian/Antananarivo")
+class SargableDateRangeTests(TestCase):
+    """Les plages locales [jour 00:00, lendemain 00:00) doivent découper comme created_at__date."""
+
+    @classmethod
+    def setUpTestData(cls):
+        client = Client.objects.create(nom="Client", contact="0340000000")
+        lieu = LieuLivraison.objects.create(nom="Lieu", categorie=LieuLivraison.Categorie.VILLE)
+        tz = timezone.get_current_timezone()
+        cls.day = date(2026, 3, 10)
+        # autour des 2 bornes locales du jour (UTC+3 => 21:00 UTC la veille)
+        for h, m in [(-1, 59), (0, 0), (12, 0), (23, 59), (24, 0), (24, 1)]:
+            frais = FraisLivraison.objects.create(lieu=lieu)
+            cmd = Commande.objects.create(client=client, lieu_livraison=lieu, frais_livraison=frais)
+            local = datetime.combine(cls.day, datetime.min.time()) + timedelta(hours=h, minutes=m)
+            Commande.objects.filter(pk=cmd.pk).update(created_at=timezone.make_aware(local, tz))
+
+    def test_single_day_matches_date_lookup(self):
+        expected = set(Commande.objects.filter(created_at__date=self.day).values_list("id", flat=True))
+        got = set(Commande.objects.filter(day_range_q("created_at", self.day, self.day)).values_list("id", flat=True))
+        self.assertEqual(got, expected)
+        self.assertEqual(len(got), 3)
+
+    def test_days_q_matches_date_in(self):
+        days = [self.day - timedelta(days=1), self.day + timedelta(days=1), self.day + timedelta(days=5)]
+        expected = set(Commande.objects.filter(created_at__date__in=days).values_list("id", flat=True))
+        got = set(Commande.objects.filter(days_q("created_at", days)).values_list("id", flat=True))
+        self.assertEqual(got, expected)
+        self.assertEqual(len(got), 3)
+
+
+class HotPathIndexExplainTests(TestCase):
+    """
+    EXPLAIN des requêtes chaudes: l'index composite doit apparaître dans le plan.
+    SQLite: "USING INDEX <nom>" ; Postgres: "Index Scan/Bitmap Index Scan using <nom>"
+    (seqscan désactivé: sur une base de test quasi vide le planner préférerait un seq scan).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cfg = AppConfiguration.get_solo()
+        cls.page = Page.objects.create(config=cfg, nom="Page", lien="/p")
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cur:
+                cur.execute("SET LOCAL enable_seqscan = off")
+        elif connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN vérifié sur SQLite / PostgreSQL uniquement")
+
+    def assertUsesIndex(self, qs, index_name: str):
+        plan = qs.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_commande_page_period(self):
+        today = timezone.localdate()
+        qs = Commande.objects.filter(day_range_q("created_at", today - timedelta(days=30), today), page=self.page)
+        self.assertUsesIndex(qs, "cmd_page_created_idx")
+
+    def test_commande_statut_list(self):
+        qs = Commande.objects.filter(statut=Commande.Statut.EN_ATTENTE).order_by("-id")
+        self.assertUsesIndex(qs, "cmd_statut_id_idx")
+
+    def test_commande_date_livraison(self):
+        qs = Commande.objects.filter(date_livraison=timezone.localdate())
+        self.assertUsesIndex(qs, "cmd_date_livraison_idx")
+
+    def test_livraison_statut_date_prevue(self):
+        qs = Livraison.objects.filter(statut=Livraison.Statut.A_PREPARER, date_prevue=timezone.localdate())
+        self.assertUsesIndex(qs, "livraison_statut_date_idx")
+
+    def test_encaissement_statut(self):
+        qs = Encaissement.objects.filter(statut=Encaissement.StatutPaiement.EN_ATTENTE)
+        self.assertUsesIndex(qs, "encaissement_statut_idx")
+
+    def test_achat_ligne_article_achat(self):
+        qs = AchatLigne.objects.filter(article_id=1).order_by("-achat_id")
+        self.assertUsesIndex(qs, "achatligne_article_achat_idx")
+
+
+class CommandeLineDiffTests(TestCase):
+    """Édition des lignes: diff par article, deltas de stock nets, prix d'origine conservé."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lieu = LieuLivraison.objects.create(nom="Lieu", categorie=LieuLivraison.Categorie.VILLE)
+        cls.articles = [
+            Article.objects.create(nom_produit=f"P{i}", reference=f"P{i}", prix_vente=1000 + i, quantite_stock=500)
+            for i in range(30)
+        ]
+
+    def _create(self, lignes):
+        ser = CommandeSerializer(data={"client_input": {"nom": "C"}, "lieu_input": {"id": self.lieu.id}, "lignes": lignes})
+        ser.is_valid(raise_exception=True)
+        return ser.save()
+
+    def _update(self, commande, lignes):
+        ser = CommandeSerializer(commande, data={"lignes": lignes}, partial=True)
+        ser.is_valid(raise_exception=True)
+        return ser.save()
+
+    def _stock(self, art) -> int:
+        """Disponible (stock - réservé)."""
+        stock, reserve = Article.objects.values_list("quantite_stock", "quantite_reservee").get(pk=art.pk)
+        return stock - reserve
+
+    def test_edit_keeps_unchanged_lines_and_applies_net_deltas(self):
+        a, b, c, d = self.articles[:4]
+        cmd = self._create([{"article": a.id, "quantite": 2}, {"article": b.id, "quantite": 1}, {"article": c.id, "quantite": 4}])
+        line_a = cmd.lignes.get(article=a)
+
+        Article.objects.filter(pk=a.pk).update(prix_vente=9999)
+        cmd = self._update(cmd, [
+            {"article": a.id, "quantite": 2},   # inchangé
+            {"article": b.id, "quantite": 3},   # +2
+            {"article": d.id, "quantite": 1},   # ajouté ; c retiré
+        ])
+
+        kept = cmd.lignes.get(article=a)
+        self.assertEqual(kept.id, line_a.id)
+        self.assertEqual(kept.prix_vente_unitaire, line_a.prix_vente_unitaire)
+        self.assertFalse(cmd.lignes.filter(article=c).exists())
+        self.assertEqual(
+            [self._stock(x) for x in (a, b, c, d)],
+            [500 - 2, 500 - 3, 500, 500 - 1],
+        )
+        self.assertEqual(cmd.total_articles_cache, 2 * 1000 + 3 * 1001 + 1 * 1003)
+
+    def test_edit_cost_does_not_grow_with_order_size(self):
+        def edit_queries(n: int) -> int:
+            lignes = [{"article": art.id, "quantite": 1} for art in self.articles[:n]]
+            cmd = self._create(lignes)
+            lignes[0]["quantite"] = 5
+            with CaptureQueriesContext(connection) as ctx:
+                self._update(cmd, lignes)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(edit_queries(5), edit_queries(30))
+
+    def test_create_article_queries_are_constant(self):
+        def article_queries(n: int) -> int:
+            with CaptureQueriesContext(connection) as ctx:
+                self._create([{"article": art.id, "quantite": 1} for art in self.articles[:n]])
+            return sum(1 for q in ctx.captured_queries if '"article_article"' in q["sql"])
+
+        self.assertEqual(article_queries(2), article_queries(30))
+
+    def test_validation_rejects_unknown_article_and_short_stock(self):
+        a = self.articles[0]
+        ser = CommandeSerializer(data={
+            "client_input": {"nom": "C"}, "lieu_input": {"id": self.lieu.id},
+            "lignes": [{"article": a.id, "quantite": 501}, {"article": 999999, "quantite": 1}],
+        })
+        self.assertFalse(ser.is_valid())
+        self.assertEqual(ser.errors["lignes"][1]["article"], ["Article introuvable."])
+
+        ser = CommandeSerializer(data={
+            "client_input": {"nom": "C"}, "lieu_input": {"id": self.lieu.id},
+            "lignes": [{"article": a.id, "quantite": 300}, {"article": a.id, "quantite": 201}],
+        })
+        self.assertFalse(ser.is_valid())
+        self.assertIn("Stock insuffisant", str(ser.errors["lignes"][0]["quantite"][0]))
+
+        # édition: la quantité déjà tenue par la commande reste disponible pour elle
+        cmd = self._create([{"article": a.id, "quantite": 400}])
+        self._update(cmd, [{"article": a.id, "quantite": 500}])
+        self.assertEqual(self._stock(a), 0)
+
+
+class CommandeReservationTests(TestCase):
+    """Stock réservé à la création, débité à la livraison, libéré à l'annulation (vente/stock.py)."""
+
+    def setUp(self):
+        self.lieu = LieuLivraison.objects.create(nom="Lieu", categorie=LieuLivraison.Categorie.VILLE)
+        self.article = Article.objects.create(nom_produit="P", reference="P", prix_vente=1000, quantite_stock=10)
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user(username="u", email="u@x.mg", password="x"))
+
+    def _commande(self, qte: int) -> Commande:
+        ser = CommandeSerializer(data={
+            "client_input": {"nom": "C"}, "lieu_input": {"id": self.lieu.id},
+            "lignes": [{"article": self.article.id, "quantite": qte}],
+        })
+        ser.is_valid(raise_exception=True)
+        cmd = ser.save()
+        Livraison.objects.create(commande=cmd)
+        return cmd
+
+    def _compteurs(self) -> tuple[int, int]:
+        self.article.refresh_from_db()
+        return self.article.quantite_stock, self.article.quantite_reservee
+
+    def test_cycle_reservation(self):
+        livree, annulee, supprimee = self._commande(3), self._commande(2), self._commande(4)
+        self.assertEqual(self._compteurs(), (10, 9))
+        self.assertEqual(self.api.get("/api/articles/").json()[0]["disponible"], 1)
+
+        self.api.post(f"/api/conflivraison/livraisons/{livree.suivi_livraison.id}/en-livraison/", {})
+        self.assertEqual(self._compteurs(), (10, 9))
+        self.api.post(f"/api/conflivraison/livraisons/{livree.suivi_livraison.id}/livrer/", {})
+        self.assertEqual(self._compteurs(), (7, 6))
+        self.api.post(f"/api/conflivraison/livraisons/{annulee.suivi_livraison.id}/annuler/", {})
+        self.assertEqual(self._compteurs(), (7, 4))
+        self.api.delete(f"/api/vente/commandes/{supprimee.id}/")
+        self.assertEqual(self._compteurs(), (7, 0))
+
+        # commande livrée rééditée => rouverte: stock rendu, quantités re-réservées
+        ser = CommandeSerializer(livree, data={"lignes": [{"article": self.article.id, "quantite": 5}]}, partial=True)
+        ser.is_valid(raise_exception=True)
+        ser.save()
+        self.assertEqual(self._compteurs(), (10, 5))
+        # journal: -3 à la livraison, +3 à la réouverture
+        self.assertEqual(
+            list(StockMouvement.objects.filter(article=self.article).order_by("id").values_list("delta", flat=True)),
+            [-3, 3],
+        )
+
+    def test_suppression_relit_le_statut_sous_verrou(self):
+        cmd = self._commande(3)
+        perimee = Commande.objects.get(pk=cmd.pk)  # lue avant la livraison concurrente
+        self.api.post(f"/api/conflivraison/livraisons/{cmd.suivi_livraison.id}/livrer/", {})
+        self.assertEqual(self._compteurs(), (7, 0))
+
+        # supprimer l'instance périmée (EN_ATTENTE) ne libère pas une réservation déjà débitée: le stock est rendu
+        CommandeViewSet().perform_destroy(perimee)
+        self.assertEqual(self._compteurs(), (10, 0))
+
+    def test_reouverture_annulee_sans_stock(self):
+        annulee = self._commande(6)
+        self.api.post(f"/api/conflivraison/livraisons/{annulee.suivi_livraison.id}/annuler/", {})
+        self._commande(8)
+        self.assertEqual(self._compteurs(), (10, 8))
+
+        # rouvrir l'annulée (sans toucher aux lignes) re-réserverait 6 sur 2 disponibles => 400, rien ne bouge
+        resp = self.api.patch(f"/api/vente/commandes/{annulee.id}/", {"note": "relance"}, format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(self._compteurs(), (10, 8))
+        annulee.refresh_from_db()
+        self.assertEqual(annulee.statut, Commande.Statut.ANNULEE)
+
+        # lignes réduites au disponible: acceptée
+        ser = CommandeSerializer(annulee, data={"lignes": [{"article": self.article.id, "quantite": 2}]}, partial=True)
+        ser.is_valid(raise_exception=True)
+        ser.save()
+        self.assertEqual(self._compteurs(), (10, 10))
+
+
+class CommandeCursorPaginationTests(TestCase):
+    """Listes commandes: pages keyset (-id) sans OFFSET, comptage borné."""
+
+    def setUp(self):
+        lieu = LieuLivraison.objects.create(nom="Lieu", categorie=LieuLivraison.Categorie.VILLE)
+        client = Client.objects.create(nom="C", contact="034")
+        self.ids = [
+            Commande.objects.create(client=client, lieu_livraison=lieu, frais_livraison=FraisLivraison.objects.create(lieu=lieu)).id
+            for _ in range(7)
+        ]
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user(username="u", email="u@x.mg", password="x"))
+
+    def test_pages_and_count(self):
+        seen = []
+        url, params = "/api/vente/commandes/", {"page_size": 3}
+        while url:
+            data = self.api.get(url, params).json()
+            self.assertEqual((data["count"], data["count_approx"]), (7, False))
+            seen += [c["id"] for c in data["results"]]
+            url, params = data["next"], {}
+        self.assertEqual(seen, sorted(self.ids, reverse=True))
+
+        with patch.object(CommandeCursorPagination, "count_cap", 5):
+            data = self.api.get("/api/vente/commandes/").json()
+        self.assertEqual((data["count"], data["count_approx"]), (5, True))
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.api.get("/api/vente/commandes/", {"count": "none"}).json()
+        self.assertIsNone(data["count"])
+        self.assertFalse(any("COUNT(" in q["sql"] for q in ctx.captured_queries))
+
+
+class CommandeSearchTests(TestCase):
+    """Recherche indexée (vente/search.py): sans accents, sous-chaînes, n° exact, document tenu à jour."""
+
+    def setUp(self):
+        self.lieu = LieuLivraison.objects.create(nom="Ambohimanarina", categorie=LieuLivraison.Categorie.VILLE)
+        self.client_a = Client.objects.create(nom="Hérilala Rakoto", contact="034 55 777 88")
+        self.a = self._commande(self.client_a, precision="Près de l'église")
+        self.b = self._commande(Client.objects.create(nom="Bema"))
+
+    def _commande(self, client, precision=""):
+        return Commande.objects.create(
+            client=client, lieu_livraison=self.lieu, frais_livraison=FraisLivraison.objects.create(lieu=self.lieu),
+            precision_lieu=precision,
+        )
+
+    def _ids(self, q, **kwargs):
+        return sorted(Commande.objects.filter(search_q(q, **kwargs)).values_list("id", flat=True))
+
+    def test_search(self):
+        self.assertEqual(self._ids("herilala"), [self.a.id])
+        self.assertEqual(self._ids("RAKO eglise"), [self.a.id])
+        self.assertEqual(self._ids("777"), [self.a.id])
+        self.assertEqual(self._ids("manarina"), [self.a.id, self.b.id])
+        self.assertEqual(self._ids("manarina", columns=["client"]), [])
+        self.assertEqual(self._ids(str(self.b.id)), [self.b.id])
+        self.assertEqual(self._ids(""), [self.a.id, self.b.id])
+
+        # fiche client / lieu renommés => documents recalculés
+        self.client_a.nom = "Soa"
+        self.client_a.save()
+        self.assertEqual(self._ids("soa"), [self.a.id])
+        self.lieu.nom = "Itaosy"
+        self.lieu.save()
+        self.assertEqual(self._ids("itaosy"), [self.a.id, self.b.id])
+
+        self.b.delete()
+        self.assertEqual(self._ids("itaosy"), [self.a.id])
+
+
+class SuggestIndexTests(TestCase):
+    """Autocomplétion en mémoire (vente/autocomplete.py): préfixes, rang par usage, mise à jour par signaux."""
+
+    def setUp(self):
+        for index in (autocomplete.ARTICLES, autocomplete.CLIENTS, autocomplete.LIEUX):
+            index.invalidate()
+        self.lieu = LieuLivraison.objects.create(nom="Analakely", categorie=LieuLivraison.Categorie.VILLE)
+        self.rare = Client.objects.create(nom="Rakoto Jean", contact="034 11")
+        self.habitue = Client.objects.create(nom="Rakotobe Soa", contact="032 22")
+        for _ in range(3):
+            Commande.objects.create(client=self.habitue, lieu_livraison=self.lieu, frais_livraison=FraisLivraison.objects.create(lieu=self.lieu))
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user(username="u", email="u@x.mg", password="x"))
+
+    def _noms(self, q):
+        return [c["nom"] for c in self.api.get("/api/vente/commandes/suggest/clients/", {"q": q}).json()]
+
+    def test_prefix_rank_and_signals(self):
+        self.assertEqual(self._noms("rako"), ["Rakotobe Soa", "Rakoto Jean"])
+        self.assertEqual(self._noms("rak 034"), ["Rakoto Jean"])
+        with self.assertNumQueries(0):  # index déjà construit: dernier lieu compris dans le payload
+            self._noms("soa")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.create(nom="Randria", contact="033")
+            self.lieu.actif = False
+            self.lieu.save()
+        self.assertEqual(self._noms("rand"), ["Randria"])
+        self.assertEqual(self.api.get("/api/vente/commandes/suggest/lieux/", {"q": "ana"}).json(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rare.delete()
+        self.assertEqual(self._noms("rako"), ["Rakotobe Soa"])
+
+    def test_counters_and_last_lieu_kept_in_index(self):
+        article = Article.objects.create(nom_produit="Savon", reference="SAV", prix_vente=1000, quantite_stock=10)
+        self.api.get("/api/vente/commandes/suggest/articles/")
+        self._noms("")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ser = CommandeSerializer(data={
+                "client_input": {"id": self.rare.id}, "lieu_input": {"id": self.lieu.id}, "precision_lieu": "Portail",
+                "lignes": [{"article": article.id, "quantite": 3}],
+            })
+            ser.is_valid(raise_exception=True)
+            ser.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lieu.nom = "Analakely Gare"
+            self.lieu.save()
+
+        with self.assertNumQueries(0):
+            savon = self.api.get("/api/vente/commandes/suggest/articles/", {"q": "sav"}).json()[0]
+            jean = self.api.get("/api/vente/commandes/suggest/clients/", {"q": "jean"}).json()[0]
+        self.assertEqual((savon["quantite_stock"], savon["disponible"]), (10, 7))
+        self.assertEqual(
+            (jean["last_lieu"]["lieu_id"], jean["last_lieu"]["lieu_nom"], jean["last_lieu"]["precision_lieu"]),
+            (self.lieu.id, "Analakely Gare", "Portail"),
+        )
+
+
+class ClientLastLieuTests(TestCase):
+    """Client.last_lieu / last_frais / last_precision_lieu tenus à jour depuis la dernière commande."""
+
+    def setUp(self):
+        autocomplete.CLIENTS.invalidate()
+        self.ville = LieuLivraison.objects.create(nom="Ville", categorie=LieuLivraison.Categorie.VILLE)
+        self.autre = LieuLivraison.objects.create(nom="Autre", categorie=LieuLivraison.Categorie.VILLE)
+        self.lignes = [{"article": Article.objects.create(nom_produit="P", reference="P", prix_vente=1000, quantite_stock=10).id, "quantite": 1}]
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user(username="u", email="u@x.mg", password="x"))
+
+    def _save(self, instance=None, **data):
+        ser = CommandeSerializer(instance, data=data, partial=instance is not None)
+        ser.is_valid(raise_exception=True)
+        return ser.save()
+
+    def _last(self, client):
+        return self.api.get("/api/vente/commandes/client-last-lieu/", {"client_id": client.id}).json()
+
+    def test_last_lieu(self):
+        premiere = self._save(client_input={"nom": "Soa"}, lieu_input={"id": self.ville.id}, precision_lieu="Portail bleu", lignes=self.lignes)
+        client = premiere.client
+        derniere = self._save(client_input={"id": client.id}, lieu_input={"id": self.autre.id}, frais_override=4000, lignes=self.lignes)
+        self.assertEqual(self._last(client), {"lieu_id": self.autre.id, "lieu_nom": "Autre", "frais_auto": 4000, "precision_lieu": ""})
+
+        # édition d'une commande plus ancienne: dernier lieu inchangé
+        self._save(premiere, precision_lieu="Portail vert")
+        self.assertEqual(self._last(client)["lieu_id"], self.autre.id)
+
+        self.api.delete(f"/api/vente/commandes/{derniere.id}/")
+        self.assertEqual(self._last(client)["precision_lieu"], "Portail vert")
+        suggestion = self.api.get("/api/vente/commandes/suggest/clients/", {"q": "soa"}).json()[0]
+        self.assertEqual(suggestion["last_lieu"]["lieu_id"], self.ville.id)
+
+    def test_frais_patch_refreshes_totals(self):
+        cmd = self._save(client_input={"nom": "Soa"}, lieu_input={"id": self.ville.id}, frais_override=3000, lignes=self.lignes)
+        self.assertEqual(cmd.total_commande_cache, 4000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.api.patch(f"/api/livraison/frais/{cmd.frais_livraison_id}/", {"frais_override": 5000}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        cmd.refresh_from_db()
+        self.assertEqual((cmd.total_articles_cache, cmd.total_commande_cache), (1000, 6000))
+        self.assertEqual(self._last(cmd.client)["frais_auto"], 5000)
+
+
+class IdempotencyKeyTests(TestCase):
+    """Header Idempotency-Key (api/idempotency.py): création rejouée sans nouvelle commande ni réservation."""
+
+    def setUp(self):
+        self.lieu = LieuLivraison.objects.create(nom="Lieu", categorie=LieuLivraison.Categorie.VILLE)
+        self.article = Article.objects.create(nom_produit="P", reference="P", prix_vente=1000, quantite_stock=10)
+        self.api = APIClient()
+        self.api.force_authenticate(get_user_model().objects.create_user(username="u", email="u@x.mg", password="x"))
+
+    def _post(self, qte, key):
+        return self.api.post("/api/vente/commandes/", {
+            "client_input": {"nom": "C"}, "lieu_input": {"id": self.lieu.id},
+            "lignes": [{"article": self.article.id, "quantite": qte}],
+        }, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay(self):
+        first = self._post(3, "k1")
+        replay = self._post(3, "k1")
+        self.assertEqual((first.status_code, replay.status_code), (201, 201))
+        self.assertEqual(replay.json()["id"], first.json()["id"])
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(Commande.objects.count(), 1)
+        self.assertEqual(Article.objects.get(pk=self.article.pk).quantite_reservee, 3)
+
+        self.assertEqual(self._post(4, "k1").status_code, 422)
+        # échec (stock insuffisant) => clé libérée, réutilisable
+        self.assertEqual(self._post(50, "k2").status_code, 400)
+        self.assertEqual(self._post(2, "k2").status_code, 201)
+        self.assertEqual(Commande.objects.count(), 2)
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "verrous FOR UPDATE concurrents: PostgreSQL uniquement")
+class ConcurrentStockDecrementTests(TransactionTestCase):
+    """
+    Plusieurs commandes en parallèle sur les mêmes articles, lignes dans des ordres différents:
+    verrouillage trié par id => ni deadlock ni décrément perdu.
+    """
+
+    THREADS = 8
+    ORDERS_PER_THREAD = 5
+
+    def setUp(self):
+        self.articles = [
+            Article.objects.create(nom_produit=f"SKU {i}", reference=f"SKU{i}", prix_vente=1000, quantite_stock=10_000)
+            for i in range(4)
+        ]
+        self.lieu = LieuLivraison.objects.create(nom="Lieu", categorie=LieuLivraison.Categorie.VILLE)
+
+    def _worker(self, n: int, errors: list):
+        try:
+            ids = [a.id for a in self.articles]
+            for k in range(self.ORDERS_PER_THREAD):
+                order = ids if (n + k) % 2 else list(reversed(ids))
+                ser = CommandeSerializer(data={
+                    "client_input": {"nom": f"Client {n}"},
+                    "lieu_input": {"id": self.lieu.id},
+                    "lignes": [{"article": aid, "quantite": 1 + (aid % 3)} for aid in order],
+                })
+                ser.is_valid(raise_exception=True)
+                ser.save()
+        except Exception as exc:  # noqa: BLE001
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    def test_parallel_orders_same_skus(self):
+        errors: list = []
+        threads = [threading.Thread(target=self._worker, args=(n, errors)) for n in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        n_orders = self.THREADS * self.ORDERS_PER_THREAD
+        self.assertEqual(Commande.objects.count(), n_orders)
+        for art in self.articles:
+            art.refresh_from_db()
+            self.assertEqual(art.quantite_stock, 10_000)
+            self.assertEqual(art.quantite_reservee, n_orders * (1 + (art.id % 3)))
@@ -2,40 +2,35 @@
 from __future__ import annotations
 
 from django.db import transaction
-from django.db.models import Prefetch, Q
+from django.db.models import Prefetch
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 
+from api.idempotency import idempotent
 from vente.models import Commande, LigneCommande
-from vente.serializers import (
-    CommandeSerializer,
-    ArticleLiteSerializer,
-    ClientLiteSerializer,
-    LieuLivraisonLiteSerializer,
-)
+from vente.dates import day_range_q
+from vente.pagination import CommandeCursorPagination
+from vente.search import search_q
+from vente import autocomplete
+from vente.stock import transition_stock
+from vente.clients import refresh_last_lieu
+from vente.serializers import CommandeSerializer, ClientLiteSerializer
 
 from article.models import Article
 from client.models import Client
-from livraison.models import LieuLivraison
-
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 20
-    page_size_query_param = "page_size"
-    max_page_size = 200
 
 
 class CommandeViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = CommandeSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = CommandeCursorPagination
 
     def get_queryset(self):
         qs = (
             Commande.objects
-            .select_related("page", "client", "lieu_livraison", "frais_livraison")
+            .select_related("page", "client__last_lieu", "lieu_livraison", "frais_livraison")
             .prefetch_related(
                 Prefetch("lignes", queryset=LigneCommande.objects.select_related("article"))
             )
@@ -56,17 +51,20 @@ class CommandeViewSet(viewsets.ModelViewSet):
         if statut:
             qs = qs.filter(statut=statut)
 
+        # ✅ recherche indexée (vente/search.py)
         if client:
-            qs = qs.filter(Q(client__nom__icontains=client) | Q(client__contact__icontains=client))
+            qs = qs.filter(search_q(client, columns=["client"], par_id=False))
 
         if lieu:
-            qs = qs.filter(lieu_livraison__nom__icontains=lieu)
+            qs = qs.filter(search_q(lieu, columns=["lieu"], par_id=False))
 
         if date_livraison:
             qs = qs.filter(date_livraison=date_livraison)
 
-        if date_commande:
-            qs = qs.filter(created_at__date=date_commande)
+        # ✅ plage datetime locale (index created_at utilisable) au lieu de created_at__date
+        d_cmd = parse_date(date_commande) if date_commande else None
+        if d_cmd:
+            qs = qs.filter(day_range_q("created_at", d_cmd, d_cmd))
 
         if page_id.isdigit():
             qs = qs.filter(page_id=int(page_id))
@@ -78,29 +76,37 @@ class CommandeViewSet(viewsets.ModelViewSet):
         ctx["request"] = self.request
         return ctx
 
+    # ✅ Idempotency-Key: une création rejouée renvoie la commande déjà créée (pas de 2e réservation de stock)
+    @idempotent("vente.commande.create")
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    # ✅ suggestions servies par l'index en mémoire (vente/autocomplete.py): aucune requête
     @action(detail=False, methods=["get"], url_path="suggest/articles")
     def suggest_articles(self, request):
-        q = (request.query_params.get("q") or "").strip()
-        qs = Article.objects.all().order_by("-id")
-        if q:
-            qs = qs.filter(Q(nom_produit__icontains=q) | Q(reference__icontains=q))
-        return Response(ArticleLiteSerializer(qs[:15], many=True, context={"request": request}).data)
+        storage = Article._meta.get_field("photo").storage
+        out = []
+        for a in autocomplete.ARTICLES.search(request.query_params.get("q") or ""):
+            photo = a["photo"]
+            out.append({
+                "id": a["id"],
+                "nom_produit": a["nom_produit"],
+                "reference": a["reference"],
+                "prix_vente": a["prix_vente"],
+                "quantite_stock": a["quantite_stock"],
+                "disponible": a["quantite_stock"] - a["quantite_reservee"],
+                "photo_url": request.build_absolute_uri(storage.url(photo)) if photo else None,
+            })
+        return Response(out)
 
     @action(detail=False, methods=["get"], url_path="suggest/clients")
     def suggest_clients(self, request):
-        q = (request.query_params.get("q") or "").strip()
-        qs = Client.objects.all().order_by("-id")
-        if q:
-            qs = qs.filter(Q(nom__icontains=q) | Q(contact__icontains=q))
-        return Response(ClientLiteSerializer(qs[:15], many=True).data)
+        # payload = champs de ClientLiteSerializer (dernier lieu compris)
+        return Response(autocomplete.CLIENTS.search(request.query_params.get("q") or ""))
 
     @action(detail=False, methods=["get"], url_path="suggest/lieux")
     def suggest_lieux(self, request):
-        q = (request.query_params.get("q") or "").strip()
-        qs = LieuLivraison.objects.filter(actif=True).order_by("nom")
-        if q:
-            qs = qs.filter(nom__icontains=q)
-        return Response(LieuLivraisonLiteSerializer(qs[:15], many=True).data)
+        return Response(autocomplete.LIEUX.search(request.query_params.get("q") or ""))
 
     @action(detail=False, methods=["get"], url_path="client-last-lieu")
     def client_last_lieu(self, request):
@@ -108,31 +114,18 @@ class CommandeViewSet(viewsets.ModelViewSet):
         if not client_id.isdigit():
             return Response({"detail": "client_id invalide"}, status=status.HTTP_400_BAD_REQUEST)
 
-        last_cmd = (
-            Commande.objects
-            .select_related("lieu_livraison", "frais_livraison")
-            .filter(client_id=int(client_id))
-            .order_by("-id")
-            .first()
-        )
-
-        if not last_cmd or not last_cmd.lieu_livraison_id:
+        # ✅ colonnes dénormalisées sur le client (vente/clients.py)
+        client = Client.objects.select_related("last_lieu").filter(id=int(client_id)).first()
+        if not client:
             return Response(None)
-
-        lieu = last_cmd.lieu_livraison
-
-        return Response({
-            "lieu_id": lieu.id,
-            "lieu_nom": lieu.nom,
-            "frais_auto": int(getattr(last_cmd.frais_livraison, "frais_final", 0) or 0),
-            "precision_lieu": last_cmd.precision_lieu or "",
-        })
+        return Response(ClientLiteSerializer(client).data["last_lieu"])
 
     @transaction.atomic
     def perform_destroy(self, instance: Commande):
-        lines = list(instance.lignes.select_related("article").all())
-        for l in lines:
-            art = l.article
-            art.quantite_stock = int(art.quantite_stock) + int(l.quantite)
-            art.save(update_fields=["quantite_stock", "updated_at"])
+        # réservation libérée (commande ouverte) ou stock rendu (commande livrée)
+        # statut relu sous verrou: une livraison/annulation concurrente a pu le changer
+        statut = Commande.objects.select_for_update().values_list("statut", flat=True).get(pk=instance.pk)
+        transition_stock({instance.id: (statut, Commande.Statut.ANNULEE)})
+        client_id = instance.client_id
         instance.delete()
+        refresh_last_lieu([client_id])
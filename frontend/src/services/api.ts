@@ -11,6 +11,17 @@ export const api = axios.create({
   timeout: 8000,
 });
 
+// ✅ Idempotency-Key: 1 clé par soumission de formulaire, réutilisée si l'opérateur renvoie
+// => le backend rejoue la 1re réponse au lieu de recréer (commande, encaissement, programmation)
+export function newIdempotencyKey(): string {
+  if (typeof crypto !== "undefined" && "randomUUID" in crypto) return crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+export function idempotencyHeaders(key?: string | null) {
+  return key ? { "Idempotency-Key": key } : undefined;
+}
+
 // ✅ Instance "raw" (sans interceptors) pour refresh
 const raw = axios.create({
   baseURL: BASE_URL,
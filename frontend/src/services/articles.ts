@@ -6,6 +6,9 @@ export type Article = {
   reference: string;
   prix_achat: string | number;
   prix_vente: string | number;
+  quantite_stock?: number;
+  quantite_reservee?: number;
+  disponible?: number;
   description: string;
   photo?: string | null;
   photo_url?: string | null;
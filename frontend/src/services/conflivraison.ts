@@ -1,5 +1,5 @@
 // src/services/conflivraison.ts
-import { api } from "./api";
+import { api, idempotencyHeaders } from "./api";
 
 export type LivraisonStatut =
   | "A_PREPARER"
@@ -34,6 +34,13 @@ export type CommandeProgrammation = {
   updated_at: string;
 };
 
+/** ✅ capacité par date (1ère page de commandes-a-programmer): nb de commandes par catégorie de lieu */
+export type CapaciteJour = {
+  date: string;
+  total: number;
+  categories: Record<string, number>;
+};
+
 export type Livraison = {
   id: number;
   commande: number;
@@ -44,18 +51,33 @@ export type Livraison = {
   raison: string;
   commentaire: string;
   updated_by: number | null;
-  events: LivraisonEvent[];
+  last_event: LivraisonEvent | null; // ✅ dénormalisé (historique complet: history)
+  events_count: number;
   created_at: string;
   updated_at: string;
 };
 
 export type Paginated<T> = {
   count: number;
+  count_approx?: boolean;
   next: string | null;
   previous: string | null;
   results: T[];
 };
 
+export type BulkTransitionResult =
+  | { id: number; ok: true; statut: LivraisonStatut; commande_statut: string }
+  | { id: number; ok: false; detail: string };
+
+export type BulkTransitionResponse = {
+  statut: LivraisonStatut;
+  updated: number;
+  failed: number;
+  results: BulkTransitionResult[];
+};
+
+export type LivraisonHistory = Paginated<LivraisonEvent> & { livraison: Livraison };
+
 export type LivraisonActionPayload = {
   raison?: string;
   commentaire?: string;
@@ -67,9 +89,11 @@ export const ConflivraisonAPI = {
     return api.get<Paginated<Livraison>>("/conflivraison/livraisons/", { params });
   },
 
-  // ✅ NEW: history details (pour modal Historique)
-  history(id: number) {
-    return api.get<Livraison>(`/conflivraison/livraisons/${id}/history/`);
+  // ✅ NEW: history details (pour modal Historique), paginé (curseur)
+  history(id: number, cursor?: string | null) {
+    return api.get<LivraisonHistory>(`/conflivraison/livraisons/${id}/history/`, {
+      params: { page_size: 50, count: "none", ...(cursor ? { cursor } : {}) },
+    });
   },
 
   listCommandes(params?: any) {
@@ -79,11 +103,11 @@ export const ConflivraisonAPI = {
     );
   },
 
-  programmerCommande(commande_id: number, date_livraison: string) {
+  programmerCommande(commande_id: number, date_livraison: string, idempotencyKey?: string) {
     return api.post("/conflivraison/livraisons/programmer-commande/", {
       commande_id,
       date_livraison,
-    });
+    }, { headers: idempotencyHeaders(idempotencyKey) });
   },
 
   setEnLivraison(id: number, payload?: LivraisonActionPayload) {
@@ -99,6 +123,23 @@ export const ConflivraisonAPI = {
     return api.post<Livraison>(`/conflivraison/livraisons/${id}/reporter/`, payload || {});
   },
 
+  // ✅ fin de tournée: plusieurs livraisons en 1 appel (résultat par id)
+  bulkTransition(ids: number[], statut: LivraisonStatut, payload?: LivraisonActionPayload) {
+    return api.post<BulkTransitionResponse>("/conflivraison/livraisons/bulk-transition/", {
+      ...(payload || {}),
+      ids,
+      statut,
+    });
+  },
+
+  // ✅ feuille de route du jour (groupée catégorie > lieu): PDF ou CSV
+  manifest(date: string, exportType: "pdf" | "csv" = "pdf") {
+    return api.get("/conflivraison/livraisons/manifest/", {
+      params: { date, export: exportType, download: 1 },
+      responseType: "blob",
+    });
+  },
+
   syncFromCommandes() {
     return api.post<{ created: number }>("/conflivraison/livraisons/sync-from-commandes/");
   },
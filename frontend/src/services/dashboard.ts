@@ -65,8 +65,19 @@ export type ArticleEntrant = {
   total_achat: number;
 };
 
-export type ArticlesSortantsResponse = { range: DashboardRange; items: ArticleSortant[] };
-export type ArticlesEntrantsResponse = { range: DashboardRange; items: ArticleEntrant[] };
+// ?order=... ; ?limit=N ; ?after=<next_after> pour la page suivante
+export type ArticlesSortantsResponse = {
+  range: DashboardRange;
+  order?: "total_vente" | "quantite" | "marge";
+  items: ArticleSortant[];
+  next_after?: string | null;
+};
+export type ArticlesEntrantsResponse = {
+  range: DashboardRange;
+  order?: "total_achat" | "quantite";
+  items: ArticleEntrant[];
+  next_after?: string | null;
+};
 
 export const DashboardAPI = {
   overview(params?: any) {
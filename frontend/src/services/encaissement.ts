@@ -1,5 +1,5 @@
 // src/services/encaissement.ts
-import { api } from "./api";
+import { api, idempotencyHeaders } from "./api";
 
 export type PaiementStatut = "EN_ATTENTE" | "PAYEE" | "ANNULEE";
 export type ModePaiement = "ESPECE" | "MVOLA" | "ORANGE_MONEY";
@@ -22,6 +22,7 @@ export type EncaissementCommande = {
 
 export type Paginated<T> = {
   count: number;
+  count_approx?: boolean;
   next: string | null;
   previous: string | null;
   results: T[];
@@ -36,8 +37,8 @@ export const EncaissementAPI = {
     return api.get<EncaissementCommande>(`/encaissement/commandes/${id}/`);
   },
 
-  encaisserCommande(id: number, payload: { mode: ModePaiement; reference?: string; note?: string }) {
-    return api.post(`/encaissement/commandes/${id}/encaisser/`, payload);
+  encaisserCommande(id: number, payload: { mode: ModePaiement; reference?: string; note?: string }, idempotencyKey?: string) {
+    return api.post(`/encaissement/commandes/${id}/encaisser/`, payload, { headers: idempotencyHeaders(idempotencyKey) });
   },
 
   annulerPaiement(id: number, payload?: { note?: string }) {
@@ -1,5 +1,6 @@
 export type PaginatedResponse<T> = {
   count: number;
+  count_approx?: boolean; // ✅ listes commandes (pagination curseur): comptage borné / estimé
   next: string | null;
   previous: string | null;
   results: T[];
@@ -10,3 +11,13 @@ export function unwrapList<T>(data: any): T[] {
   if (data && Array.isArray(data.results)) return data.results;
   return [];
 }
+
+// ✅ pagination curseur (listes commandes): ?cursor=... extrait des liens next/previous
+export function cursorFrom(url: string | null): string | null {
+  if (!url) return null;
+  try {
+    return new URL(url, "http://localhost").searchParams.get("cursor");
+  } catch {
+    return null;
+  }
+}
@@ -1,5 +1,5 @@
 // frontend/src/services/vente.ts
-import { api } from "./api";
+import { api, idempotencyHeaders } from "./api";
 
 /** ✅ Statuts commande (alignés backend) */
 export type CommandeStatut =
@@ -14,6 +14,7 @@ export type ArticleSuggest = {
   reference: string;
   prix_vente: number | string;
   quantite_stock: number;
+  disponible: number;
   photo_url?: string | null;
 };
 
@@ -21,6 +22,7 @@ export type ClientSuggest = {
   id: number;
   nom: string;
   contact?: string | null;
+  last_lieu?: ClientLastLieu; // ✅ dernier lieu inline (plus d'appel client-last-lieu)
 };
 
 export type LieuCategorie =
@@ -82,6 +84,7 @@ export type CommandePayload = {
 
 export type PaginatedResponse<T> = {
   count: number;
+  count_approx?: boolean;
   next: string | null;
   previous: string | null;
   results: T[];
@@ -105,8 +108,8 @@ export const VenteAPI = {
     return api.get<PaginatedResponse<any>>("/vente/commandes/", { params });
   },
 
-  create(payload: CommandePayload) {
-    return api.post("/vente/commandes/", payload);
+  create(payload: CommandePayload, idempotencyKey?: string) {
+    return api.post("/vente/commandes/", payload, { headers: idempotencyHeaders(idempotencyKey) });
   },
   update(id: number, payload: CommandePayload) {
     return api.put(`/vente/commandes/${id}/`, payload);
@@ -3,10 +3,13 @@ import Modal from "bootstrap/js/dist/modal"; // ✅ FIX (ne pas importer "bootst
 import {
   ConflivraisonAPI,
   type Livraison,
+  type LivraisonEvent,
   type LivraisonStatut,
   type CommandeProgrammation,
+  type CapaciteJour,
 } from "@/services/conflivraison";
-import { api } from "@/services/api";
+import { api, newIdempotencyKey } from "@/services/api";
+import { cursorFrom } from "@/services/pagination";
 
 export function useConflivraisonView() {
   const loading = ref(false);
@@ -19,6 +22,7 @@ export function useConflivraisonView() {
   const nextCmdUrl = ref<string | null>(null);
   const prevCmdUrl = ref<string | null>(null);
   const programmationDates = reactive<Record<number, string>>({});
+  const capaciteCmd = ref<CapaciteJour[]>([]);
 
   function toApiPath(url: string) {
     try {
@@ -41,6 +45,8 @@ export function useConflivraisonView() {
       totalCmd.value = data.count || 0;
       nextCmdUrl.value = data.next || null;
       prevCmdUrl.value = data.previous || null;
+      // ✅ capacité renvoyée sur la 1ère page uniquement
+      if (data.capacite) capaciteCmd.value = data.capacite;
 
       for (const c of commandes.value) {
         if (!programmationDates[c.id]) {
@@ -61,14 +67,21 @@ export function useConflivraisonView() {
     if (prevCmdUrl.value) loadCommandes(prevCmdUrl.value);
   }
 
+  // ✅ 1 clé par (commande, date) tant que la programmation n'a pas abouti
+  const programmationKeys = new Map<string, string>();
+
   async function programmer(c: CommandeProgrammation) {
     const d = (programmationDates[c.id] || "").trim();
     if (!d) return;
 
+    const k = `${c.id}:${d}`;
+    if (!programmationKeys.has(k)) programmationKeys.set(k, newIdempotencyKey());
+
     loading.value = true;
     error.value = null;
     try {
-      await ConflivraisonAPI.programmerCommande(c.id, d);
+      await ConflivraisonAPI.programmerCommande(c.id, d, programmationKeys.get(k));
+      programmationKeys.delete(k);
       await refreshAll();
     } catch (e: any) {
       error.value = e?.response?.data?.detail || "Erreur programmation";
@@ -206,6 +219,8 @@ export function useConflivraisonView() {
   const modalAction = ref<LivraisonStatut | null>(null);
   const modalTarget = ref<Livraison | null>(null);
   const historyTarget = ref<Livraison | null>(null);
+  const historyEvents = ref<LivraisonEvent[]>([]);
+  const historyNext = ref<string | null>(null);
 
   const actionPayload = reactive({
     raison: "",
@@ -300,7 +315,9 @@ export function useConflivraisonView() {
     error.value = null;
     try {
       const res = await ConflivraisonAPI.history(l.id);
-      historyTarget.value = res.data;
+      historyTarget.value = res.data.livraison;
+      historyEvents.value = res.data.results;
+      historyNext.value = res.data.next;
 
       await ensureModals();
       if (!historyModal) {
@@ -316,6 +333,20 @@ export function useConflivraisonView() {
     }
   }
 
+  async function moreHistory() {
+    if (!historyTarget.value || !historyNext.value) return;
+    loading.value = true;
+    try {
+      const res = await ConflivraisonAPI.history(historyTarget.value.id, cursorFrom(historyNext.value));
+      historyEvents.value = [...historyEvents.value, ...res.data.results];
+      historyNext.value = res.data.next;
+    } catch (e: any) {
+      error.value = e?.response?.data?.detail || "Erreur chargement historique";
+    } finally {
+      loading.value = false;
+    }
+  }
+
   async function act(action: "EN_LIVRAISON" | "LIVREE", l: Livraison) {
     loading.value = true;
     error.value = null;
@@ -350,6 +381,7 @@ export function useConflivraisonView() {
     loadingCmd,
     commandes,
     totalCmd,
+    capaciteCmd,
     nextCmdUrl,
     prevCmdUrl,
     programmationDates,
@@ -386,6 +418,9 @@ export function useConflivraisonView() {
     modalAction,
     actionPayload,
     historyTarget,
+    historyEvents,
+    historyNext,
+    moreHistory,
     openModal,
     confirmModal,
     act,
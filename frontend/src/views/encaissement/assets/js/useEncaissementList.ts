@@ -1,6 +1,7 @@
 import { computed, onMounted, ref } from "vue";
 import { useRouter } from "vue-router";
 import { EncaissementAPI, type EncaissementCommande } from "@/services/encaissement";
+import { cursorFrom } from "@/services/pagination";
 
 export function useEncaissementList() {
   const router = useRouter();
@@ -15,13 +16,18 @@ export function useEncaissementList() {
   const page = ref(1);
   const pageSize = ref(20);
 
+  // ✅ pagination curseur: liens next/previous renvoyés par l'API
+  const cursor = ref<string | null>(null);
+  const nextUrl = ref<string | null>(null);
+  const prevUrl = ref<string | null>(null);
+
   const showFilters = ref(false);
   const viewMode = ref<"table" | "card">("table");
 
   const noop = () => {};
 
   const hasActiveFilters = computed(() => !!(paiement_statut.value || q.value.trim()));
-  const hasNext = computed(() => page.value * pageSize.value < count.value);
+  const hasNext = computed(() => !!nextUrl.value);
 
   function toggleFilters() {
     showFilters.value = !showFilters.value;
@@ -59,36 +65,43 @@ export function useEncaissementList() {
 
   function goPending() {
     paiement_statut.value = "EN_ATTENTE";
-    page.value = 1;
+    firstPage();
     load();
   }
 
   function resetFilters() {
     paiement_statut.value = "";
     q.value = "";
-    page.value = 1;
+    firstPage();
     load();
   }
 
   function applyFilters() {
-    page.value = 1;
+    firstPage();
     load();
   }
 
+  function firstPage() {
+    page.value = 1;
+    cursor.value = null;
+  }
+
   function nextPage() {
     if (!hasNext.value) return;
+    cursor.value = cursorFrom(nextUrl.value);
     page.value += 1;
     load();
   }
 
   function prevPage() {
-    if (page.value <= 1) return;
-    page.value -= 1;
+    if (!prevUrl.value) return;
+    cursor.value = cursorFrom(prevUrl.value);
+    page.value = Math.max(1, page.value - 1);
     load();
   }
 
   function onPageSizeChange() {
-    page.value = 1;
+    firstPage();
     load();
   }
 
@@ -109,7 +122,7 @@ export function useEncaissementList() {
       const params: any = {
         paiement_statut: paiement_statut.value || undefined,
         q: q.value || undefined,
-        page: page.value,
+        cursor: cursor.value || undefined,
         page_size: pageSize.value,
       };
 
@@ -118,6 +131,8 @@ export function useEncaissementList() {
 
       rows.value = data.results || [];
       count.value = data.count || 0;
+      nextUrl.value = data.next || null;
+      prevUrl.value = data.previous || null;
     } finally {
       loading.value = false;
     }
@@ -1,6 +1,7 @@
 import { onMounted, ref } from "vue";
 import { useRoute, useRouter } from "vue-router";
 import { EncaissementAPI, type EncaissementCommande, type ModePaiement } from "@/services/encaissement";
+import { newIdempotencyKey } from "@/services/api";
 
 export function useEncaisserCommande() {
   const router = useRouter();
@@ -45,6 +46,9 @@ export function useEncaisserCommande() {
     }
   }
 
+  // ✅ même clé pour tous les envois de cette page (un renvoi ne double pas l'encaissement)
+  const submitKey = newIdempotencyKey();
+
   async function submit() {
     error.value = "";
     errorRef.value = "";
@@ -60,7 +64,7 @@ export function useEncaisserCommande() {
         mode: mode.value,
         reference: reference.value.trim() || undefined,
         note: note.value.trim() || undefined,
-      });
+      }, submitKey);
       back();
     } catch (e: any) {
       error.value = e?.response?.data?.detail || JSON.stringify(e?.response?.data || e) || "Erreur encaissement";